@@ -253,11 +253,107 @@ class AttrDict(dict):
 
 Options = AttrDict
 
+
+def lazify(v):
+    """Wraps a plain dict or list in a LazyAttrDict or LazyList."""
+    if type(v) is dict:
+        return LazyAttrDict(v)
+    if type(v) is list:
+        return LazyList(v)
+    return v
+
+
+class LazyAttrDict(AttrDict):
+    """An AttrDict over a plain (e.g. just decoded) dict, which is used as is.
+
+    Nested dicts and lists are wrapped only when they're first accessed, and
+    the wrapper is kept in place of the plain value, so that changes to it
+    stick. Use it instead of AttrDict(data) when data is large and most of it
+    will never be looked at.
+
+    >>> ad = LazyAttrDict(json.loads(body))
+    >>> ad['items'][0].name
+    """
+
+    def __init__(self, default=None, **kwargs):
+        dict.__init__(self, default or {}, **kwargs)
+
+    def __getitem__(self, k):
+        v = dict.__getitem__(self, k)
+        w = lazify(v)
+        if w is not v:
+            dict.__setitem__(self, k, w)
+        return w
+
+    def get(self, k, d=None):
+        if k in self:
+            return self[k]
+        return d
+
+    def setdefault(self, k, d=None):
+        if k not in self:
+            dict.__setitem__(self, k, d)
+        return self[k]
+
+    def pop(self, k, *args):
+        return lazify(dict.pop(self, k, *args))
+
+    def popitem(self):
+        k, v = dict.popitem(self)
+        return k, lazify(v)
+
+    def itervalues(self):
+        for k in self:
+            yield self[k]
+
+    def iteritems(self):
+        for k in self:
+            yield k, self[k]
+
+    def values(self):
+        return list(self.itervalues())
+
+    def items(self):
+        return list(self.iteritems())
+
+    def copy(self):
+        return self.__class__(self.items())
+
+
+class LazyList(list):
+    """The list counterpart of LazyAttrDict."""
+
+    def __getitem__(self, i):
+        v = list.__getitem__(self, i)
+        if isinstance(i, slice):
+            return LazyList(v)
+        w = lazify(v)
+        if w is not v:
+            list.__setitem__(self, i, w)
+        return w
+
+    def __getslice__(self, i, j):
+        return LazyList(list.__getslice__(self, i, j))
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+    def __reversed__(self):
+        for i in xrange(len(self) - 1, -1, -1):
+            yield self[i]
+
+    def pop(self, *args):
+        return lazify(list.pop(self, *args))
+
+
 # Convince yaml that AttrDict is actually a dict.
 try:
     from yaml.representer import Representer
     Representer.add_representer(AttrDict, Representer.represent_dict)
     Representer.add_representer(Options, Representer.represent_dict)
+    Representer.add_representer(LazyAttrDict, Representer.represent_dict)
+    Representer.add_representer(LazyList, Representer.represent_list)
 except ImportError:
     pass
 
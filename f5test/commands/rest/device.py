@@ -22,6 +22,7 @@ from ...interfaces.rest.emapi.objects import asm
 from ...interfaces.rest.emapi.objects import access
 from ...interfaces.rest.emapi.objects.shared import DeviceGroup
 from ...utils.wait import wait, wait_args, StopWait
+from ...utils.poller import poll_all
 from ..base import CommandError
 from .base import IcontrolRestCommand
 
@@ -44,6 +45,23 @@ FIREWALL_ALL_GROUP = 'cm-firewall-allDevices'
 SECURITY_SHARED_GROUP = 'cm-security-shared-allDevices'
 BIG_IP_HA_DEVICE_GROUP = 'tm-shared-all-big-ips'
 DEFAULT_ACCESS_GROUP = 'cm-access-allBigIpDevices'
+# What Discover needs to know about the devices already in a group.
+DEVICE_SELECT = ('address', 'state', 'selfLink')
+
+
+def map_devices(api, uri, devices):
+    """Maps our devices to their items in a device group collection, by the
+    discover address. Stops paging through the group once all were found."""
+    ours = dict((IPAddress(x.get_discover_address()), x) for x in devices)
+    theirs = {}
+    for item in api.iterate(uri):
+        address = IPAddress(item.address)
+        if address in ours:
+            theirs[address] = item
+            if len(theirs) == len(ours):
+                break
+    return dict((x, theirs[IPAddress(x.get_discover_address())])
+                for x in devices)
 
 delete = None
 class Delete(IcontrolRestCommand):  # @IgnorePep8
@@ -52,6 +70,9 @@ class Delete(IcontrolRestCommand):  # @IgnorePep8
     @param devices: A dictionary of devices as keys and URIs as values
     @rtype: None
     """
+    # Issue all deletes upfront and wait for the group to settle only once.
+    concurrent = True
+
     def __init__(self, devices, group=None, *args, **kwargs):
         super(Delete, self).__init__(*args, **kwargs)
         self.devices = list(devices or [])
@@ -63,6 +84,17 @@ class Delete(IcontrolRestCommand):  # @IgnorePep8
         self.api.delete(uri)
         DeviceResolver.wait(self.api, self.group)
 
+    def remove_many(self, devices):
+        if not self.concurrent:
+            for device, uri in devices.items():
+                self.remove_one(device, uri)
+            return
+
+        for device, uri in devices.items():
+            LOG.info('Delete started for %s...', device)
+            self.api.delete(uri)
+        DeviceResolver.wait(self.api, self.group)
+
     def set_uri(self):
         assert self.group, "A group is required"
         self.uri = DeviceResolver.DEVICES_URI % self.group
@@ -76,8 +108,8 @@ class Delete(IcontrolRestCommand):  # @IgnorePep8
             return
 
         # Join our devices with theirs by the discover address (self IP)
-        resp = self.api.get(self.uri)
-        uris_by_address = dict((IPAddress(x.managementAddress), x.selfLink) for x in resp['items'])
+        resp = self.api.iterate(self.uri, select='managementAddress,selfLink')
+        uris_by_address = dict((IPAddress(x.managementAddress), x.selfLink) for x in resp)
         devices = dict((x, uris_by_address.get(IPAddress(x.get_address())))
                        for x in self.devices)
 
@@ -85,12 +117,12 @@ class Delete(IcontrolRestCommand):  # @IgnorePep8
         for device, uri in devices.items():
             if uri is None:
                 raise CommandError('Device %s was not found' % device)
-            self.remove_one(device, uri)
+        self.remove_many(devices)
 
         def delete_completed():
             # Changed in 4.1.0
-            resp = self.api.get(self.uri)
-            theirs = set([x.selfLink for x in resp['items']])
+            resp = self.api.iterate(self.uri, select='selfLink')
+            theirs = set([x.selfLink for x in resp])
             ours = set(devices.values())
             return not theirs.intersection(ours)
 
@@ -107,6 +139,8 @@ class Discover(IcontrolRestCommand):  # @IgnorePep8
     @param refresh: A bool flag, if set it will re-discover existing devices.
     @rtype: None
     """
+    # Post all discovery requests upfront and poll them together.
+    concurrent = True
 
     def __init__(self, devices, group=None, refresh=False,
                  timeout=DISCOVERY_TIMEOUT, options={},
@@ -127,7 +161,14 @@ class Discover(IcontrolRestCommand):  # @IgnorePep8
                          timeout=timeout,
                          timeout_message="Object %s not available after {0} seconds" % resource.selfLink)
 
-    def add_one(self, device):
+    def wait_for_availability_many(self, resources, timeout):
+        return poll_all(self.api.get, [x.selfLink + '/stats' for x in resources],
+                        condition=lambda x: x.entries.get('health.summary.available', {}).get('value') == 1,
+                        progress_cb=lambda x: 'Pending health check...',
+                        timeout=timeout,
+                        timeout_message="Object {key} not available after {0} seconds")
+
+    def start_one(self, device):
         LOG.info('Adding device %s to %s...', device, self.group)
         payload = DeviceResolver()
         payload.address = device.get_discover_address()
@@ -138,7 +179,10 @@ class Discover(IcontrolRestCommand):  # @IgnorePep8
         payload.automaticallyUpdateFramework = True
         payload.update(self.options)
 
-        resp = self.api.post(self.uri, payload=payload)
+        return self.api.post(self.uri, payload=payload)
+
+    def add_one(self, device):
+        resp = self.start_one(device)
         resp = wait_args(self.api.get, func_args=[resp.selfLink],
                          condition=lambda x: x.state not in DeviceResolver.PENDING_STATES,
                          progress_cb=lambda x: 'Discovery pending...',
@@ -148,6 +192,32 @@ class Discover(IcontrolRestCommand):  # @IgnorePep8
             self.wait_for_availability(resp, self.timeout)
         return resp
 
+    def add_many(self, devices):
+        """Generates (device, response) tuples for all devices discovered.
+
+        Falls back to one add_one() at a time for subclasses that don't
+        support concurrent discovery.
+        """
+        if not self.concurrent:
+            for device in devices:
+                yield device, self.add_one(device)
+            return
+
+        if not devices:
+            return
+
+        tasks = [self.start_one(x) for x in devices]
+        rets = poll_all(self.api.get, [x.selfLink for x in tasks],
+                        condition=lambda x: x.state not in DeviceResolver.PENDING_STATES,
+                        progress_cb=lambda x: 'Discovery pending...',
+                        timeout=self.timeout,
+                        timeout_message="Discovery task did not complete in {0} seconds")
+        if self.v >= 'bigiq 4.5':
+            self.wait_for_availability_many(rets, self.timeout)
+
+        for device, ret in zip(devices, rets):
+            yield device, ret
+
     def refresh_one(self, device, state):
         LOG.info('Refreshing device %s in %s...', device, self.group)
         payload = DeviceResolver()
@@ -186,7 +256,8 @@ class Discover(IcontrolRestCommand):  # @IgnorePep8
                 if 'Authorization failed' in e.msg:
                     raise StopWait(e)
                 raise
-        self.resp = wait_args(is_up, func_args=[self.uri])
+        self.resp = wait_args(is_up, func_args=[self.uri],
+                              func_kwargs=dict(odata_dict=dict(top=1)))
 
     def completed(self, device, ret):
         assert ret.state in ['ACTIVE'], \
@@ -195,19 +266,21 @@ class Discover(IcontrolRestCommand):  # @IgnorePep8
 
     def setup(self):
         # Make mapping of what's on the server and what's in our config
-        resp = self.resp
-        theirs = dict([(IPAddress(x.address), x) for x in resp['items']])
         ours = dict([(IPAddress(x.get_discover_address()), x) for x in self.devices])
-
-        for address in set(theirs) - set(ours):
-            theirs.pop(address)
+        theirs = {}
+        for item in self.api.iterate(self.uri, select=DEVICE_SELECT):
+            address = IPAddress(item.address)
+            if address in ours:
+                theirs[address] = item
 
         theirs_set = set() if self.refresh else set([x for x in theirs
                                                      if theirs[x].state == 'ACTIVE'])
         self.v = self.ifc.version
 
         # Add any devices that are not already discovered.
-        # Discovery of multiple devices at once is not supported by API.
+        # Discovery of multiple devices in one request is not supported by API,
+        # but we can have several discovery tasks in flight.
+        to_add = []
         for address in set(ours) - theirs_set:
             device = ours[address]
 
@@ -226,16 +299,16 @@ class Discover(IcontrolRestCommand):  # @IgnorePep8
             if address in theirs and (self.refresh or theirs[address].state not in ['UNDISCOVERED']):
                 ret = self.refresh_one(device, theirs[address])
             else:
-                ret = self.add_one(device)
-                self.completed(device, ret)
+                to_add.append(device)
+
+        for device, ret in self.add_many(to_add):
+            self.completed(device, ret)
 
         return self.post_discovery_steps()
 
     def post_discovery_steps(self):
         # Map our devices to their selfLinks
-        resp = self.api.get(self.uri)
-        theirs = dict([(IPAddress(x.address), x) for x in resp['items']])
-        return dict((x, theirs[IPAddress(x.get_discover_address())]) for x in self.devices)
+        return map_devices(self.api, self.uri, self.devices)
 
 
 delete_security = None
@@ -247,6 +320,7 @@ class DeleteSecurity(Delete):  # @IgnorePep8
     """
     group = DEFAULT_SECURITY_GROUP
     task = RemoveMgmtAuthorityTaskV2
+    concurrent = False
 
     def __init__(self, *args, **kwargs):
         super(DeleteSecurity, self).__init__(*args, **kwargs)
@@ -286,6 +360,7 @@ class DiscoverSecurity(Discover):  # @IgnorePep8
     """
     group = DEFAULT_SECURITY_GROUP
     task = DeclareMgmtAuthorityTask
+    concurrent = False
 
     def __init__(self, *args, **kwargs):
         super(DiscoverSecurity, self).__init__(*args, **kwargs)
@@ -365,6 +440,8 @@ class DeleteCloud(Delete):  # @IgnorePep8
     @param devices: A dictionary of devices as keys and URIs as values
     @rtype: None
     """
+    concurrent = False
+
     def __init__(self, *args, **kwargs):
         super(DeleteCloud, self).__init__(*args, **kwargs)
         self.group = DEFAULT_CLOUD_GROUP
@@ -389,6 +466,7 @@ class DiscoverCloud(Discover):  # @IgnorePep8
     @param refresh: A bool flag, if set it will re-discover existing devices.
     @rtype: None
     """
+    concurrent = False
 
     def __init__(self, *args, **kwargs):
         super(DiscoverCloud, self).__init__(*args, **kwargs)
@@ -549,10 +627,7 @@ class DiscoverAdc(Discover):  # @IgnorePep8
             ret = tasks[0]
             assert ret.status == 'FINISHED', 'Most recent RefreshCurrentConfig task failed: {0.status}:{0.errorMessage}'.format(ret)
 
-        resp = self.api.get(self.uri)
-        theirs = dict([(IPAddress(x.address), x) for x in resp['items']])
-        return dict((x, theirs[IPAddress(x.get_discover_address())])
-                    for x in self.devices)
+        return map_devices(self.api, self.uri, self.devices)
 
 clean_dg_certs = None
 class CleanDgCerts(IcontrolRestCommand):  # @IgnorePep8
@@ -761,6 +836,7 @@ delete_access = None
 class DeleteAccess(Delete):  # @IgnorePep8
     group = DEFAULT_ACCESS_GROUP
     task = access.RemoveManagementAuthorityTask
+    concurrent = False
 
     def remove_one(self, device, uri):
         LOG.info('Remove-management-authority task started for %s...', device)
@@ -18,7 +18,8 @@ from ...utils.wait import wait, wait_args, StopWait
 from ..base import CommandError
 from .base import IcontrolRestCommand
 from .device import (DEFAULT_CLOUD_GROUP, VIPRION_DISCOVERY_DELAY,
-                     DEFAULT_DISCOVERY_DELAY, DEFAULT_AUTODEPLOY_GROUP)
+                     DEFAULT_DISCOVERY_DELAY, DEFAULT_AUTODEPLOY_GROUP,
+                     DEVICE_SELECT, map_devices)
 
 
 LOG = logging.getLogger(__name__)
@@ -84,7 +85,8 @@ class Discover(IcontrolRestCommand):  # @IgnorePep8
                 if 'Authorization failed' in e.msg:
                     raise StopWait(e)
                 raise
-        self.resp = wait_args(is_up, func_args=[self.uri])
+        self.resp = wait_args(is_up, func_args=[self.uri],
+                              func_kwargs=dict(odata_dict=dict(top=1)))
 
     def completed(self, ret):
         assert ret.status in ['FINISHED'], \
@@ -92,12 +94,12 @@ class Discover(IcontrolRestCommand):  # @IgnorePep8
 
     def setup(self):
         # Make mapping of what's on the server and what's in our config
-        resp = self.resp
-        theirs = dict([(IPAddress(x.address), x) for x in resp['items']])
         ours = dict([(IPAddress(x.get_discover_address()), x) for x in self.devices])
-
-        for address in set(theirs) - set(ours):
-            theirs.pop(address)
+        theirs = {}
+        for item in self.api.iterate(self.uri, select=DEVICE_SELECT):
+            address = IPAddress(item.address)
+            if address in ours:
+                theirs[address] = item
 
         theirs_set = set([x for x in theirs if theirs[x].state == 'ACTIVE'])
 
@@ -143,9 +145,7 @@ class Discover(IcontrolRestCommand):  # @IgnorePep8
 
     def post_discovery_steps(self):
         # Map our devices to their selfLinks
-        resp = self.api.get(self.uri)
-        theirs = dict([(IPAddress(x.address), x) for x in resp['items']])
-        return dict((x, theirs[IPAddress(x.get_discover_address())]) for x in self.devices)
+        return map_devices(self.api, self.uri, self.devices)
 
 
 discover_cloud = None
@@ -206,8 +206,7 @@ class DiscoverAdc(Discover):  # @IgnorePep8
              interval=1)
 
         err_msg = dict()
-        ret = self.api.get(RefreshCurrentConfig.URI)['items']
-        for item in ret:
+        for item in self.api.iterate(RefreshCurrentConfig.URI):
             if item.status != 'FINISHED':
                 err_msg.update(item)
         if err_msg:
@@ -216,7 +215,4 @@ class DiscoverAdc(Discover):  # @IgnorePep8
                              ensure_ascii=False)
             assert "Refresh Current Config failed:\n %s" % msg
 
-        resp = self.api.get(self.uri)
-        theirs = dict([(IPAddress(x.address), x) for x in resp['items']])
-        return dict((x, theirs[IPAddress(x.get_discover_address())])
-                    for x in self.devices)
+        return map_devices(self.api, self.uri, self.devices)
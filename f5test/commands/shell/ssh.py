@@ -8,6 +8,7 @@ from ...interfaces.ssh import SSHInterface
 from ...interfaces.testcase import LOGCOLLECT_CONTAINER
 from ...utils.parsers.version_file import colon_pairs_dict, equals_pairs_dict
 from ...utils.parsers.audit import audit_parse
+from ...utils.parsers.sysstats import sample_command, parse_sample, summarize
 from ...utils.version import Version
 from ...utils.wait import wait, wait_args
 from paramiko import RSAKey
@@ -108,6 +109,47 @@ class ScpGet(ScpPut):  # @IgnorePep8
     upload = False
 
 
+bulk_get = None
+class BulkGet(SSHCommand):  # @IgnorePep8
+    """Copy all files matching a set of remote globs, streamed as one tar over
+    the existing SSH connection. Unlike scp_get, it doesn't need a key
+    exchange nor a new connection.
+
+    @param source: remote glob(s)
+    @type source: str or list
+    @param destination: local directory
+    @type destination: str
+    @param tail: only copy the last N bytes of each file
+    @type tail: int
+    @param tail_lines: only copy the last N lines of each file
+    @type tail_lines: int
+    @param max_size: stop after this many bytes
+    @type max_size: int
+    @param compress: gzip the stream
+    @type compress: bool
+    @param strict: also fail on files that changed while being read
+    @type strict: bool
+
+    @return: the local files
+    """
+    def __init__(self, source, destination, tail=None, tail_lines=None,
+                 max_size=None, compress=True, strict=False, *args, **kwargs):
+        super(BulkGet, self).__init__(*args, **kwargs)
+        self.source = source
+        self.destination = destination
+        self.tail = tail
+        self.tail_lines = tail_lines
+        self.max_size = max_size
+        self.compress = compress
+        self.strict = strict
+
+    def setup(self):
+        return self.api.bulk_get(self.source, self.destination, tail=self.tail,
+                                 tail_lines=self.tail_lines,
+                                 max_size=self.max_size, compress=self.compress,
+                                 strict=self.strict)
+
+
 parse_keyvalue_file = None
 class ParseKeyvalueFile(SSHCommand):  # @IgnorePep8
     """Parses a file and return a dictionary. The file structure sould look like:
@@ -525,24 +567,18 @@ class CollectLogs(SSHCommand):  # @IgnorePep8
         if v.product.is_bigiq and v >= 'bigiq 4.4':
             files.append('/var/log/restjavad*.0.log')
 
-        for filename in files:
-            ret = self.api.run('tail -n %d %s' % (self.LINE_COUNT, filename))
-            local_file = os.path.join(self.dir, os.path.basename(filename))
-            local_file = local_file.replace('*', '_')
-            with open(local_file, "wt") as f:
-                f.write(ret.stdout)
+        self.api.bulk_get(files, self.dir, tail_lines=self.LINE_COUNT)
 
         # Gather the qkview-lite *.tech.out output.
         # Not available in solstice+
         if v.product.is_bigip and v < 'bigip 10.2.2' \
         or v.product.is_em and v < 'em 3.0':
             ret = self.api.run('qkview-lite')
+            if ret.status:
+                LOG.error(ret)
+                raise SSHCommandError(ret)
             self.api.get('/var/log/*.tech.out', self.dir, move=True)
 
-        if ret.status:
-            LOG.error(ret)
-            raise SSHCommandError(ret)
-
 
 file_exists = None
 class FileExists(WaitableCommand, SSHCommand):  # @IgnorePep8
@@ -802,29 +838,35 @@ class GetCurrentMicros(SSHCommand):  # @IgnorePep8
 get_system_stats = None
 class GetSystemStats(SSHCommand):  # @IgnorePep8
     """ Returns values for current disk usage, current cpu usage,
-    and memory usage.
+    and memory usage, all collected in one SSH round-trip.
+
+    @param partition: the filesystem to report the free space for
+    @type partition: str
+    @param top: also return the top N processes by CPU usage in PROCS
+    @type top: int
+    @param jvm: also return the restjavad runtime diagnostics in JVM
+    @type jvm: bool
+    @param since: a previous result for the same device. CPU usage is then
+        the one in between and DELTA holds the other differences.
+    @type since: dict
     @return: dict
     """
-    def __init__(self, partition=None, *args, **kwargs):
+    def __init__(self, partition=None, top=0, jvm=False, since=None, *args,
+                 **kwargs):
         super(GetSystemStats, self).__init__(*args, **kwargs)
         if not partition:
             partition = '/'
         self.partition = partition
+        self.top = top
+        self.jvm = jvm
+        self.since = since
 
     def setup(self):
-        self.usage_stats = AttrDict()
-        cpuUse = str(self.ifc.api.run("mpstat -P ALL | awk '{print $10}'").
-                    stdout).strip().split('\n')[1:]  # skip header line
-        self.usage_stats.CPU = cpuUse[0]
-        self.usage_stats.CPUPERCORE = cpuUse[1:]  # get all but cpu average
-        self.usage_stats.DISK = (str(self.ifc.api.run("df %s | tail -1 | awk '{print $4+0}'" % self.partition).stdout)).rstrip()
-        self.usage_stats.MEM = (str(self.ifc.api.run("free -m | grep Mem | awk '{print $3/$2 * 100.0}'").stdout)).rstrip()
-        self.usage_stats.CPUFORMATTED = "%.2f%%" % (
-                        100 - float(self.usage_stats.CPU))
-        self.usage_stats.CPUFORMATTEDPERCORE = []
-        for cpu in self.usage_stats.CPUPERCORE:
-            self.usage_stats.CPUFORMATTEDPERCORE.append("%.2f%%" % (
-                        100 - float(cpu)))
+        ret = self.api.run(sample_command(self.partition, self.top, self.jvm))
+        sample = parse_sample(ret.stdout)
+        if not sample.cpu:
+            raise SSHCommandError(ret)
+        self.usage_stats = summarize(sample, self.since)
         return self.usage_stats
 
 
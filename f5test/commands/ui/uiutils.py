@@ -10,15 +10,79 @@ from f5test.utils.wait import wait
 from f5test.base import AttrDict
 from selenium.common.exceptions import (NoSuchElementException,
                                         StaleElementReferenceException,
-                                        ElementNotVisibleException)
+                                        ElementNotVisibleException,
+                                        WebDriverException)
 from f5test.interfaces.selenium import ActionChains
-from f5test.interfaces.selenium.driver import By, Is
+from f5test.interfaces.selenium.driver import By, Is, get_atom
 import logging
 import re
 # import time
 
 LOG = logging.getLogger(__name__)
 
+# WebelGrab's bulk script is installed in the page (frame) the first time
+# and called by name afterwards, so that it's not sent with every poll.
+GRAB_MISSING = 'f5testGrab missing'
+GRAB_CALL = ("var grab = window.f5testGrab; "
+             "return grab ? grab.apply(null, arguments) : '%s';" % GRAB_MISSING)
+GRAB_SCRIPT = """
+window.f5testGrab = (function() {
+    var getAttribute = (%(get_attribute)s);
+    var isDisplayed = (%(is_displayed)s);
+    return function(using, selector, attrs, props, jsText) {
+        var els = [], ret = [], i, j;
+        if (using == 'xpath') {
+            var r = document.evaluate(selector, document, null, 7, null);
+            for (i = 0; i < r.snapshotLength; i++) els.push(r.snapshotItem(i));
+        } else if (using == 'css') {
+            els = document.querySelectorAll(selector);
+        } else {
+            var all = document.querySelectorAll('[id]');
+            for (i = 0; i < all.length; i++)
+                if (all[i].id === selector) els.push(all[i]);
+        }
+        for (i = 0; i < els.length; i++) {
+            var el = els[i], a = {}, p = {};
+            if (el.nodeType != 1) throw Error('Not an element: ' + selector);
+            for (j = 0; j < attrs.length; j++) a[attrs[j]] = getAttribute(el, attrs[j]);
+            for (j = 0; j < props.length; j++) {
+                var n = props[j];
+                if (n == 'text') { if (jsText) p.text = el.innerHTML; }
+                else if (n == 'tag_name') p.tag = el.tagName.toLowerCase();
+                else if (n == 'is_displayed') p.is_displayed = isDisplayed(el);
+                else if (n == 'is_enabled') p.is_enabled = !el.disabled;
+                else if (n != 'id') p[n] = getAttribute(el, n);
+            }
+            ret.push([el, a, p]);
+        }
+        return ret;
+    };
+})();
+return window.f5testGrab.apply(null, arguments);
+"""
+# Used when the selenium package doesn't ship its JS atoms.
+GET_ATTRIBUTE_JS = """function(e, n) {
+    var v = e.getAttribute(n);
+    if (v === null && n in e && e[n] !== null && typeof e[n] != 'object') v = e[n];
+    return v === null || v === undefined ? null : String(v);
+}"""
+IS_DISPLAYED_JS = """function(e) {
+    if (!(e.offsetWidth || e.offsetHeight || e.getClientRects().length)) return false;
+    var style = window.getComputedStyle(e);
+    return style.visibility != 'hidden' && style.display != 'none';
+}"""
+_grab_script = None
+
+
+def get_grab_script():
+    """The bulk script, using the same getAttribute/isDisplayed atoms as the
+    WebElement methods when available."""
+    global _grab_script
+    if _grab_script is None:
+        _grab_script = GRAB_SCRIPT % dict(get_attribute=get_atom('getAttribute.js', GET_ATTRIBUTE_JS),
+                                          is_displayed=get_atom('isDisplayed.js', IS_DISPLAYED_JS))
+    return _grab_script
+
 
 class WrongParameterPassedMethodCheck(Exception):
     """Error to be raised in case Parameters are not passed properly..."""
@@ -48,9 +112,15 @@ class WebelGrab(SeleniumCommand):  # @IgnorePep8
     @type use_js: bool
     @param use_js: Default True. To use js (force) to fetch text
 
+    @type bulk: bool
+    @param bulk: Default True. Find the elements and read all attributes and
+                 properties in one script call, instead of one WebDriver call
+                 per element per attribute. Falls back to the latter if the
+                 script fails.
+
     """
     def __init__(self, xpath=None, did=None, css=None, attr=None, prop=None,
-                 use_js=True,
+                 use_js=True, bulk=True,
                  *args, **kwargs):
         super(WebelGrab, self).__init__(*args, **kwargs)
 
@@ -69,47 +139,31 @@ class WebelGrab(SeleniumCommand):  # @IgnorePep8
         self.attr = attr
         self.prop = prop
         self.use_js = use_js
+        self.bulk = bulk
 
     def setup(self):
         s = self.api
         # To Do: Validate xpath el
         rlist = []
         using = None
-        container = []
         try:
             if self.xpath:
                 using = "xpath"
-                container = s.find_elements_by_xpath(self.xpath)
             elif self.css:
                 using = "css"
-                container = s.find_elements_by_css_selector(self.css)
             elif self.did:
                 using = "id"
-                container = s.find_elements_by_id(self.did)
-            for el in container:
-                dic_per_tag = AttrDict()
-                if self.attr != []:
-                    for a_id in self.attr:
-                        dic_per_tag[a_id] = el.get_attribute(a_id)
-                if self.prop != []:
-                    for p_id in self.prop:
-                        if p_id == 'text':
-                            if self.use_js:
-                                text = s.execute_script("return arguments[0].innerHTML", el)
-                            else:
-                                text = el.text
-                            dic_per_tag['text'] = text
-                        elif p_id == 'id':
-                            dic_per_tag['id'] = el.id
-                        elif p_id == 'tag_name':
-                            dic_per_tag['tag'] = el.tag_name
-                        elif p_id == 'is_displayed':
-                            dic_per_tag['is_displayed'] = el.is_displayed()
-                        elif p_id == 'is_enabled':
-                            dic_per_tag['is_enabled'] = el.is_enabled()
-                        else:
-                            dic_per_tag[p_id] = el.get_attribute(p_id)
-                rlist.append(dic_per_tag)
+            if self.bulk:
+                try:
+                    rlist = self.grab_bulk(using, self.xpath or self.css or self.did)
+                except StaleElementReferenceException:
+                    raise
+                except WebDriverException, e:
+                    LOG.debug('/webel_grab/bulk failed, grabbing one by one: %s', e)
+                    rlist = None
+            if rlist is None or not self.bulk:
+                rlist = []
+                self.grab(using, rlist)
             LOG.debug('/webel_grab/.list returned: {0} dict(s) in list for '
                       '{2}: [{1}]. LIST=[{3}]'
                       .format(len(rlist),
@@ -121,6 +175,67 @@ class WebelGrab(SeleniumCommand):  # @IgnorePep8
         except StaleElementReferenceException:
             return rlist
 
+    def grab_bulk(self, using, selector):
+        """Finds the elements and reads everything in one script."""
+        s = self.api
+        ret = s.execute_script(GRAB_CALL, using, selector, self.attr,
+                               self.prop, self.use_js)
+        if ret == GRAB_MISSING:
+            ret = s.execute_script(get_grab_script(), using, selector,
+                                   self.attr, self.prop, self.use_js)
+        rlist = []
+        for el, attrs, props in ret:
+            dic_per_tag = AttrDict()
+            for a_id in self.attr:
+                dic_per_tag[a_id] = attrs.get(a_id)
+            for p_id in self.prop:
+                if p_id == 'text':
+                    dic_per_tag['text'] = props['text'] if self.use_js \
+                        else el.text
+                elif p_id == 'id':
+                    dic_per_tag['id'] = el.id
+                elif p_id == 'tag_name':
+                    dic_per_tag['tag'] = props.get('tag')
+                else:
+                    dic_per_tag[p_id] = props.get(p_id)
+            rlist.append(dic_per_tag)
+        return rlist
+
+    def grab(self, using, rlist):
+        """Finds the elements and reads them one WebDriver call at a time."""
+        s = self.api
+        container = []
+        if using == "xpath":
+            container = s.find_elements_by_xpath(self.xpath)
+        elif using == "css":
+            container = s.find_elements_by_css_selector(self.css)
+        elif using == "id":
+            container = s.find_elements_by_id(self.did)
+        for el in container:
+            dic_per_tag = AttrDict()
+            if self.attr != []:
+                for a_id in self.attr:
+                    dic_per_tag[a_id] = el.get_attribute(a_id)
+            if self.prop != []:
+                for p_id in self.prop:
+                    if p_id == 'text':
+                        if self.use_js:
+                            text = s.execute_script("return arguments[0].innerHTML", el)
+                        else:
+                            text = el.text
+                        dic_per_tag['text'] = text
+                    elif p_id == 'id':
+                        dic_per_tag['id'] = el.id
+                    elif p_id == 'tag_name':
+                        dic_per_tag['tag'] = el.tag_name
+                    elif p_id == 'is_displayed':
+                        dic_per_tag['is_displayed'] = el.is_displayed()
+                    elif p_id == 'is_enabled':
+                        dic_per_tag['is_enabled'] = el.is_enabled()
+                    else:
+                        dic_per_tag[p_id] = el.get_attribute(p_id)
+            rlist.append(dic_per_tag)
+
 
 def wait_for_text_in_webel(text, xpath=None, did=None, css=None,
                            mtm=False,
@@ -523,7 +638,8 @@ def wait_for_webel(xpath=None, did=None, css=None,
 
     usedin = "{0}/waitforwebel/".format(usedin if usedin else "")
 
-    prop = ['text', 'is_displayed']
+    # Only the presence of the elements matters.
+    prop = []
 
     def to_be():
         x = webel_grab(xpath=xpath, did=did, css=css,
@@ -1,4 +1,4 @@
-from .core import (ConfigInterface, DeviceAccess,
+from .core import (ConfigInterface, DeviceAccess, DeviceRegistry,
                    ConfigError, DeviceCredential, DeviceDoesNotExist,
                    KEYSET_ALL, KEYSET_COMMON, KEYSET_DEFAULT, KEYSET_LOCK,
                    ADMIN_ROLE, ROOT_ROLE, DEFAULT_ROLE, expand_devices)
@@ -9,11 +9,15 @@ from ...defaults import ADMIN_PASSWORD, ADMIN_USERNAME, ROOT_PASSWORD, \
 from ...compat import _bool
 from ...utils import net
 from ...utils.dicts import inverse
+import collections
 import copy
-from fnmatch import fnmatch
+import fnmatch
 import logging
 import os
+import re
+import threading
 import time
+import weakref
 from hashlib import md5
 
 LOG = logging.getLogger(__name__)
@@ -30,6 +34,7 @@ DEFAULT_ROLE = 2
 
 CFG_DEVICES = 'devices'
 CFG_SELENIUM = 'selenium'
+GLOB_CHARS = re.compile(r'[*?[]')
 
 
 class ConfigError(Exception):
@@ -45,19 +50,18 @@ class DeviceDoesNotExist(ConfigError):
 def expand_devices(specs, section=CFG_DEVICES):
     devices = []
     cfgifc = ConfigInterface()
-    all_devices = sorted(cfgifc.get_all_devices(kind=KIND_ANY),
-                         key=lambda x: x.alias)
     aliases = specs.get(section) if isinstance(specs, dict) else specs
     aliases = [aliases] if isinstance(specs, basestring) else aliases
     if aliases is None:
         return
+    registry = cfgifc.get_registry()
     for device in aliases:
         if device == '^all':  # Backward compatibility and deprecated
             all_tmos = sorted(cfgifc.get_all_devices(kind=KIND_TMOS),
                               key=lambda x: x.alias)
             devices.extend(all_tmos)
             break
-        devices.extend([x for x in all_devices if fnmatch(x.alias, device)])
+        devices.extend([x for x in registry.match(device) if x.enabled])
     return devices
 
 
@@ -176,6 +180,179 @@ class DeviceAccess(object):
             self.groups = self.groups.union(groups)
 
 
+class DeviceRegistry(object):
+    """Interned DeviceAccess objects of one devices config section, indexed by
+    alias, address (and discover address), kind, tag and group.
+
+    Indexes are built lazily and rebuilt when the section changes, that is
+    when a device is added, removed, replaced or when one of its indexed
+    properties changes. Use invalidate() after changing anything else (e.g.
+    credentials) in place.
+
+    There's one registry per devices section, shared by all ConfigInterfaces.
+    Callers get shallow copies of the interned objects, so that they can
+    change them (e.g. alias or groups) without affecting anyone else.
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, devices, factory, callback=None):
+        """
+        @param devices: The devices section of the config
+        @type devices: dict
+        @param factory: Builds a DeviceAccess from an (alias, specs) tuple
+        @type factory: callable
+        """
+        try:
+            self._devices = weakref.ref(devices, callback)
+        except TypeError:  # Plain dicts can't be weakly referenced.
+            self._devices = lambda: devices
+        self.factory = factory
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._interned = {}
+        self._patterns = {}
+
+    @classmethod
+    def get_instance(cls, devices, factory):
+        key = id(devices)
+        with cls._instances_lock:
+            registry = cls._instances.get(key)
+            if registry is None or registry._devices() is not devices:
+                registry = cls(devices, factory,
+                               lambda _: cls._instances.pop(key, None))
+                if isinstance(registry._devices, weakref.ref):
+                    cls._instances[key] = registry
+            return registry
+
+    @staticmethod
+    def _get_device_stamp(specs):
+        return (id(specs), specs.get('address'), specs.get('discover address'),
+                specs.get('kind'), repr(specs.get('tags')),
+                repr(specs.get('groups')))
+
+    def _get_stamp(self):
+        devices = self._devices() or {}
+        return tuple((alias, self._get_device_stamp(specs))
+                     for alias, specs in devices.iteritems() if specs)
+
+    @staticmethod
+    def _copy(device):
+        ret = copy.copy(device)
+        ret.credentials = copy.copy(device.credentials)
+        ret.tags = set(device.tags)
+        ret.groups = set(device.groups)
+        ret.ports = copy.copy(device.ports)
+        return ret
+
+    def invalidate(self):
+        with self._lock:
+            self._stamp = None
+            self._interned.clear()
+
+    def refresh(self):
+        stamp = self._get_stamp()
+        with self._lock:
+            if stamp != self._stamp:
+                self._build(stamp)
+
+    def _build(self, stamp):
+        devices = self._devices() or {}
+        interned = {}
+        self.by_alias = collections.OrderedDict()
+        self.by_address = {}
+        self.by_kind = {}
+        self.by_tag = {}
+        self.by_group = {}
+        self.sorted = []
+        self._any_kind = []
+        self._matches = {}
+
+        for alias, device_stamp in stamp:
+            device = self._interned.get(alias)
+            if device is None or device._stamp != device_stamp:
+                device = self.factory(alias, devices[alias])
+                device._stamp = device_stamp
+            interned[alias] = device
+
+            self.by_alias[alias] = device
+            addresses = [device.address]
+            if device.discover_address not in (None, device.address):
+                addresses.append(device.discover_address)
+            for address in addresses:
+                self.by_address.setdefault(address, []).append(device)
+            if not device.kind.bits:
+                self._any_kind.append(device)
+            for i in range(len(device.kind.bits)):
+                key = tuple(device.kind.bits[:i + 1])
+                self.by_kind.setdefault(key, []).append(device)
+            for tag in device.tags:
+                self.by_tag.setdefault(tag, []).append(device)
+            for group in device.groups:
+                self.by_group.setdefault(group, []).append(device)
+
+        self.sorted = sorted(self.by_alias.values(), key=lambda x: x.alias)
+        self._interned = interned
+        self._stamp = stamp
+
+    def get(self, alias):
+        """Returns a copy of the interned DeviceAccess for alias, or None."""
+        specs = (self._devices() or {}).get(alias)
+        if not specs:
+            return None
+        with self._lock:
+            device = self._interned.get(alias)
+            if device is None or device._stamp != self._get_device_stamp(specs):
+                device = self.factory(alias, specs)
+                device._stamp = self._get_device_stamp(specs)
+                self._interned[alias] = device
+                # Indexes are stale now.
+                self._stamp = None
+            return self._copy(device)
+
+    def get_by_address(self, address):
+        """All devices with this address or discover address."""
+        self.refresh()
+        return map(self._copy, self.by_address.get(address, []))
+
+    def get_by_tag(self, tag):
+        self.refresh()
+        return map(self._copy, self.by_tag.get(tag, []))
+
+    def get_by_group(self, group):
+        self.refresh()
+        return map(self._copy, self.by_group.get(group, []))
+
+    def get_by_kind(self, kind=KIND_ANY):
+        """All devices of kind (or its sub-kinds), in config order."""
+        self.refresh()
+        kind = Kind(kind)
+        if not kind.bits:
+            return map(self._copy, self.by_alias.values())
+        devices = self.by_kind.get(tuple(kind.bits), [])
+        if self._any_kind:
+            devices = [x for x in self.by_alias.values() if x.kind == kind]
+        return map(self._copy, devices)
+
+    def match(self, pattern):
+        """All devices with aliases matching the glob pattern, sorted by alias."""
+        self.refresh()
+        with self._lock:
+            ret = self._matches.get(pattern)
+            if ret is None:
+                if not GLOB_CHARS.search(pattern):
+                    device = self.by_alias.get(pattern)
+                    ret = [device] if device else []
+                else:
+                    regex = self._patterns.get(pattern)
+                    if regex is None:
+                        regex = re.compile(fnmatch.translate(pattern))
+                        self._patterns[pattern] = regex
+                    ret = [x for x in self.sorted if regex.match(x.alias)]
+                self._matches[pattern] = ret
+            return map(self._copy, ret)
+
+
 class Session(object):
 
     def __init__(self, config):
@@ -250,7 +427,8 @@ class ConfigInterface(Interface):
         return list(filter(lambda x: _bool(x.get('default')),
                            collection.values()))[0]
 
-    def _get_roles(self, specs):
+    @staticmethod
+    def _get_roles(specs):
         default = Options()
         default.default = DeviceCredential(specs.get('username'),
                                            specs.get('password'))
@@ -296,13 +474,22 @@ class ConfigInterface(Interface):
         except KeyError:
             raise DeviceDoesNotExist(device)
 
-        roles = self._get_roles(specs)
-        return DeviceAccess(specs['address'], credentials=roles, alias=device,
+        return self.get_registry().get(device)
+
+    def get_registry(self):
+        """The DeviceRegistry of the current config."""
+        return DeviceRegistry.get_instance(self.config.get(CFG_DEVICES) or {},
+                                           self._make_device)
+
+    @staticmethod
+    def _make_device(alias, specs):
+        roles = ConfigInterface._get_roles(specs)
+        return DeviceAccess(specs['address'], credentials=roles, alias=alias,
                             specs=specs)
 
     def get_device_by_address(self, address):
-        for device in self.get_all_devices():
-            if device.address == address or device.discover_address == address:
+        for device in self.get_registry().get_by_address(address):
+            if device.kind == KIND_TMOS and device.enabled:
                 return device
         LOG.warning('A device with address %s was NOT found in the configuration!', address)
 
@@ -313,11 +500,18 @@ class ConfigInterface(Interface):
     def get_all_devices(self, kind=KIND_TMOS, only_enabled=True):
         if not self.config.get(CFG_DEVICES):
             raise StopIteration
-        for device in self.config[CFG_DEVICES]:
-            device = self.get_device(device)
-            if device.kind == kind and (not only_enabled or device.enabled):
+        for device in self.get_registry().get_by_kind(kind):
+            if not only_enabled or device.enabled:
                 yield device
 
+    def get_devices_by_tag(self, tag, kind=KIND_ANY, only_enabled=True):
+        return [x for x in self.get_registry().get_by_tag(tag)
+                if x.kind == kind and (not only_enabled or x.enabled)]
+
+    def get_devices_by_group(self, group, kind=KIND_ANY, only_enabled=True):
+        return [x for x in self.get_registry().get_by_group(group)
+                if x.kind == kind and (not only_enabled or x.enabled)]
+
     def get_device_groups(self, devices=None):
         if devices is None:
             devices = self.get_all_devices()
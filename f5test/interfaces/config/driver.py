@@ -7,15 +7,24 @@ from ...base import AttrDict
 from ...utils.dicts import merge
 from ...utils.net import get_local_ip
 from blinker import Signal
+import cPickle as pickle
+import hashlib
 import os
 import logging
 import sys
+import tempfile
 import threading
 
 LOG = logging.getLogger(__name__)
 CONFIG = threading.local()
 EXTENDS_KEYWORD = '$extends'
 PEER_IP = '224.0.0.1'
+# Compiled configs are persisted here. Set to an empty string to keep them in
+# memory only.
+CACHE_DIR = os.environ.get('F5TEST_CONFIG_CACHE',
+                           os.path.join(os.path.expanduser('~'), '.cache',
+                                        'f5test', 'config'))
+CACHE_VERSION = 1
 
 
 class Signals(object):
@@ -24,26 +33,177 @@ class Signals(object):
     on_after_extend = Signal()
 
 
+def file_digest(filename):
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class Environ(object):
+    """Wraps os.environ and records the variables that are looked up."""
+
+    def __init__(self, deps):
+        self.deps = deps
+
+    def __getitem__(self, key):
+        value = os.environ.get(key)
+        self.deps.environ[key] = value
+        if value is None:
+            raise KeyError(key)
+        return value
+
+
+class Dependencies(object):
+    """Files and environment variables a compiled config was built from."""
+
+    def __init__(self):
+        self.files = {}
+        self.environ = {}
+
+    def add_file(self, filename):
+        st = os.stat(filename)
+        self.files[filename] = (st.st_mtime, st.st_size, file_digest(filename))
+
+    def update(self, other):
+        self.files.update(other.files)
+        self.environ.update(other.environ)
+
+    def is_fresh(self):
+        for key, value in self.environ.iteritems():
+            if os.environ.get(key) != value:
+                LOG.debug('Environment variable %s changed.', key)
+                return False
+
+        for filename, (mtime, size, digest) in self.files.items():
+            try:
+                st = os.stat(filename)
+                if (st.st_mtime, st.st_size) == (mtime, size):
+                    continue
+                # Touched but not changed (e.g. after a checkout).
+                if st.st_size == size and file_digest(filename) == digest:
+                    self.files[filename] = (st.st_mtime, size, digest)
+                    continue
+            except (IOError, OSError):
+                pass
+            LOG.debug('%s changed.', filename)
+            return False
+        return True
+
+
+class ConfigCache(object):
+    """Memory and disk cache of compiled (i.e. extended and substituted)
+    config files.
+
+    Each file gets its own entry, holding a pickled copy of the config along
+    with the Dependencies it was compiled from. Entries are checked against
+    the mtime (or the SHA1 when the mtime changed) of these files, so editing
+    a base file only invalidates the files that extend it.
+    """
+
+    def __init__(self, path=CACHE_DIR):
+        self.path = path
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _get_key(self, filename, *tags):
+        key = ':'.join(map(str, (CACHE_VERSION, filename) + tags))
+        return hashlib.sha1(key).hexdigest()
+
+    def _load_entry(self, key):
+        if not self.path:
+            return None
+        try:
+            with open(os.path.join(self.path, key), 'rb') as f:
+                return pickle.load(f)
+        except IOError:
+            return None
+        except Exception, e:
+            LOG.debug('Corrupt config cache entry %s: %s', key, e)
+            return None
+
+    def _dump_entry(self, key, entry):
+        if not self.path:
+            return
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path)
+            fd, tmp = tempfile.mkstemp(dir=self.path)
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp, os.path.join(self.path, key))
+        except (IOError, OSError), e:
+            LOG.debug('Cannot save config cache entry: %s', e)
+
+    def get(self, filename, *tags):
+        """Returns a (config, deps) tuple or None if there's no fresh entry.
+
+        The returned config is always a new copy.
+        """
+        key = self._get_key(filename, *tags)
+        with self._lock:
+            entry = self._entries.get(key) or self._load_entry(key)
+            if entry is None:
+                return None
+            blob, deps = entry
+            if not deps.is_fresh():
+                self._entries.pop(key, None)
+                return None
+            self._entries[key] = entry
+        return pickle.loads(blob), deps
+
+    def set(self, filename, config, deps, *tags):
+        key = self._get_key(filename, *tags)
+        try:
+            blob = pickle.dumps(config, pickle.HIGHEST_PROTOCOL)
+        except Exception, e:
+            LOG.debug('Cannot pickle config %s: %s', filename, e)
+            return
+        entry = (blob, deps)
+        with self._lock:
+            self._entries[key] = entry
+            self._dump_entry(key, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+CACHE = ConfigCache()
+
+
 class ConfigLoader(object):
 
-    def __init__(self, filename, fmt=None):
+    def __init__(self, filename, fmt=None, cache=CACHE):
         self.loaders = {'yaml': self.load_yaml,
                         'json': self.load_json,
                         'ini': self.load_ini,
                         'py': self.load_python}
         self.filename = filename
         self.fmt = fmt
+        self.cache = cache
 
     def load(self):
         # Load the configuration file:
         Signals.on_before_load.send(self, filename=self.filename)
-        main_config = self.load_any(self.filename)
+        filename = os.path.abspath(self.filename)
+
+        ret = None
+        if self.cache and not Signals.on_before_extend.receivers:
+            ret = self.cache.get(filename, self.fmt, 'AttrDict')
+
+        if ret:
+            config = ret[0]
+        else:
+            deps = Dependencies()
+            main_config = self.load_any(filename, deps)
+
+            config_dir = os.path.dirname(filename)
+            Signals.on_before_extend.send(self, config=main_config)
+            config = self.extend(config_dir, main_config, deps=deps)
 
-        config_dir = os.path.dirname(self.filename)
-        Signals.on_before_extend.send(self, config=main_config)
-        config = self.extend(config_dir, main_config)
+            config = AttrDict(config)
+            if self.cache and not Signals.on_before_extend.receivers:
+                self.cache.set(filename, config, deps, self.fmt, 'AttrDict')
 
-        config = AttrDict(config)
         config['_filename'] = self.filename
         config['_argv'] = ' '.join(sys.argv)
         config['_cwd'] = os.getcwd()
@@ -52,7 +212,25 @@ class ConfigLoader(object):
         Signals.on_after_extend.send(self, config=config)
         return config
 
-    def extend(self, cwd, config, extra=None):
+    def compile(self, filename, deps=None):
+        """Load a config file and resolve its bases, using the cache."""
+        if deps is None:
+            deps = Dependencies()
+
+        ret = self.cache.get(filename, self.fmt) if self.cache else None
+        if ret:
+            config, file_deps = ret
+        else:
+            file_deps = Dependencies()
+            config = self.extend(os.path.dirname(filename),
+                                 self.load_any(filename, file_deps),
+                                 deps=file_deps)
+            if self.cache:
+                self.cache.set(filename, config, file_deps, self.fmt)
+        deps.update(file_deps)
+        return config
+
+    def extend(self, cwd, config, extra=None, deps=None):
         bases = config.get(EXTENDS_KEYWORD) or []
         if bases and isinstance(bases, basestring):
             bases = [bases]
@@ -67,40 +245,42 @@ class ConfigLoader(object):
 
         for filename in reversed(bases):
             filename = os.path.join(cwd, filename)
-            base_config = self.extend(os.path.dirname(filename),
-                                      self.load_any(filename))
+            base_config = self.compile(filename, deps)
             # Substitute {0[..]} tokens. Works only with strings.
-            self.subst_variables(config, base_config)
+            self.subst_variables(config, base_config, deps)
             config = merge(base_config, config)
         return config
 
-    def subst_variables(self, src, root=None):
+    def subst_variables(self, src, root=None, deps=None):
         if not root:
             root = src
+        env = Environ(deps) if deps else os.environ
 
         def _subst(hashable, key):
             try:
                 if isinstance(hashable[key], basestring):
-                    hashable[key] = hashable[key].format(CFG=root, ENV=os.environ)
+                    hashable[key] = hashable[key].format(CFG=root, ENV=env)
             except (KeyError, ValueError):
                 LOG.debug('Key %s cannot be formatted.', v)
 
         if isinstance(src, dict):
             for k, v in src.iteritems():
                 if isinstance(v, dict):
-                    self.subst_variables(v, root)
+                    self.subst_variables(v, root, deps)
                 elif isinstance(v, basestring):
                     _subst(src, k)
                 elif isinstance(v, (list, tuple)):
                     for i in range(len(v)):
                         if isinstance(v[i], dict):
-                            self.subst_variables(v[i], root)
+                            self.subst_variables(v[i], root, deps)
                         else:
                             _subst(v, i)
 
-    def load_any(self, filename):
+    def load_any(self, filename, deps=None):
         fmt = self.fmt or os.path.splitext(filename)[1][1:]
         assert fmt in self.loaders, 'Unknown format: %s' % fmt
+        if deps is not None:
+            deps.add_file(filename)
         return self.loaders[fmt](filename)
 
     @staticmethod
@@ -2,3 +2,4 @@ from .core import IcontrolInterface
 from .em import EMInterface
 from .driver import (AuthFailed, UnknownMethod, IControlTransportError,
                      IControlFault)
+from .batch import Batch
@@ -0,0 +1,206 @@
+'''
+Created on Oct 17, 2026
+
+@author: jono
+'''
+import logging
+import sys
+
+LOG = logging.getLogger(__name__)
+# Read methods which take parallel arrays and return one item per element.
+MERGEABLE_PREFIXES = ('get_', 'is_', 'query')
+# ...except these, which return a struct (e.g. statistics and a time stamp).
+UNMERGEABLE_NAMES = ('statistics',)
+# (chain, name) of methods which turned out not to return an array.
+UNMERGEABLE = set()
+
+
+class BatchCall(object):
+    """One recorded call. The result is available after Batch.run()."""
+
+    def __init__(self, chain, name, args, kwargs):
+        self.chain = chain
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        self._done = False
+        self._result = None
+        self._exc_info = None
+
+    def __repr__(self):
+        return "<BatchCall: %s.%s>" % ('.'.join(self.chain), self.name)
+
+    @property
+    def size(self):
+        """The length of the array arguments, or None if not mergeable."""
+        if self.args or not self.name.startswith(MERGEABLE_PREFIXES) or \
+           any(x in self.name for x in UNMERGEABLE_NAMES) or \
+           (tuple(self.chain), self.name) in UNMERGEABLE:
+            return None
+        sizes = set(len(x) if isinstance(x, (list, tuple)) else None
+                    for x in self.kwargs.values())
+        if len(sizes) == 1:
+            size = sizes.pop()
+            if size:
+                return size
+        elif not sizes:
+            return 0
+        return None
+
+    def key(self):
+        return (tuple(self.chain), self.name, tuple(sorted(self.kwargs)))
+
+    def set_result(self, result):
+        self._result = result
+        self._done = True
+
+    def set_exception(self, exc_info):
+        self._exc_info = exc_info
+        self._done = True
+
+    def result(self):
+        if not self._done:
+            raise ValueError('%s has not been run yet.' % self)
+        if self._exc_info:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+
+class _Path(object):
+
+    def __init__(self, batch, chain):
+        self._batch = batch
+        self._chain = chain
+
+    def __getattr__(self, name):
+        if name[0] == '_':
+            raise AttributeError(name)
+        return _Path(self._batch, self._chain + [name])
+
+    def __call__(self, *args, **kwargs):
+        call = BatchCall(self._chain[:-1], self._chain[-1], args, kwargs)
+        self._batch.calls.append(call)
+        return call
+
+
+class Batch(object):
+    """Collects iControl calls and runs them with as few requests as possible.
+
+    Read calls to the same method with the same (array) arguments are merged
+    into one call over the concatenated arrays, and the result is split back.
+    Identical calls without arguments (e.g. get_list()) are made only once.
+    Everything else runs as is, in order, and reads are never moved across
+    it.
+
+    >>> with ic.batch() as b:
+    ...     states = [b.LocalLB.Pool.get_object_status(pool_names=[x])
+    ...               for x in pools]
+    >>> [x.result() for x in states]
+    """
+
+    def __init__(self, icontrol):
+        self.icontrol = icontrol
+        self.calls = []
+
+    def __getattr__(self, name):
+        if name[0] == '_':
+            raise AttributeError(name)
+        return _Path(self, [name])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.run()
+
+    def _method(self, call):
+        obj = self.icontrol
+        for name in call.chain + [call.name]:
+            obj = getattr(obj, name)
+        return obj
+
+    def _run_group(self, calls):
+        first = calls[0]
+        method = self._method(first)
+        if first.size == 0:
+            result = method()
+            for call in calls:
+                call.set_result(result)
+            return
+
+        kwargs = dict((x, []) for x in first.kwargs)
+        for call in calls:
+            for name, value in call.kwargs.iteritems():
+                kwargs[name].extend(value)
+        try:
+            result = method(**kwargs)
+        except Exception:
+            if len(calls) == 1:
+                raise
+            # One bad element fails the whole merged call, so find out
+            # which of the calls it belongs to.
+            LOG.debug('Merged %s failed, running %d calls separately.', first,
+                      len(calls))
+            self._run_each(method, calls)
+            return
+
+        if isinstance(result, (list, tuple)) and \
+           len(result) == sum(x.size for x in calls):
+            i = 0
+            for call in calls:
+                call.set_result(result[i:i + call.size])
+                i += call.size
+        else:
+            # Not an array result after all, don't merge it again.
+            LOG.debug('Unexpected result from %s, not merging.', first)
+            UNMERGEABLE.add((tuple(first.chain), first.name))
+            if len(calls) == 1:
+                first.set_result(result)
+            else:
+                self._run_each(method, calls)
+
+    def _run_each(self, method, calls):
+        for call in calls:
+            try:
+                call.set_result(method(**call.kwargs))
+            except Exception:
+                call.set_exception(sys.exc_info())
+
+    def run(self):
+        """Runs all pending calls and returns their results, in order.
+
+        The first error is raised after all calls were attempted.
+        """
+        calls, self.calls = self.calls, []
+
+        groups = {}
+        order = []
+        for call in calls:
+            if call.size is None:
+                order.append([call])
+                # Reads recorded after this call must not be merged with
+                # the ones recorded before it.
+                groups = {}
+                continue
+            group = groups.get(call.key())
+            if group is None:
+                group = groups[call.key()] = []
+                order.append(group)
+            group.append(call)
+
+        LOG.debug('iControl batch: %d calls in %d requests.', len(calls),
+                  len(order))
+        for group in order:
+            try:
+                if len(group) == 1 and group[0].size is None:
+                    call = group[0]
+                    call.set_result(self._method(call)(*call.args,
+                                                       **call.kwargs))
+                else:
+                    self._run_group(group)
+            except Exception:
+                for call in group:
+                    call.set_exception(sys.exc_info())
+
+        return [x.result() for x in calls]
@@ -34,10 +34,10 @@ Pycontrol, version 3. Written by Ionut Turturica for F5 Networks, Inc.
 Tested with SOAPpy 0.12.5:
     https://github.com/pelletier/SOAPpy
 """
-import socket
 import SOAPpy
 import logging
 import urllib
+from .transport import KeepAliveTransport
 LOG = logging.getLogger(__name__)
 
 ICONTROL_URL = "%(proto)s://%(username)s:%(password)s@%(hostname)s:%(port)s/iControl/iControlPortal.cgi"
@@ -122,11 +122,11 @@ class Icontrol(object):
                 ns = parent._icontrol_ns + ':' + '/'.join(chain)
                 if parent._url_params:
                     url = "%s?%s" % (url, urllib.urlencode(parent._url_params))
-                    parent._cache.clear()
 
                 p = parent
-                if p._cache.get(ns) is not None:
-                    ic = p._cache[ns]
+                key = (url, ns, p._session, p.timeout)
+                if p._cache.get(key) is not None:
+                    ic = p._cache[key]
                 else:
                     if parent._session:
                         headers = SOAPpy.Types.headerType()
@@ -135,19 +135,17 @@ class Icontrol(object):
                         sess_t._setAttr('xmlns:myns1', parent._icontrol_ns)
                         headers._addItem('myns1:session', sess_t)
                         ic = SOAPpy.SOAPProxy(url, ns, header=headers,
+                                              transport=KeepAliveTransport,
                                               timeout=p.timeout)
                     else:
-                        ic = SOAPpy.SOAPProxy(url, ns, timeout=p.timeout)
-                    p._cache[ns] = ic
+                        ic = SOAPpy.SOAPProxy(url, ns,
+                                              transport=KeepAliveTransport,
+                                              timeout=p.timeout)
+                    p._cache[key] = ic
                     #ic.config.debug = p._debug
                     ic.simplify_objects = 1
 
                 try:
-                    # An ugly way of setting the timeout per socket, but it
-                    # seems that SOAPpy is ignoring the timeout parameter set in
-                    # the SOAPProxy constructor.
-                    before = socket.getdefaulttimeout()
-                    socket.setdefaulttimeout(p.timeout)
                     if p._debug:
                         LOG.debug("%s -> %s.%s(%s)", url, '.'.join(chain), self._name,
                                  ', '.join(['%s=%s' % (x, y) for x, y in kw.items()]))
@@ -163,8 +161,6 @@ class Icontrol(object):
                     if 401 == e.code:
                         raise AuthFailed(e)
                     raise IControlTransportError(e)
-                finally:
-                    socket.setdefaulttimeout(before)
 
         def __repr__(self):
             return "<%s>" % self._name
@@ -175,6 +171,11 @@ class Icontrol(object):
             if name[0] != "_":
                 return self.__class__(name, self)
 
+    def batch(self):
+        """Returns a Batch to record several calls and run them together."""
+        from .batch import Batch
+        return Batch(self)
+
     def __getattr__(self, name):
         if name in ('__del__', '__getinitargs__', '__getnewargs__',
            '__getstate__', '__setstate__', '__reduce__', '__reduce_ex__'):
@@ -1,6 +1,11 @@
 # represents a hash table with key/value pairs, a put() over
 # an existing key replaces the value of that key
 from xml.dom.minidom import parseString
+try:
+    from xml.etree.cElementTree import iterparse
+except ImportError:
+    from xml.etree.ElementTree import iterparse
+from cStringIO import StringIO
 
 def isnumber(n):
     return hasattr(n, '__int__')
@@ -44,20 +49,18 @@ class Dictionary:
     
     def to_string(self):
         strList = []
+        self.write(strList)
+        return ''.join(strList)
+
+    def write(self, strList):
         strList.append('<dictionary>')
         for key in self.keys():
             strList.append('<entry><key>')
             strList.append(key)
             strList.append('</key><value>')
-            try:
-                strList.append(self.get(key).to_string())
-            except:
-                strList.append('<string>')
-                strList.append(str(self.get(key)))
-                strList.append('</string>')
+            writeValue(self.get(key), strList)
             strList.append('</value></entry>')
         strList.append('</dictionary>')
-        return ''.join(strList)
     
     def read(self, dictElement):
         kids = findDescendents(dictElement, 'entry')
@@ -124,6 +127,10 @@ class Table:
     
     def to_string(self):
         strList = []
+        self.write(strList)
+        return ''.join(strList)
+
+    def write(self, strList):
         strList.append('<table><columns>')
         for col in self.cols:
             strList.append('<column>%s</column>' % col)
@@ -135,7 +142,6 @@ class Table:
                     strList.append('<value>%s</value>' % col)
             strList.append('</row>')
         strList.append('</rows></table>')
-        return ''.join(strList)
     
     def read(self, tableElement):
         colsNode = findFirstDescendent(tableElement, 'columns')
@@ -191,18 +197,16 @@ class Array:
     
     def to_string(self):
         strList = []
+        self.write(strList)
+        return ''.join(strList)
+
+    def write(self, strList):
         strList.append('<array>')
-        for i in range(self.len()):
+        for item in self.data:
             strList.append('<value>')
-            try:
-                strList.append(self.at(i).to_string())
-            except:
-                strList.append('<string>')
-                strList.append(str(self.at(i)))
-                strList.append('</string>')
+            writeValue(item, strList)
             strList.append('</value>')
         strList.append('</array>')
-        return ''.join(strList)
     
     def read(self, arrayElement):
         values = findDescendents(arrayElement, 'value')
@@ -245,30 +249,36 @@ class String:
         return self.data
     
     def to_string(self):
-        strList = []
+        return '<string>%s</string>' % self.data
+
+    def write(self, strList):
         strList.append('<string>')
         strList.append(self.data)
         strList.append('</string>')
-        return ''.join(strList)
     
     def read(self, stringElement):
         self.set(getTextValue(stringElement))
 
+# append the XML of a value to strList, so that nested values share one
+# buffer and the whole message is joined only once
+def writeValue(val, strList):
+    write = getattr(val, 'write', None)
+    if write is not None:
+        write(strList)
+    else:
+        strList.append('<string>')
+        strList.append(str(val))
+        strList.append('</string>')
+
 # convert a Dictionary/Array/Table/String to builtin python types
 def to_python(val):
     if isinstance(val, String):
-        s = val.value()
-        return s
+        return val.data
     elif isinstance(val, Dictionary):
-        d = {}
-        for key in val.keys():
-            d[key] = to_python(val.get(key))
-        return d
+        return dict((key, to_python(item))
+                    for key, item in val.data.iteritems())
     elif isinstance(val, Array):
-        a = []
-        for i in range(len(val.value())):
-            a.append(to_python(val.at(i)))
-        return a
+        return [to_python(item) for item in val.data]
     elif isinstance(val, Table):
         return [list(val.value()[0]), list(val.value()[1])]
     else:
@@ -369,11 +379,142 @@ def parseDocument(rootNode):
         raise ParsingError(-1, 'no response tag found')
 
 
+# the same as getTextValue() for an ElementTree element
+def _text(elem):
+    if not len(elem):
+        return elem.text or ''
+    text = [elem.text or '']
+    for kid in elem:
+        text.append(kid.tail or '')
+    return ''.join(text)
+
+def _readDictionary(elem, values):
+    aDict = Dictionary()
+    for entry in elem:
+        if entry.tag != 'entry':
+            continue
+        keyValue = _text(entry.find('key'))
+        for kid in entry.find('value'):
+            if kid in values:
+                # already a parsed value, which put() would store as is
+                aDict.data[keyValue] = values.pop(kid)
+    return aDict
+
+def _readArray(elem, values):
+    anArray = Array()
+    for value in elem:
+        if value.tag != 'value':
+            continue
+        # same order as Array.read()
+        for tag in VALUE_TAGS:
+            for kid in value:
+                if kid.tag == tag:
+                    anArray.data.append(values.pop(kid))
+    return anArray
+
+def _readTable(elem, values):
+    aTable = Table()
+    colsNode = next(elem.iter('columns'), None)
+    for col in colsNode:
+        if col.tag == 'column':
+            aTable.add_column(_text(col))
+    rowsNode = next(elem.iter('rows'), None)
+    rowIndex = 0
+    for row in rowsNode:
+        if row.tag != 'row':
+            continue
+        aTable.add_row()
+        colIndex = 0
+        for value in row:
+            if value.tag == 'value':
+                aTable.set_value_by_index(rowIndex, colIndex, _text(value))
+                colIndex = colIndex + 1
+        rowIndex = rowIndex + 1
+    return aTable
+
+VALUE_TAGS = ('dictionary', 'array', 'table', 'string')
+READERS = {'dictionary': _readDictionary,
+           'array': _readArray,
+           'table': _readTable,
+           'string': lambda elem, values: String(_text(elem))}
+
 # construct XML parser, parse doc and return result
+#
+# The values are built bottom-up while the document streams through
+# iterparse, and finished subtrees are dropped right away, so no DOM is ever
+# built. An error status is raised as soon as it's seen, without reading the
+# rest of the response (e.g. EM's locked status).
 def parseResult(value):
+    if not value or len(value) == 0:
+        raise ParsingError(-2, "no response received")
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+
+    values = {}
+    response = errCode = None
+    for _, elem in iterparse(StringIO(value)):
+        tag = elem.tag
+        reader = READERS.get(tag)
+        if reader is not None:
+            values[elem] = reader(elem, values)
+            if tag != 'string':
+                tail = elem.tail
+                elem.clear()
+                elem.tail = tail
+        elif tag == 'errorCode':
+            errCode = _text(elem)
+        elif tag == 'errorMessage' and errCode not in (None, '0'):
+            raise ParsingError(int(errCode), _text(elem))
+        elif tag == 'response':
+            response = elem
+            break
+
+    if response is None:
+        raise ParsingError(-1, 'no response tag found')
+
+    errCode = _text(response.find('errorCode'))
+    if '0' != errCode:
+        raise ParsingError(int(errCode), _text(response.find('errorMessage')))
+    for kid in response.find('args'):
+        if kid.tag in READERS:
+            return values[kid]
+    return None
+
+# the original, DOM based parser
+def parseResultDom(value):
     if not value or len(value) == 0:
         raise ParsingError(-2, "no response received")
 
     doc = parseString(value)
     return parseDocument(doc)
 
+
+
+# benchmark both parsers on a DeviceAPI-like response:
+# python -m f5test.interfaces.icontrol.empython.MessageParser [devices]
+if __name__ == '__main__':
+    import sys
+    import timeit
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    devices = Array()
+    for i in range(count):
+        device = Dictionary({'uid': str(i), 'address': '10.0.%d.%d' % (i / 256, i % 256),
+                             'hostname': 'bigip-%d.test.net' % i,
+                             'version': 'BIG-IP 11.6.0 Build 0.0.401',
+                             'status': 'ready', 'isClustered': '0',
+                             'modules': ['ltm', 'gtm', 'asm', 'apm'],
+                             'stats': Dictionary({'cpu': i % 100, 'mem': 50})})
+        devices.add(device)
+    args = Dictionary({'devices': devices, 'count': count})
+    text = ''.join(['<?xml version="1.0" ?><response><version>904</version>',
+                    '<errorCode>0</errorCode><errorMessage></errorMessage><args>',
+                    args.to_string(), '</args></response>'])
+
+    assert to_python(parseResult(text)) == to_python(parseResultDom(text))
+    print '%d devices, %d KB' % (count, len(text) / 1024)
+    for func in (parseResultDom, parseResult):
+        secs = min(timeit.repeat(lambda: to_python(func(text)), number=1, repeat=3))
+        print '%s: %.3fs' % (func.__name__, secs)
+    secs = min(timeit.repeat(args.to_string, number=1, repeat=3))
+    print 'to_string: %.3fs' % secs
@@ -0,0 +1,145 @@
+'''
+Created on Oct 17, 2026
+
+@author: jono
+'''
+import base64
+import errno
+import httplib
+import socket
+import threading
+import time
+import urllib
+import logging
+from SOAPpy.Client import HTTPTransport, SOAPAddress, SOAPUserAgent
+from SOAPpy.Config import Config
+from SOAPpy.Errors import HTTPError
+
+LOG = logging.getLogger(__name__)
+# Apache's KeepAliveTimeout on TMOS is 5 seconds. Drop idle sockets a bit
+# earlier so we never reuse one that the server is about to close.
+DEFAULT_MAX_IDLE = 4
+DEFAULT_MAX_SIZE = 10
+# Errors meaning the server had closed an idle connection before our request.
+STALE_ERRNOS = (errno.ECONNRESET, errno.EPIPE)
+
+
+def is_stale(e):
+    """Whether the error from request()/getresponse() on a reused connection
+    means it was closed by the server before anything was answered."""
+    if isinstance(e, httplib.BadStatusLine):
+        return True
+    return isinstance(e, socket.error) and e.errno in STALE_ERRNOS
+
+
+class IcontrolConnectionPool(object):
+    """Process-wide pool of idle, persistent HTTP(S) connections keyed by
+    (proto, host:port).
+
+    Credentials are sent with each request, so connections are shared by all
+    Icontrol instances talking to the same device.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, max_idle=DEFAULT_MAX_IDLE):
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, proto, host, timeout=None):
+        """Returns a (connection, reused) tuple."""
+        key = (proto, host)
+        now = time.time()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, since = idle.pop()
+                if now - since < self.max_idle:
+                    conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+
+        klass = httplib.HTTPSConnection if proto == 'https' \
+            else httplib.HTTPConnection
+        return klass(host, timeout=timeout), False
+
+    def put(self, proto, host, conn):
+        with self._lock:
+            idle = self._idle.setdefault((proto, host), [])
+            if len(idle) < self.max_size:
+                idle.append((conn, time.time()))
+                return
+        conn.close()
+
+    def clear(self, host=None):
+        """Close all idle connections, optionally only for one host:port."""
+        with self._lock:
+            for key in self._idle.keys():
+                if host is None or key[1] == host:
+                    for conn, _ in self._idle.pop(key):
+                        conn.close()
+
+
+POOL = IcontrolConnectionPool()
+
+
+class KeepAliveTransport(HTTPTransport):
+    """A SOAPpy transport that reuses pooled HTTP/1.1 connections.
+
+    The timeout is applied to the connection's own socket, instead of the
+    process-wide socket default.
+    """
+    pool = POOL
+
+    def call(self, addr, data, namespace, soapaction=None, encoding=None,
+             http_proxy=None, config=Config, timeout=None):
+        if not isinstance(addr, SOAPAddress):
+            addr = SOAPAddress(addr, config)
+
+        content_type = 'text/xml'
+        if encoding is not None:
+            content_type += '; charset=%s' % encoding
+        headers = {'Host': addr.host,
+                   'User-agent': SOAPUserAgent(),
+                   'Content-type': content_type,
+                   'SOAPAction': '"%s"' % soapaction if soapaction else ''}
+        if addr.user is not None:
+            val = base64.encodestring(urllib.unquote_plus(addr.user))
+            headers['Authorization'] = 'Basic ' + val.replace('\012', '')
+
+        while True:
+            conn, reused = self.pool.get(addr.proto, addr.host, timeout)
+            try:
+                conn.request('POST', addr.path, data, headers)
+                response = conn.getresponse()
+                break
+            except (httplib.HTTPException, socket.error), e:
+                conn.close()
+                # The server may have closed an idle connection, retry on a
+                # fresh one. Anything else may have reached the device, and
+                # calls like create or delete must not run twice.
+                if not reused or not is_stale(e):
+                    raise
+                LOG.debug('Stale iControl connection to %s: %s', addr.host, e)
+
+        try:
+            payload = response.read()
+        except:
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self.pool.put(addr.proto, addr.host, conn)
+
+        code = response.status
+        response_type = response.getheader('content-type', 'text/xml')
+        if code == 500 and not (response_type.startswith('text/xml') and payload):
+            raise HTTPError(code, response.reason)
+        if code not in (200, 500):
+            raise HTTPError(code, response.reason)
+
+        if namespace is None:
+            return payload, None
+        return payload, self.getNS(namespace, payload)
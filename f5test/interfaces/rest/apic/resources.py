@@ -108,7 +108,7 @@ class ApicInterface(RestInterface):
 
     def open(self):  # @ReservedAssignment
         url = "{0[proto]}://{0[address]}:{0[port]}".format(self.__dict__)
-        self.api = self.api_class(url, timeout=self.timeout)
+        self.api = self.api_class(url, **self._get_client_opts())
         if not self.token:
             payload = aaaLogin()
             payload.aaaUser['@name'] = self.username
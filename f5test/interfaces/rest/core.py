@@ -7,6 +7,7 @@ from ..config import ConfigInterface, DeviceAccess, DEFAULT_ROLE
 from ...base import Interface
 from ...defaults import DEFAULT_PORTS
 from .driver import RestResource
+from .pool import get_pool
 from ...base import enum
 import urllib
 import urlparse
@@ -17,6 +18,8 @@ AUTH = enum('NONE', 'BASIC', 'TOKEN')
 class RestInterface(Interface):
     api_class = RestResource
     creds_role = DEFAULT_ROLE
+    # Share keep-alive sockets with all other interfaces to the same endpoint.
+    pooled = True
 
     def __init__(self, device=None, address=None, username=None, password=None,
                  port=None, proto='https', timeout=90, auth=AUTH.BASIC, url=None,
@@ -71,6 +74,14 @@ class RestInterface(Interface):
         name = self.__class__.__name__
         return "<{0}: {1.proto}://{1.username}:{1.password}@{1.address}:{1.port}/?timeout={1.timeout}&auth={1.auth}>".format(name, self)
 
+    def _get_client_opts(self):
+        opts = dict(timeout=self.timeout)
+        if self.pooled:
+            opts['pool'] = get_pool(self.proto, self.address, self.port,
+                                    self.username, self.password,
+                                    timeout=self.timeout)
+        return opts
+
     def open(self):  # @ReservedAssignment
         if self.is_opened():
             return self.api
@@ -79,13 +90,13 @@ class RestInterface(Interface):
             quoted = dict(map(lambda (k, v): (k, urllib.quote_plus(str(v))),
                               self.__dict__.iteritems()))
             url = "{0[proto]}://{0[username]}:{0[password]}@{0[address]}:{0[port]}".format(quoted)
-            self.api = self.api_class(url, timeout=self.timeout)
+            self.api = self.api_class(url, **self._get_client_opts())
             return self.api
         elif self.auth == AUTH.NONE:
             quoted = dict(map(lambda (k, v): (k, urllib.quote_plus(str(v))),
                               self.__dict__.iteritems()))
             url = "{0[proto]}://{0[address]}:{0[port]}".format(quoted)
-            self.api = self.api_class(url, timeout=self.timeout)
+            self.api = self.api_class(url, **self._get_client_opts())
             return self.api
         else:
             raise NotImplementedError('Unsupported auth type: %s' % self.auth)
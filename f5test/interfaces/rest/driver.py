@@ -6,8 +6,9 @@ Created on Feb 22, 2012
 from restkit import Resource, ResourceError
 from restkit.filters import BasicAuth
 from restkit.datastructures import MultiDict
+import re
 import urllib
-from ...base import AttrDict
+from ...base import AttrDict, LazyAttrDict, lazify
 import xmltodict
 import logging
 try:
@@ -24,6 +25,7 @@ RAW_MIMETYPE = 'application/do-not-parse-this-content'
 LOG = logging.getLogger(__name__)
 STDOUT = logging.getLogger('stdout')
 MAX_LINE_LENGTH = 65536
+WHITESPACE = re.compile(r'[ \t\n\r]*')
 
 
 # Monkey patch BasicAuth to handle encoded username and passwords containing
@@ -55,12 +57,18 @@ class WrappedResponse(object):
         self.body = body if body is not None else response.body_string()
         self._data = None
         self.raw = raw
+        # The other top-level members, once iter_items() went through them.
+        self.meta = None
 
     @staticmethod
     def _parse_json(data):
         if not json:
             return data
-        return AttrDict(json.loads(data))
+        data = json.loads(data)
+        # Nested objects are converted to AttrDicts only when accessed.
+        if type(data) is dict:
+            return LazyAttrDict(data)
+        return AttrDict(data)
 
     @staticmethod
     def _parse_xml(data):
@@ -90,6 +98,53 @@ class WrappedResponse(object):
             return self._data
         return AttrDict()
 
+    def iter_items(self, key='items'):
+        """Yields the members of a JSON collection one at a time.
+
+        Only the current member is decoded, so that the whole response is never
+        in memory as Python objects. Other media types fall back to data.
+        The other top-level members (e.g. nextLink) are in meta once the
+        iteration is over.
+        """
+        if self._data is not None or self.raw or not json or \
+           mimetype_from_headers(self.response.headers) != 'application/json':
+            data = self.data
+            self.meta = LazyAttrDict((x, y) for x, y in dict.items(data)
+                                     if x != key) \
+                if isinstance(data, dict) else LazyAttrDict()
+            for item in (data.get(key) or [] if isinstance(data, dict) else []):
+                yield item
+            return
+
+        body = self.body
+        decode = json.JSONDecoder().raw_decode
+        ws = WHITESPACE.match
+        meta = {}
+        idx = ws(body).end()
+        if body[idx:idx + 1] != '{':
+            self.meta = LazyAttrDict()
+            return
+        idx = ws(body, idx + 1).end()
+        while body[idx:idx + 1] not in ('}', ''):
+            name, idx = decode(body, idx)
+            idx = ws(body, idx).end() + 1  # :
+            idx = ws(body, idx).end()
+            if name == key and body[idx] == '[':
+                idx = ws(body, idx + 1).end()
+                while body[idx] != ']':
+                    item, idx = decode(body, idx)
+                    yield lazify(item)
+                    idx = ws(body, idx).end()
+                    if body[idx] == ',':
+                        idx = ws(body, idx + 1).end()
+                idx += 1
+            else:
+                meta[name], idx = decode(body, idx)
+            idx = ws(body, idx).end()
+            if body[idx] == ',':
+                idx = ws(body, idx + 1).end()
+        self.meta = LazyAttrDict(meta)
+
 
 class BaseRestResource(Resource):
     """All requests return a response object """
@@ -211,3 +266,42 @@ class RestResource(BaseRestResource):
 
     def request(self, *args, **kwargs):
         return super(RestResource, self).request(*args, **kwargs).data
+
+
+# Benchmarks the response parsing on an emapi-like device collection:
+# python -m f5test.interfaces.rest.driver [devices]
+if __name__ == '__main__':
+    import sys
+    import timeit
+
+    class FakeResponse(object):
+        headers = {'Content-Type': 'application/json; charset=UTF-8'}
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    items = [{'uuid': 'a2a6b5b6-%08d' % i, 'address': '10.0.%d.%d' % (i / 256, i % 256),
+              'hostname': 'bigip-%d.test.net' % i, 'version': '11.6.0',
+              'state': 'ACTIVE', 'generation': i, 'isVirtual': False,
+              'properties': {'cm:gui:module': ['adc', 'asm', 'firewall'],
+                             'isTmmReady': True, 'isRestProxyReady': True},
+              'selfLink': 'https://localhost/mgmt/shared/resolver/device-groups/'
+                          'cm-bigip-allBigIpDevices/devices/a2a6b5b6-%08d' % i}
+             for i in range(count)]
+    body = json.dumps({'items': items, 'generation': 1, 'kind': 'devices',
+                       'selfLink': 'https://localhost/mgmt/shared/resolver/'
+                                   'device-groups/cm-bigip-allBigIpDevices/devices'})
+
+    def eager():
+        return AttrDict(json.loads(body))['items'][-1]['properties']['isTmmReady']
+
+    def lazy():
+        return WrappedResponse(FakeResponse(), body).data['items'][-1].properties.isTmmReady
+
+    def stream():
+        return [x.properties.isTmmReady for x in
+                WrappedResponse(FakeResponse(), body).iter_items()][-1]
+
+    assert eager() == lazy() == stream()
+    print '%d devices, %d KB' % (count, len(body) / 1024)
+    for func in (eager, lazy, stream):
+        secs = min(timeit.repeat(func, number=1, repeat=3))
+        print '%s: %.3fs' % (func.__name__, secs)
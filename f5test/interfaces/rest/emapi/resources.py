@@ -10,11 +10,14 @@ from ..driver import BaseRestResource, WrappedResponse
 from ...config import ADMIN_ROLE
 from ....utils.querydict import QueryDict
 from restkit import ResourceError, RequestError
+import sys
+import threading
 import urlparse
 import logging
 
 LOG = logging.getLogger(__name__)
 LOCALHOST_URL_PREFIX = 'http://localhost:8100'
+PAGE_SIZE = 500
 
 
 def localize_uri(uri):
@@ -57,15 +60,43 @@ class EmapiResourceError(ResourceError):
                         name=type(self).__name__))
 
 
+class Prefetch(object):
+    """Calls func(*args) now, or in a background thread if asked to."""
+
+    def __init__(self, func, *args, **kwargs):
+        self._value = self._exc_info = None
+        self._thread = None
+        if kwargs.get('background'):
+            self._thread = threading.Thread(target=self._run, args=(func, args))
+            self._thread.daemon = True
+            self._thread.start()
+        else:
+            self._run(func, args)
+
+    def _run(self, func, args):
+        try:
+            self._value = func(*args)
+        except:
+            self._exc_info = sys.exc_info()
+
+    def result(self):
+        if self._thread is not None:
+            self._thread.join()
+        if self._exc_info:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._value
+
+
 class EmapiRestResource(BaseRestResource):
     api_version = 1
     verbose = False
 
     def request(self, method, path=None, payload=None, headers=None,
-                params_dict=None, odata_dict=None, **params):
+                params_dict=None, odata_dict=None, stream=False, **params):
         """Perform HTTP request.
 
-        Returns a parsed JSON object (dict).
+        Returns a parsed JSON object (dict), or the WrappedResponse when
+        streaming (see WrappedResponse.iter_items()).
 
         :param method: The HTTP method
         :param path: string additionnal path to the uri
@@ -75,6 +106,7 @@ class EmapiRestResource(BaseRestResource):
         :param params_dict: Options parameters added to the request as a dict
         :param odata_dict: Similar to params_dict but keys will have a '$' sign
                            automatically prepended.
+        :param stream: return the unparsed WrappedResponse
         :param params: Optionnal parameterss added to the request
         """
 
@@ -105,8 +137,77 @@ class EmapiRestResource(BaseRestResource):
         except ResourceError, e:
             raise EmapiResourceError(e)
 
+        if stream:
+            return wrapped_response
         return wrapped_response.data
 
+    def iterate(self, uri, page_size=PAGE_SIZE, filter=None, select=None,  # @ReservedAssignment
+                odata_dict=None, prefetch=False, **kwargs):
+        """Yields the items of a collection, one page ($top/$skip) at a time.
+
+        The server's nextLink is followed when there is one. Iteration stops
+        on a short page, or when a page starts with the same item as the
+        previous one (i.e. $skip is ignored).
+
+        :param filter: an OData $filter expression, applied by the server.
+        :param select: property names (a list or comma separated string)
+                       to return for each item.
+        :param odata_dict: other OData options, e.g. orderby or expand.
+        :param prefetch: request the next page while the current one is being
+                         consumed. Otherwise each page is streamed, i.e. its
+                         items are decoded only as they are consumed.
+
+        >>> for device in api.iterate(uri, select='address,state'):
+        ...     print device.address
+        """
+        odata = dict(odata_dict or {})
+        odata['top'] = page_size
+        if filter is not None:
+            odata['filter'] = filter
+        if select is not None:
+            odata['select'] = select if isinstance(select, basestring) \
+                else ','.join(select)
+
+        stream = not prefetch
+
+        def fetch(skip, link):
+            if link:
+                return self.get(link, stream=stream, **kwargs)
+            return self.get(uri, odata_dict=dict(odata, skip=skip),
+                            stream=stream, **kwargs)
+
+        def next_page(meta, count):
+            link = meta.nextLink
+            if link or count == page_size and \
+               (meta.totalItems is None or skip < meta.totalItems):
+                return Prefetch(fetch, skip, link, background=prefetch)
+
+        skip = 0
+        first = None
+        page = Prefetch(fetch, skip, None)
+        while page is not None:
+            resp = page.result()
+            if stream:
+                # A streamed page's links are known only after its items.
+                items = resp.iter_items()
+            else:
+                items = resp.get('items') or []
+                skip += len(items)
+                page = next_page(resp, len(items))
+            count = 0
+            for item in items:
+                if not count:
+                    if first is not None and item == first:
+                        LOG.warning('%s returned the same page again, '
+                                    'stopping.', uri)
+                        return
+                    first = item
+                count += 1
+                yield item
+            if stream:
+                skip += count
+                page = next_page(resp.meta, count)
+
 
 class EmapiInterface(RestInterface):
     """
@@ -152,7 +253,7 @@ class EmapiInterface(RestInterface):
             return super(EmapiInterface, self).open()
         else:
             url = "{0[proto]}://{0[address]}:{0[port]}".format(self.__dict__)
-            self.api = self.api_class(url, timeout=self.timeout)
+            self.api = self.api_class(url, **self._get_client_opts())
             if not self.token:
                 payload = AuthnLogin()
                 payload.username = self.username
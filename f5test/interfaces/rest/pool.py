@@ -0,0 +1,108 @@
+'''
+Created on Oct 17, 2026
+
+@author: jono
+'''
+from restkit.conn import Connection
+from socketpool import ConnectionPool
+import threading
+import time
+import logging
+
+LOG = logging.getLogger(__name__)
+# Default Keep-Alive is set to 4 seconds in TMOS. Drop idle sockets a bit
+# earlier so we never hand out one that the server is about to close.
+DEFAULT_MAX_IDLE = 3
+DEFAULT_MAX_SIZE = 10
+DEFAULT_MAX_LIFETIME = 600
+
+
+class KeepAliveConnectionPool(ConnectionPool):
+    """A socketpool ConnectionPool that also evicts connections that have been
+    idle (i.e. sitting in the pool) for longer than max_idle seconds.
+
+    The stock pool only looks at the connection's creation time, which is
+    useless against servers with a short keep-alive timeout.
+    """
+
+    def __init__(self, max_idle=DEFAULT_MAX_IDLE, *args, **kwargs):
+        self.max_idle = max_idle
+        super(KeepAliveConnectionPool, self).__init__(*args, **kwargs)
+
+    def too_old(self, conn):
+        idle_since = getattr(conn, '_idle_since', None)
+        if idle_since is not None and time.time() - idle_since > self.max_idle:
+            return True
+        return super(KeepAliveConnectionPool, self).too_old(conn)
+
+    def release_connection(self, conn):
+        conn._idle_since = time.time()
+        return super(KeepAliveConnectionPool, self).release_connection(conn)
+
+    def get(self, **options):
+        conn = super(KeepAliveConnectionPool, self).get(**options)
+        conn._idle_since = None
+        return conn
+
+
+class RestConnectionManager(object):
+    """Process-wide registry of connection pools used by RestInterface and
+    friends.
+
+    Pools are keyed by (proto, address, port, username, password) so that
+    interfaces pointing to the same device with the same credentials share
+    warm sockets, across threads.
+
+    >>> manager = RestConnectionManager(max_size=5)
+    >>> manager.set_max_size('10.10.10.1', 20)
+    >>> pool = manager.get('https', '10.10.10.1', 443, 'admin', 'admin')
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, max_idle=DEFAULT_MAX_IDLE,
+                 max_lifetime=DEFAULT_MAX_LIFETIME):
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self._host_max_size = {}
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def set_max_size(self, address, max_size):
+        """Override the maximum number of pooled connections for one host."""
+        with self._lock:
+            self._host_max_size[address] = max_size
+            for key, pool in self._pools.iteritems():
+                if key[1] == address:
+                    pool.max_size = max_size
+
+    def get(self, proto, address, port, username=None, password=None,
+            timeout=None):
+        key = (proto, address, int(port), username, password)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                max_size = self._host_max_size.get(address, self.max_size)
+                LOG.debug('New connection pool for %s://%s:%s (max_size=%d)',
+                          proto, address, port, max_size)
+                pool = KeepAliveConnectionPool(factory=Connection,
+                                               max_idle=self.max_idle,
+                                               max_lifetime=self.max_lifetime,
+                                               max_size=max_size,
+                                               timeout=timeout,
+                                               backend='thread')
+                self._pools[key] = pool
+            return pool
+
+    def clear(self, address=None):
+        """Close all idle connections, optionally only for one host."""
+        with self._lock:
+            for key in self._pools.keys():
+                if address is None or key[1] == address:
+                    self._pools.pop(key).release_all()
+
+
+MANAGER = RestConnectionManager()
+
+
+def get_pool(*args, **kwargs):
+    return MANAGER.get(*args, **kwargs)
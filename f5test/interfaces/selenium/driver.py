@@ -6,16 +6,132 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.keys import Keys  # @UnusedImport
 from selenium.common.exceptions import (NoSuchElementException,
-                                        StaleElementReferenceException, NoSuchWindowException)
+                                        StaleElementReferenceException, NoSuchWindowException,
+                                        WebDriverException)
 
-from ...utils.wait import Wait, wait
+from ...utils.wait import Wait, wait, WaitTimedOut, STATS
 from ...base import Options
 import copy
+import pkgutil
 import time
 import logging
 import uuid
 
 LOG = logging.getLogger(__name__)
+# Returns the frame path of the current browsing context as [name, id] pairs,
+# or null if it can't be told (e.g. cross-origin frames).
+FRAME_PATH_JS = """var path = [], w = window;
+while (w !== w.parent) {
+    var f = w.frameElement;
+    if (!f) return null;
+    path.unshift([f.name, f.id]);
+    w = w.parent;
+}
+return path;"""
+# Used when the selenium package doesn't ship its isDisplayed atom.
+IS_DISPLAYED_JS = """function(e) {
+    if (!(e.offsetWidth || e.offsetHeight || e.getClientRects().length)) return false;
+    var style = window.getComputedStyle(e);
+    return style.visibility != 'hidden' && style.display != 'none';
+}"""
+# The browser side of RemoteWrapper.wait_dom(). It's installed in the page
+# (frame) the first time and called by name afterwards.
+WAIT_MISSING = 'f5testWait missing'
+WAIT_CALL = ("var wait = window.f5testWait, done = arguments[arguments.length - 1]; "
+             "wait ? wait.apply(null, arguments) : done('%s');" % WAIT_MISSING)
+WAIT_SCRIPT = """
+window.f5testWait = (function() {
+    var isDisplayed = (%(is_displayed)s);
+    function first(all, test) {
+        for (var i = 0; i < all.length; i++) if (test(all[i])) return all[i];
+        return null;
+    }
+    function text(e) { return e.innerText || e.textContent || ''; }
+    function find(by, value, root) {
+        switch (by) {
+        case 'id': return first(root.querySelectorAll('[id]'),
+                                function(e) { return e.id === value; });
+        case 'name': return first(root.querySelectorAll('[name]'),
+                                  function(e) { return e.getAttribute('name') === value; });
+        case 'xpath': return document.evaluate(value, root, null, 9, null).singleNodeValue;
+        case 'css selector': return root.querySelector(value);
+        case 'class name': return root.getElementsByClassName(value)[0] || null;
+        case 'tag name': return root.getElementsByTagName(value)[0] || null;
+        case 'link text': return first(root.getElementsByTagName('a'),
+                                       function(e) { return text(e).trim() === value; });
+        case 'partial link text': return first(root.getElementsByTagName('a'),
+                                               function(e) { return text(e).indexOf(value) >= 0; });
+        }
+        throw Error('Unsupported locator: ' + by);
+    }
+    function test(e, state, match) {
+        switch (state) {
+        case 'displayed': return isDisplayed(e);
+        case 'enabled': return !e.disabled;
+        case 'selected': return !!(e.selected || e.checked);
+        case 'text_match': return text(e).indexOf(match) >= 0;
+        }
+        return true;
+    }
+    return function(by, value, state, match, negated, stabilize, interval,
+                    timeout, root, done) {
+        var end = new Date().getTime() + timeout, since = null, finished = false,
+            pending = false, timer, observer;
+        function finish(ok, e) {
+            if (finished) return;
+            finished = true;
+            clearInterval(timer);
+            if (observer) observer.disconnect();
+            done({ok: ok, element: e || null});
+        }
+        function check() {
+            var e = null, ok = false, now = new Date().getTime();
+            pending = false;
+            try {
+                e = find(by, value, root || document);
+                // Same as ElementWait: a missing element only satisfies a
+                // negated present/displayed condition.
+                ok = e ? test(e, state, match) != negated :
+                         negated && (state == 'present' || state == 'displayed');
+            } catch (err) {}
+            if (!ok) since = null;
+            else if (since === null) since = now;
+            if (ok && now - since >= stabilize) finish(true, e);
+            else if (now >= end) finish(false, e);
+        }
+        if (window.MutationObserver) {
+            observer = new MutationObserver(function() {
+                if (!pending) { pending = true; setTimeout(check, 0); }
+            });
+            observer.observe(document, {childList: true, subtree: true,
+                                        attributes: true, characterData: true});
+        }
+        // Also poll, for changes that aren't DOM mutations (e.g. styles).
+        timer = setInterval(check, Math.max(interval, 50));
+        check();
+    };
+})();
+window.f5testWait.apply(null, arguments);
+"""
+# Extra time given to the driver's script timeout over the wait's own.
+SCRIPT_TIMEOUT_MARGIN = 5
+_wait_script = None
+
+
+def get_atom(filename, default=None):
+    """Returns one of the JS atoms shipped with selenium, or default."""
+    try:
+        return pkgutil.get_data('selenium.webdriver.remote', filename) or default
+    except (IOError, ImportError):
+        return default
+
+
+def get_wait_script():
+    global _wait_script
+    if _wait_script is None:
+        _wait_script = WAIT_SCRIPT % dict(is_displayed=get_atom('isDisplayed.js',
+                                                                IS_DISPLAYED_JS))
+    return _wait_script
 
 
 class ConditionError(Exception):
@@ -32,6 +148,11 @@ class Is(object):
     CUSTOM_MATCH = 2
 
 
+WAIT_STATES = {Is.DISPLAYED: 'displayed', Is.SELECTED: 'selected',
+               Is.ENABLED: 'enabled', Is.TEXT_MATCH: 'text_match',
+               Is.PRESENT: 'present'}
+
+
 class NONEGIVEN:
     pass
 
@@ -40,6 +161,7 @@ class ElementWait(Wait):
 
     def __init__(self, element, *args, **kwargs):
         self._frame = None
+        self._resync = True
         self._it = None
         self._match = None
         self._element = element
@@ -87,11 +209,17 @@ class ElementWait(Wait):
         # switched to the default document. For more see:
         # http://code.google.com/p/selenium/issues/detail?id=4309
         #
-#        if self._frame:
-        frame = f.frame
-        b.switch_to_frame(frame, forced=True)
-        # Absolutize the frame (in case the one provided was relative)
-        self._frame = b.get_current_frame()
+        # The frame is switched to on the first probe and after a failed one.
+        # In between, being inside a frame is only verified (one script call)
+        # and the top document is trusted.
+        if self._resync:
+            b.switch_to_frame(f.frame if self.probes <= 1 else self._frame,
+                              forced=True)
+            # Absolutize the frame (in case the one provided was relative)
+            self._frame = b.get_current_frame()
+            self._resync = False
+        elif self._frame != '/':
+            b.switch_to_frame(self._frame, forced=True)
 
         if not value:
             self._result = self._element
@@ -113,6 +241,7 @@ class ElementWait(Wait):
         return bool(ret) ^ self.negated
 
     def test_error(self, exc_type, exc_value, exc_traceback):
+        self._resync = True
         if exc_type is NoSuchElementException:
             if (self._it in (Is.PRESENT, Is.DISPLAYED) and self.negated):
                 return True
@@ -174,9 +303,13 @@ class WebElementWrapper(WebElement):
 
 class RemoteWrapper(RemoteWebDriver):
 
+    # Let wait() check conditions in the browser instead of polling.
+    observe = True
+
     def __init__(self, *args, **kwargs):
         self._frames = {}
         self._current_window_handle = None
+        self._script_timeout = None
         return super(RemoteWrapper, self).__init__(*args, **kwargs)
 
     @property
@@ -224,6 +357,9 @@ class RemoteWrapper(RemoteWebDriver):
             else:
                 frames.append(bit)
 
+        if forced and frames and frames == orig_frames and self._in_frames(frames):
+            return
+
         if forced or frames != orig_frames:
             try:
                 super(RemoteWrapper, self).switch_to_default_content()
@@ -237,6 +373,17 @@ class RemoteWrapper(RemoteWebDriver):
                     super(RemoteWrapper, self).switch_to_frame(frame)
                 raise
 
+    def _in_frames(self, frames):
+        """Checks, with one script call, that the browser is still inside
+        the given frames (by name or id)."""
+        try:
+            path = self.execute_script(FRAME_PATH_JS)
+        except WebDriverException, e:
+            LOG.debug('Unable to get the frame path: %s', e)
+            return False
+        return path is not None and len(path) == len(frames) and \
+            all(bit in pair for bit, pair in zip(frames, path))
+
     def get_current_frame(self, window_handle=None):
         """Returns the frame locator for the given window.
 
@@ -295,7 +442,8 @@ class RemoteWrapper(RemoteWebDriver):
     def get(self, *args, **kwargs):
         """Loads a web page in the current browser."""
         super(RemoteWrapper, self).get(*args, **kwargs)
-        self.switch_to_default_content()
+        # A new page always starts in the top document.
+        self._frames[self.current_window_handle] = []
         return self
 
     def refresh(self, *args, **kwargs):
@@ -317,7 +465,7 @@ class RemoteWrapper(RemoteWebDriver):
 
     def wait(self, value=None, by=By.ID, frame=None, it=Is.DISPLAYED,
              negated=False, timeout=10, interval=0.1, stabilize=0, element=None,
-             match=None):
+             match=None, observe=None):
         """Waits for an element to satisfy a certain condition.
 
         @param value: the locator
@@ -340,11 +488,65 @@ class RemoteWrapper(RemoteWebDriver):
         @type stabilize: int
         @param element: parent element
         @type element: WebElement instance
+        @param observe: check the condition in the browser as the DOM changes
+                        (see wait_dom), instead of polling. CUSTOM_MATCH is
+                        always polled. (default: self.observe)
+        @type observe: bool
         """
+        if observe is None:
+            observe = self.observe
+        if observe and value and it != Is.CUSTOM_MATCH:
+            start = time.time()
+            try:
+                return self.wait_dom(value, by, frame, it, negated, timeout,
+                                     interval, stabilize, element, match)
+            except WebDriverException, e:
+                # E.g. the page was unloaded while waiting.
+                LOG.debug('Waiting in the browser failed, polling instead: %s', e)
+                timeout = max(timeout - (time.time() - start), interval)
 
         w = ElementWait(element or self, timeout, interval, stabilize, negated)
         return w.run(value, by, frame, it, match)
 
+    def wait_dom(self, value, by=By.ID, frame=None, it=Is.DISPLAYED,
+                 negated=False, timeout=10, interval=0.1, stabilize=0,
+                 element=None, match=None):
+        """Same as wait(), but the condition is checked by a script in the
+        browser every time the DOM changes (and every interval), so it takes
+        a single call to the driver.
+
+        Same as WebDriver, except that ENABLED means "not disabled" and the
+        text for TEXT_MATCH is the element's innerText.
+        """
+        state = WAIT_STATES[it]
+        f = '.' if frame is None else frame
+        criteria = "by={0} value={1} frame={2} state={3} negated={4} " \
+                   "stabilize={5}".format(by, value, f, state,
+                                          'yes' if negated else 'no', stabilize)
+        LOG.debug("Waiting in the browser for: {0}".format(criteria))
+
+        self.switch_to_frame(f, forced=True)
+        if element is not None and by == By.XPATH and value.startswith('/'):
+            value = '.' + value
+        script_timeout = timeout + SCRIPT_TIMEOUT_MARGIN
+        if self._script_timeout is None or self._script_timeout < script_timeout:
+            self.set_script_timeout(script_timeout)
+            self._script_timeout = script_timeout
+
+        args = (by, value, state, match, negated, stabilize * 1000,
+                interval * 1000, timeout * 1000, element)
+        start = time.time()
+        ret = self.execute_async_script(WAIT_CALL, *args)
+        if ret == WAIT_MISSING:
+            ret = self.execute_async_script(get_wait_script(), *args)
+        elapsed = time.time() - start
+        STATS.record('DomWait', 1, elapsed, ret['ok'])
+
+        if not ret['ok']:
+            raise WaitTimedOut("Criteria: {0} not met after {1} seconds."
+                               .format(criteria, timeout))
+        return ret['element']
+
     def wait_ajax(self, timeout=10, interval=0.1, stabilize=0):
         """Waits for the number of jQuery Ajax calls to drop to 0."""
         def xhr_pending():
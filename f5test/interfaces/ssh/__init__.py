@@ -1 +1,2 @@
 from .core import SSHInterface
+from .fanout import run_many, gather, FanoutError
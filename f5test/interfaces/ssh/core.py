@@ -1,6 +1,7 @@
 """Friendly Python SSH2 interface."""
 
 from .driver import Connection
+from .pool import MANAGER
 from ..config import ConfigInterface, DeviceAccess
 from ...base import Interface
 from ...defaults import ROOT_USERNAME, ROOT_PASSWORD, DEFAULT_PORTS
@@ -17,7 +18,8 @@ class SSHInterfaceError(Exception):
 class SSHInterface(Interface):
 
     def __init__(self, device=None, address=None, username=None, password=None,
-                 port=None, timeout=180, key_filename=None, *args, **kwargs):
+                 port=None, timeout=180, key_filename=None, pooled=True,
+                 *args, **kwargs):
         super(SSHInterface, self).__init__()
         if device or not address:
             self.device = device if isinstance(device, DeviceAccess) \
@@ -38,6 +40,8 @@ class SSHInterface(Interface):
         self.port = port or DEFAULT_PORTS['ssh']
         self.timeout = timeout
         self.key_filename = key_filename
+        # Share one authenticated transport per device across interfaces.
+        self.pool = MANAGER if pooled else None
 
     def __call__(self, command):
         if not self.is_opened():
@@ -62,19 +66,22 @@ class SSHInterface(Interface):
     def open(self):  # @ReservedAssignment
         if self.is_opened():
             return self.api
+        if self.api:
+            # Give a dead pooled transport back before leasing a new one.
+            self.api.close()
         address = self.address
         username = self.username
         password = self.password
 
         api = Connection(address, username, password, port=self.port,
                          timeout=self.timeout, look_for_keys=True,
-                         key_filename=self.key_filename)
+                         key_filename=self.key_filename, pool=self.pool)
         api.connect()
         self.api = api
         LOG.debug(api._transport)
         return api
 
     def close(self, *args, **kwargs):
-        if self.is_opened():
+        if self.api:
             self.api.close()
         super(SSHInterface, self).close()
@@ -3,8 +3,10 @@
 import glob
 import logging
 import os
+import re
 import socket
 import stat
+import tarfile
 import time
 
 import paramiko
@@ -15,12 +17,39 @@ from ...utils.net import get_local_ip
 LOG = logging.getLogger(__name__)
 SSH_DIR = os.path.join(os.path.expanduser('~'), '.ssh')
 KEEPALIVE = 60
+BLOCK_SIZE = 64 * 1024
+
+# Lists the regular files matching the globs, then tars them from / (or the
+# tails of them, staged in a temporary directory) to stdout.
+BULK_GET_SCRIPT = """\
+for f in {patterns}; do [ -f "$f" ] && echo "${{f#/}}"; done > /tmp/.bulk_get.$$
+{stage}tar -C {root} -c{compress}f - -T /tmp/.bulk_get.$$
+s=$?
+rm -rf /tmp/.bulk_get.$$ {cleanup}
+exit $s"""
+BULK_GET_CHANGED = re.compile(r'^tar: (.+): file changed as we read it$', re.M)
+BULK_GET_STAGE = """\
+d=$(mktemp -d)
+while read f; do
+    mkdir -p "$d/$(dirname "$f")" && {tail} "/$f" > "$d/$f"
+done < /tmp/.bulk_get.$$
+"""
 
 
 class SSHTimeoutError(Exception):
     pass
 
 
+class SSHBulkGetError(Exception):
+    """Some files couldn't be read. The ones that were are in files, and
+    those of them that changed while being read are also in changed."""
+
+    def __init__(self, message, files, changed=None):
+        super(SSHBulkGetError, self).__init__(message)
+        self.files = files
+        self.changed = changed or []
+
+
 class SSHResult(object):
 
     def __init__(self, status, stdout, stderr, command=None):
@@ -28,6 +57,7 @@ class SSHResult(object):
         self.stdout = stdout
         self.stderr = stderr
         self.command = command
+        self.duration = None
 
     def __str__(self):
         outdict = self.__dict__
@@ -45,6 +75,19 @@ class SSHResult(object):
             "status=%(status)d:stdout=%(stdout)s:stderr=%(stderr)s" % outdict
 
 
+class _CountingReader(object):
+    """Counts the bytes read through a file-like object."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.count += len(data)
+        return data
+
+
 class Connection(paramiko.SSHClient):
     """A friendlier wrapper around paramiko.SSHClient.
 
@@ -69,6 +112,9 @@ class Connection(paramiko.SSHClient):
     @param look_for_keys: set to False to disable searching for discoverable
         private key files in C{~/.ssh/}
     @type look_for_keys: bool
+    @param pool: share an already authenticated transport from this
+        SSHConnectionManager instead of doing a new handshake
+    @type pool: SSHConnectionManager
     """
     def __init__(self,
                  address,
@@ -77,10 +123,12 @@ class Connection(paramiko.SSHClient):
                  key_filename=None,
                  port=22,
                  timeout=180,
-                 look_for_keys=False
+                 look_for_keys=False,
+                 pool=None
                  ):
         self._sftp_live = False
         self._sftp = None
+        self._lease = None
         self.__dict__.update(locals())
         self.__dict__.pop('self')
         super(Connection, self).__init__()
@@ -109,6 +157,17 @@ class Connection(paramiko.SSHClient):
             return False
 
     def connect(self):
+        if self.pool is not None:
+            if self._lease is not None:
+                self._release(discard=True)
+            self._lease = self.pool.acquire(self.address, self.port,
+                                            self.username, self.password,
+                                            key_filename=self.key_filename,
+                                            timeout=self.timeout,
+                                            look_for_keys=self.look_for_keys)
+            self._transport = self._lease.transport
+            return
+
         self.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         super(Connection, self).connect(self.address, self.port,
                                         self.username, self.password,
@@ -117,15 +176,57 @@ class Connection(paramiko.SSHClient):
                                         look_for_keys=self.look_for_keys)
         self.get_transport().set_keepalive(KEEPALIVE)
 
-    def run(self, command, bufsize=-1):
-        """Execute a command remotely."""
+    def _release(self, discard=False):
+        if self._sftp_live:
+            self._sftp.close()
+            self._sftp_live = False
+        self._transport = None
+        lease, self._lease = self._lease, None
+        self.pool.release(lease, discard)
+
+    def close(self):
+        """Closes the underlying transport, or just gives it back to the pool.
+        """
+        if self._lease is not None:
+            return self._release()
+        super(Connection, self).close()
+
+    def _open_session(self):
+        """Opens a channel, reconnecting once if a pooled transport turns
+        out to be dead or has no room for another channel."""
+        try:
+            return self._transport.open_session()
+        except paramiko.ChannelException:
+            if self._lease is None:
+                raise
+            # Too many channels on the shared transport, which is still fine
+            # for everyone else. Move to another one.
+            lease = self._lease
+            self._release()
+            self.pool.mark_full(lease)
+            self.connect()
+            return self._transport.open_session()
+        except (paramiko.SSHException, socket.error):
+            if self._lease is None:
+                raise
+            LOG.warning('Pooled SSH transport lost. Reconnecting...')
+            self.connect()
+            return self._transport.open_session()
+
+    def run(self, command, bufsize=-1, timeout=None):
+        """Execute a command remotely.
+
+        @param timeout: overrides the connection timeout for this command
+        @type timeout: float
+        """
         if not self.is_connected():
             LOG.warning('SSH channel lost. Reconnecting...')
             self.connect()
-        chan = self._transport.open_session()
+        start = time.time()
+        chan = self._open_session()
 
         LOG.debug('run: %s on %s...', command, self)
-        chan.settimeout(self.timeout)
+        chan.settimeout(timeout or self.timeout)
         chan.exec_command(command)
         stdout = chan.makefile('rb', bufsize)
         stderr = chan.makefile_stderr('rb', bufsize)
@@ -133,6 +234,7 @@ class Connection(paramiko.SSHClient):
         try:
             ret = SSHResult(-1, stdout.read(), stderr.read(), command)
             ret.status = chan.recv_exit_status()
+            ret.duration = time.time() - start
             if ret.status != 0:
                 LOG.debug(ret.stdout)
                 LOG.debug(ret.stderr)
@@ -145,7 +247,7 @@ class Connection(paramiko.SSHClient):
     def run_wait(self, command, progress=None, bufsize=-1, interval=1):
         """Execute a command remotely and execute progress every N secs."""
         assert self.is_connected(), "SSH channel not connected"
-        chan = self._transport.open_session()
+        chan = self._open_session()
 
         status = None
 
@@ -196,7 +298,9 @@ class Connection(paramiko.SSHClient):
             LOG.warning('SSH channel lost. Reconnecting...')
             self.connect()
         if not self._sftp_live:
-            self._sftp = paramiko.SFTPClient.from_transport(self._transport)
+            chan = self._open_session()
+            chan.invoke_subsystem('sftp')
+            self._sftp = paramiko.SFTPClient(chan)
             self._sftp_live = True
 
     def sftp(self):
@@ -228,6 +332,98 @@ class Connection(paramiko.SSHClient):
             if move:
                 self._sftp.remove(remotepath)
 
+    def bulk_get(self, patterns, localpath, tail=None, tail_lines=None,
+                 max_size=None, compress=True, strict=False):
+        """Download all files matching some remote globs in one go.
+
+        The files are tarred on the remote side and streamed over one channel,
+        then unpacked into localpath (flattened) as they arrive.
+
+        bulk_get(['/var/log/ltm*', '/var/tmp/restjavad.out'], '/tmp', tail=10**6)
+
+        @param tail: only get the last N bytes of each file
+        @type tail: int
+        @param tail_lines: only get the last N lines of each file
+        @type tail_lines: int
+        @param max_size: stop once this many (compressed) bytes were received
+        @type max_size: int
+        @param compress: gzip the stream, pointless for already compressed
+            files like cores or qkviews
+        @type compress: bool
+        @param strict: also fail when files changed while being read (e.g.
+            live logs), instead of just logging it
+        @type strict: bool
+        @return: the local files
+        @raise SSHBulkGetError: when tar failed to read some of the files
+        """
+        if isinstance(patterns, basestring):
+            patterns = [patterns]
+        if not self.is_connected():
+            LOG.warning('SSH channel lost. Reconnecting...')
+            self.connect()
+
+        stage = cleanup = ''
+        root = '/'
+        if tail or tail_lines:
+            stage = BULK_GET_STAGE.format(tail='tail -c %d' % tail if tail
+                                          else 'tail -n %d' % tail_lines)
+            root = cleanup = '"$d"'
+        command = BULK_GET_SCRIPT.format(patterns=' '.join(patterns),
+                                         stage=stage, root=root,
+                                         cleanup=cleanup,
+                                         compress='z' if compress else '')
+
+        LOG.debug('bulk_get: %s -> %s on %s...', patterns, localpath, self)
+        chan = self._open_session()
+        chan.settimeout(self.timeout)
+        chan.exec_command(command)
+        stream = _CountingReader(chan.makefile('rb', BLOCK_SIZE))
+
+        files = []
+        truncated = False
+        try:
+            archive = tarfile.open(fileobj=stream,
+                                   mode='r|gz' if compress else 'r|')
+            for member in archive:
+                if not member.isfile():
+                    continue
+                filename = os.path.join(localpath, os.path.basename(member.name))
+                source = archive.extractfile(member)
+                with open(filename, 'wb') as f:
+                    while True:
+                        block = source.read(BLOCK_SIZE)
+                        if not block:
+                            break
+                        f.write(block)
+                        if max_size and stream.count > max_size:
+                            break
+                if max_size and stream.count > max_size:
+                    os.remove(filename)
+                    LOG.warning('bulk_get: size cap of %d bytes reached after '
+                                '%d files.', max_size, len(files))
+                    truncated = True
+                    break
+                files.append(filename)
+
+            if not truncated:
+                status = chan.recv_exit_status()
+                if status != 0:
+                    errors = chan.makefile_stderr('rb').read().strip()
+                    # GNU tar exits with 1 when files changed as it read them.
+                    changed = set(os.path.basename(x) for x in
+                                  BULK_GET_CHANGED.findall(errors))
+                    changed = [x for x in files if os.path.basename(x) in changed]
+                    message = "getting `%s` failed (%d): %s" % (patterns, status,
+                                                                errors)
+                    if status > 1 or strict:
+                        raise SSHBulkGetError(message, files, changed)
+                    LOG.warning(message)
+        except socket.timeout:
+            raise SSHTimeoutError("getting `%s`" % patterns)
+        finally:
+            chan.close()
+        return files
+
     def put(self, localpath, remotepath=None):
         """Upload a local file.
         """
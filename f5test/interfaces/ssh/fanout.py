@@ -0,0 +1,193 @@
+'''
+Created on Oct 17, 2026
+
+@author: jono
+'''
+from Queue import Queue, Empty
+import sys
+import threading
+import time
+import traceback
+import logging
+from .core import SSHInterface
+from .driver import SSHResult
+from ..config import ConfigInterface
+
+LOG = logging.getLogger(__name__)
+MAX_WORKERS = 16
+
+
+class FanoutTimeout(Exception):
+    pass
+
+
+class FanoutError(Exception):
+    """Raised after all calls are done, if some of them failed.
+
+    @ivar results: all the results, failed ones have an exc_info.
+    """
+
+    def __init__(self, results):
+        self.results = results
+        failed = [x for x in results if x.exc_info]
+        super(FanoutError, self).__init__('%d of %d calls failed: %s' %
+                                          (len(failed), len(results),
+                                           failed[0].exc_info[1]))
+
+
+class Outcome(object):
+    """What one fan-out call returned or raised, with timing."""
+
+    def __init__(self, key):
+        self.key = key
+        self.value = None
+        self.exc_info = None
+        self.start = None
+        self.end = None
+
+    def __repr__(self):
+        name = self.__class__.__name__
+        state = 'failed' if self.exc_info else 'ok'
+        return "<{0}: {1} {2}>".format(name, self.key, state)
+
+    @property
+    def duration(self):
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+
+def gather(func, items, max_workers=MAX_WORKERS, timeout=None,
+           raise_on_error=False):
+    """Calls func(item) for all items at once, in at most max_workers
+    threads.
+
+    Returns one Outcome per item, in the same order. A failed call doesn't
+    affect the others; its exc_info is kept on the outcome. Calls still not
+    done after timeout seconds are reported as failed with a timeout error
+    (the threads are left running in the background).
+
+    >>> outcomes = gather(lambda x: get_version(ifc=x), sshifcs)
+    >>> [x.value for x in outcomes]
+    """
+    outcomes = [Outcome(x) for x in items]
+    if not outcomes:
+        return outcomes
+
+    queue = Queue()
+    for outcome in outcomes:
+        queue.put(outcome)
+    pending = [len(outcomes)]
+    cond = threading.Condition()
+    # The config is thread-local, share the caller's with the workers.
+    config = ConfigInterface().get_config()
+
+    def worker():
+        ConfigInterface(config).set_global_config()
+        while True:
+            try:
+                outcome = queue.get_nowait()
+            except Empty:
+                break
+            outcome.start = time.time()
+            try:
+                outcome.value = func(outcome.key)
+            except:
+                outcome.exc_info = sys.exc_info()
+                LOG.debug('%s failed:\n%s', outcome.key, traceback.format_exc())
+            finally:
+                outcome.end = time.time()
+                with cond:
+                    pending[0] -= 1
+                    cond.notify()
+
+    for i in range(min(max_workers, len(outcomes))):
+        thread = threading.Thread(target=worker, name='gather-%d' % i)
+        thread.daemon = True
+        thread.start()
+
+    deadline = time.time() + timeout if timeout else None
+    with cond:
+        while pending[0]:
+            if deadline is None:
+                cond.wait()
+            elif deadline > time.time():
+                cond.wait(deadline - time.time())
+            else:
+                break
+
+    for outcome in outcomes:
+        if outcome.end is None:
+            try:
+                raise FanoutTimeout('%s not done after %s seconds' %
+                                    (outcome.key, timeout))
+            except FanoutTimeout:
+                outcome.exc_info = sys.exc_info()
+
+    if raise_on_error and any(x.exc_info for x in outcomes):
+        raise FanoutError(outcomes)
+    return outcomes
+
+
+def run_many(calls, max_workers=MAX_WORKERS, timeout=None,
+             raise_on_error=False, **kwargs):
+    """Runs commands on several devices concurrently.
+
+    @param calls: (target, command) or (target, command, timeout) tuples. A
+        target can be a device (alias or DeviceAccess) or an SSHInterface,
+        which is opened if needed and left as is.
+    @param timeout: overall time budget, in seconds
+    @param kwargs: passed to SSHInterface for device targets
+    @return: one SSHResult per call, in the same order, with a device,
+        duration (wall time, including the connect) and exc_info. Failed
+        calls have a status of -1 and the error in stderr.
+
+    >>> results = run_many([(x, 'uptime') for x in devices])
+    >>> dict((x.device, x.stdout) for x in results)
+    """
+    calls = [tuple(x) + (None,) * (3 - len(x)) for x in calls]
+
+    # One interface per device, which thanks to the transport pool also means
+    # one SSH handshake, even if there are several commands per device.
+    interfaces = {}
+    owned = []
+    lock = threading.Lock()
+
+    def get_interface(target):
+        if isinstance(target, SSHInterface):
+            return target
+        with lock:
+            sshifc = interfaces.get(target)
+            if sshifc is None:
+                sshifc = interfaces[target] = SSHInterface(device=target,
+                                                           **kwargs)
+                owned.append(sshifc)
+            return sshifc
+
+    def run(call):
+        target, command, call_timeout = call
+        sshifc = get_interface(target)
+        sshifc.open()
+        return sshifc.api.run(command, timeout=call_timeout)
+
+    try:
+        outcomes = gather(run, calls, max_workers, timeout)
+    finally:
+        for sshifc in owned:
+            sshifc.close()
+
+    results = []
+    for outcome in outcomes:
+        target, command, _ = outcome.key
+        if outcome.exc_info:
+            ret = SSHResult(-1, '', str(outcome.exc_info[1]), command)
+        else:
+            ret = outcome.value
+        ret.device = getattr(target, 'device', None) or target
+        ret.duration = outcome.duration
+        ret.exc_info = outcome.exc_info
+        results.append(ret)
+
+    if raise_on_error and any(x.exc_info for x in results):
+        raise FanoutError(results)
+    return results
@@ -0,0 +1,181 @@
+'''
+Created on Oct 17, 2026
+
+@author: jono
+'''
+import threading
+import time
+import logging
+import paramiko
+from .driver import KEEPALIVE
+
+LOG = logging.getLogger(__name__)
+# OpenSSH allows 10 sessions per connection by default (MaxSessions).
+DEFAULT_MAX_CHANNELS = 8
+DEFAULT_MAX_IDLE = 300
+# Transports idle for longer than this get a round-trip probe before being
+# handed out, since is_active() won't notice a rebooted peer until the next
+# keepalive.
+PROBE_AFTER = 5
+PROBE_TIMEOUT = 10
+
+
+class PooledTransport(object):
+    """One live, authenticated transport shared by several Connections.
+
+    Each lease stands for a Connection, which opens its own channels on the
+    shared transport. A transport on which the peer refused a new channel
+    (e.g. sshd's MaxSessions) is marked full and gets no new leases until one
+    is returned.
+    """
+
+    def __init__(self, key, client):
+        self.key = key
+        self.client = client
+        self.transport = client.get_transport()
+        self.leases = 0
+        self.full = False
+        self.created = time.time()
+        self.idle_since = self.created
+
+    def __repr__(self):
+        name = self.__class__.__name__
+        return "<{0}: {1[2]}@{1[0]}:{1[1]} leases={2}>".format(name, self.key,
+                                                               self.leases)
+
+    def is_active(self):
+        return bool(self.transport and self.transport.is_active())
+
+    def probe(self):
+        """Open and close a session, which is a full round-trip to the peer."""
+        try:
+            self.transport.open_session(timeout=PROBE_TIMEOUT).close()
+            return True
+        except Exception, e:
+            LOG.debug('Probe failed on %s: %s', self, e)
+            return False
+
+    def close(self):
+        self.client.close()
+
+
+class SSHConnectionManager(object):
+    """Process-wide registry of authenticated SSH transports used by
+    Connection (and so SSHInterface).
+
+    Transports are keyed by (address, port, username, password,
+    key_filename), so that other credentials always authenticate anew. Up to
+    max_channels
+    Connections share one transport, after which a new one gets opened.
+    Unused transports are closed after max_idle seconds.
+
+    >>> entry = MANAGER.acquire('10.10.10.1', 22, 'root', 'default')
+    >>> entry.transport.open_session()
+    >>> MANAGER.release(entry)
+    """
+
+    def __init__(self, max_channels=DEFAULT_MAX_CHANNELS,
+                 max_idle=DEFAULT_MAX_IDLE):
+        self.max_channels = max_channels
+        self.max_idle = max_idle
+        self._transports = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _pick(self, key):
+        """Find a healthy transport with room for one more lease."""
+        now = time.time()
+        for entry in list(self._transports.get(key, [])):
+            if entry.leases >= self.max_channels or entry.full:
+                continue
+            if not entry.is_active():
+                self._discard(entry)
+                continue
+            entry.leases += 1
+            return entry, now - entry.idle_since > PROBE_AFTER and entry.leases == 1
+
+        return None, False
+
+    def _discard(self, entry):
+        entries = self._transports.get(entry.key, [])
+        if entry in entries:
+            entries.remove(entry)
+            LOG.debug('Dropping %s', entry)
+        entry.close()
+
+    def acquire(self, address, port, username, password=None,
+                key_filename=None, timeout=None, look_for_keys=False):
+        """Lease a transport, authenticating a new one only when needed."""
+        key = (address, int(port), username, password, key_filename)
+        self.expire()
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Handshakes to the same peer are serialized, so that concurrent
+        # callers end up sharing the first transport instead of racing.
+        with key_lock:
+            while True:
+                with self._lock:
+                    entry, stale = self._pick(key)
+                if entry is None or not stale or entry.probe():
+                    break
+                with self._lock:
+                    self._discard(entry)
+
+            if entry is None:
+                client = paramiko.SSHClient()
+                client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                client.connect(address, int(port), username, password,
+                               key_filename=key_filename, timeout=timeout,
+                               look_for_keys=look_for_keys)
+                client.get_transport().set_keepalive(KEEPALIVE)
+                entry = PooledTransport(key, client)
+                entry.leases = 1
+                LOG.debug('New %s', entry)
+                with self._lock:
+                    self._transports.setdefault(key, []).append(entry)
+        return entry
+
+    def release(self, entry, discard=False):
+        """Return a lease. A discarded transport is closed once unused."""
+        with self._lock:
+            entry.leases = max(0, entry.leases - 1)
+            entry.full = False
+            entry.idle_since = time.time()
+            if discard or not entry.is_active():
+                entries = self._transports.get(entry.key, [])
+                if entry in entries:
+                    entries.remove(entry)
+            if entry not in self._transports.get(entry.key, []) \
+               and not entry.leases:
+                entry.close()
+
+    def mark_full(self, entry):
+        """The peer refused a new channel on this (otherwise healthy)
+        transport, so don't lease it again for now."""
+        with self._lock:
+            entry.full = True
+        LOG.debug('%s is full.', entry)
+
+    def expire(self):
+        """Close transports that have been unused for more than max_idle."""
+        now = time.time()
+        with self._lock:
+            for entries in self._transports.values():
+                for entry in list(entries):
+                    if not entry.leases and (now - entry.idle_since > self.max_idle or
+                                             not entry.is_active()):
+                        self._discard(entry)
+
+    def clear(self, address=None):
+        """Close all unused transports, optionally only for one host. Leased
+        ones are closed when released."""
+        with self._lock:
+            for key, entries in self._transports.items():
+                if address is None or key[0] == address:
+                    for entry in self._transports.pop(key):
+                        if not entry.leases:
+                            entry.close()
+
+
+MANAGER = SSHConnectionManager()
@@ -25,6 +25,9 @@ INTERFACES_CONTAINER = 'interfaces'
 # To copy from the local file system.
 LOGCOLLECT_CONTAINER = 'logcollect'
 DEFAULT_CONTAINER = '__main__'
+# Maps get_interface() arguments to the name the interface was stored under,
+# shared by all contexts.
+INTERFACE_NAMES = '__interface_names__'
 LOG = logging.getLogger(__name__)
 
 
@@ -63,6 +66,9 @@ class InterfaceHelper(object):
         config = ConfigInterface().open()
         self._config = config.setdefault('_attrs', Options())
         self._name = name
+        # This context followed by all its parents, e.g. a.b.c, a.b, a
+        bits = name.split('.')
+        self._chain = ['.'.join(bits[:i]) for i in range(len(bits), 0, -1)]
 
     def _teardown(self):
         """
@@ -136,9 +142,15 @@ class InterfaceHelper(object):
         :param key: The key (or name) of the mapping.
         :param container: Container name.
         """
-        data = self.get_container(container)
-        if isinstance(data, dict):
-            return data.get(key)
+        # Same as get_container(container).get(key), without merging the
+        # whole container of every parent context.
+        data = Options()
+        for name in reversed(self._chain):
+            load = self._config.get(name)
+            if load and container in load and \
+               isinstance(load[container], dict) and key in load[container]:
+                data.update({key: load[container][key]})
+        return data.get(key)
 
     def set_container(self, container='default', name=None):
         """
@@ -159,25 +171,12 @@ class InterfaceHelper(object):
         child contexts.
         :type exact: bool
         """
-        i = pos = 0
-        my_id = self._name
         data = Options()
-        while pos != -1:
-            if exact:
-                pos = -1
-            else:
-                pos = my_id.find('.', i)
-
-            if pos > 0:
-                parent = my_id[:pos]
-            else:
-                parent = my_id
-
-            load = self._config.get(parent)
+        for name in [self._name] if exact else reversed(self._chain):
+            load = self._config.get(name)
             if load and container in load and \
                isinstance(load[container], dict):
                 data.update(load[container])
-            i = pos + 1
         return data
 
     def unset_data(self, key, container='default'):
@@ -204,8 +203,26 @@ class InterfaceHelper(object):
         if isinstance(klass, basestring):
             raise ValueError(klass)
 
+        # Look up a reusable interface by its arguments first, which saves
+        # creating one (and resolving its device and credentials) just to
+        # find out its name.
+        key = None
+        if reuse:
+            key = (klass, args, tuple(sorted(kwargs.items())))
+            try:
+                names = self._config.setdefault(INTERFACE_NAMES, {})
+                name = names.get(key)
+            except TypeError:
+                key = name = None
+            if name is not None:
+                previous = self.get_data(name, container=INTERFACES_CONTAINER)
+                if previous:
+                    return previous
+
         interface = klass(*args, **kwargs)
         name = repr(interface)
+        if key is not None:
+            names[key] = name
         found = False
         if reuse:
             previous = self.get_data(name, container=INTERFACES_CONTAINER)
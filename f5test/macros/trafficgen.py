@@ -25,9 +25,12 @@ class TrafficGen(Macro):
     def setup(self):
         o = self.options
         m = LoadManager(self.urls, concurrency=o.concurrency, 
-                        requests=o.requests, rate=o.rate)
+                        requests=o.requests, rate=o.rate,
+                        mode=o.mode or 'curl')
         m.set_timeout(o.timeout)
         m.set_results(o.stats)
+        if o.keepalive:
+            m.set_keepalive()
         
         # XXX: Balancing doesn't work! Should be reworked to use queue 
         # priorities.
@@ -52,7 +55,14 @@ class TrafficGen(Macro):
                 if countdown:
                     time.sleep(1)
                     countdown -= 1
-                    LOG.info('Running...')
+                    if o.stats:
+                        snap = m.get_snapshot()
+                        LOG.info('Running... %.1f req/s, %.1f KB/s, '
+                                 'p50 %.1f ms, p99 %.1f ms, %d failed',
+                                 snap.req_per_sec, snap.bytes_per_sec / 1024,
+                                 snap.p50 * 1000, snap.p99 * 1000, snap.failed)
+                    else:
+                        LOG.info('Running...')
                     if m.producer.done:
                         break
                 else:
@@ -103,10 +113,10 @@ class TrafficGen(Macro):
             print
             print'Max Concurrency Level:    %d' % (max_concurrency,)
             print'Time taken for tests: %.3f seconds' % (stats.total_wall_time,)
-            print'Complete requests:    %d' % (len(stats.results),)
+            print'Complete requests:    %d' % (stats.count,)
             print'Failed requests:      %d' % (stats.failed_requests,)
             print'Total transferred:    %d bytes' % (stats.total_req_length,)
-            print'Requests per second:  %.2f [#/sec] (mean)' % (len(stats.results) /
+            print'Requests per second:  %.2f [#/sec] (mean)' % (stats.count /
                                                                 stats.total_wall_time,)
             print'Time per request:     %.3f [ms] (mean)' % (stats.avg_req_time * 1000,)
             print'Time per request:     %.3f [ms] (mean,'\
@@ -155,6 +165,10 @@ def main():
                  help="[Threads delta:Sleep]... (default: 1:300:-1:300)")
     p.add_option("-t", "--timeout", metavar="SECONDS", type="int", default=10,
                  help="Timeout (default: 10)")
+    p.add_option("-m", "--mode", metavar="MODE", type="choice",
+                 choices=['curl', 'urllib', 'gevent'], default='curl',
+                 help="URL getter: curl (one thread per worker) or gevent "
+                 "(one event loop, for high concurrency) (default: curl)")
 
     options, args = p.parse_args()
 
@@ -11,10 +11,14 @@ import gevent.pool
 from geventhttpclient import HTTPClient, URL
 from ssl import PROTOCOL_TLSv1, CERT_NONE
 from dns.resolver import Resolver
+from Queue import Empty
 import dns
 import itertools
 import logging
+import multiprocessing
+import os
 import time
+import traceback
 import urlparse
 
 DEFAULT_TIMEOUT = 3
@@ -29,6 +33,17 @@ def partition(size, n):
     return [indices[i + 1] - indices[i] for i in range(n)]
 
 
+def worker(options, urls, queue):
+    """Entry point of a worker process. Reports its stats through queue."""
+    error = None
+    tg = TrafficGen(options, urls)
+    try:
+        tg.run()
+    except:
+        error = traceback.format_exc()
+    queue.put((os.getpid(), tg.stats, error))
+
+
 class TrafficGen(Macro):
 
     def __init__(self, options, urls):
@@ -38,6 +53,7 @@ class TrafficGen(Macro):
         options.setdefault('rate', 100)
         options.setdefault('requests', 1)
         options.setdefault('keepalive', False)
+        options.setdefault('processes', 1)
         self.options = Options(options)
         self.urls = urls
 
@@ -84,10 +100,88 @@ class TrafficGen(Macro):
                                      )
         return client
 
+    def shard(self, n):
+        """Split the URLs (or the requests, if there are fewer URLs than
+        workers) and the concurrency between n workers.
+
+        Returns a list of (options, urls) tuples.
+        """
+        o = self.options
+        n = min(n, o.concurrency)
+        if len(self.urls) >= n:
+            urls = [self.urls[i::n] for i in range(n)]
+            requests = [o.requests] * n
+        else:
+            urls = [self.urls] * n
+            if o.requests > 0:
+                n = min(n, o.requests)
+                urls = urls[:n]
+                requests = partition(o.requests, n)
+            else:
+                requests = [o.requests] * n
+
+        shards = []
+        for i, concurrency in enumerate(partition(o.concurrency, n)):
+            options = Options(o)
+            options.update(processes=1, requests=requests[i],
+                           concurrency=max(concurrency, len(urls[i])))
+            shards.append((options, urls[i]))
+        return shards
+
+    def run_workers(self, n):
+        """Fork n worker processes, each with its own gevent hub, and
+        aggregate their stats."""
+        o = self.options
+        queue = multiprocessing.Queue()
+        workers = []
+        for options, urls in self.shard(n):
+            p = multiprocessing.Process(target=worker, args=(options, urls, queue))
+            p.start()
+            workers.append(p)
+        LOG.info('Running %d workers...', len(workers))
+
+        now = time.time()
+        deadline = now + o.limit + o.timeout + 10
+        results = []
+        try:
+            while len(results) < len(workers):
+                try:
+                    results.append(queue.get(timeout=max(deadline - time.time(), 0)))
+                except Empty:
+                    LOG.warning('%d workers did not report back.',
+                                len(workers) - len(results))
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for p in workers:
+                if p.is_alive():
+                    p.terminate()
+                p.join()
+
+        stats = self.stats
+        for pid, worker_stats, error in results:
+            if error:
+                LOG.error('Worker %d failed: %s', pid, error)
+            stats.requests.successful += worker_stats.requests.successful
+            stats.requests.failed += worker_stats.requests.failed
+            stats.data.total += worker_stats.data.total
+            stats.time.req_per_sec += worker_stats.time.req_per_sec
+        stats.time.delta = time.time() - now
+        stats.workers = len(workers)
+
+        LOG.info("stats: %s" % stats)
+
     def setup(self):
         o = self.options
         assert o.concurrency > 0, "Number of concurrent threads must be positive."
 
+        processes = o.processes
+        if processes == 0:
+            processes = multiprocessing.cpu_count()
+        if processes > 1:
+            return self.run_workers(processes)
+
         def run(client, url):
             qs = url.request_uri
             try:
@@ -204,6 +298,8 @@ def main():
                  default=DEFAULT_TIMEOUT, help="Timeout (default: %d)" % DEFAULT_TIMEOUT)
     p.add_option("-l", "--limit", metavar="SECONDS", type="int",
                  default=DEFAULT_LIMIT, help="Run limit (default: %d)" % DEFAULT_LIMIT)
+    p.add_option("-P", "--processes", metavar="INTEGER", type="int", default=1,
+                 help="Number of worker processes, 0 for one per core (default: 1)")
 
     options, args = p.parse_args()
 
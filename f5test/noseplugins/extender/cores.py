@@ -5,13 +5,14 @@ Created on Aug 28, 2014
 '''
 import logging
 import os
+import pipes
 import re
 from threading import Thread
 from nose.case import Test
 import time
 
 from f5test.interfaces.ssh.core import SSHInterface
-from f5test.interfaces.ssh.driver import SSHTimeoutError
+from f5test.interfaces.ssh.driver import SSHTimeoutError, SSHBulkGetError
 from f5test.interfaces.subprocess.core import ShellInterface
 from f5test.interfaces.testcase import ContextHelper
 import f5test.commands.shell as SCMD
@@ -87,9 +88,20 @@ class CoreCollector(Thread):
                 cores_dir, _ = self._get_or_create_dirs("%s/%s" % (CORES_DIR, sshifc.address),
                                                         self.root)
 
-                SCMD.ssh.scp_get(ifc=sshifc, source='/var/core/*',
-                                 destination=cores_dir)
-                sshifc.api.run('rm -f /var/core/*')
+                # Cores are already compressed.
+                try:
+                    files = SCMD.ssh.bulk_get('/var/core/*', cores_dir,
+                                              compress=False, strict=True,
+                                              ifc=sshifc)
+                except SSHBulkGetError, e:
+                    LOG.warning('Not all cores were collected: %s', e)
+                    # Cores that changed were still being written.
+                    files = [x for x in e.files if x not in e.changed]
+                # Only delete what was copied whole.
+                if files:
+                    sshifc.api.run('rm -f %s' % ' '.join(
+                        pipes.quote('/var/core/%s' % os.path.basename(x))
+                        for x in files))
 
                 # Add read permissions to group and others.
                 with ShellInterface(shell=True) as shell:
@@ -109,10 +121,8 @@ class CoreCollector(Thread):
                     qk_dir, _ = self._get_or_create_dirs("%s/%s" % (QKVIEWS_DIR, sshifc.address),
                                                          self.root)
 
-                    SCMD.ssh.scp_get(ifc=sshifc, source=name, destination=qk_dir)
-                    if sshifc.api.exists(SCF_FILENAME):
-                        SCMD.ssh.scp_get(ifc=sshifc, source=SCF_FILENAME,
-                                         destination=qk_dir)
+                    SCMD.ssh.bulk_get([name, SCF_FILENAME], qk_dir,
+                                      compress=False, ifc=sshifc)
 
                 except SSHTimeoutError:
                     LOG.warning('Could not complete qkview on %s', sshifc.address)
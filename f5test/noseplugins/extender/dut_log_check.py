@@ -1,7 +1,7 @@
 from __future__ import absolute_import
 import logging
 from . import ExtendedPlugin, PLUGIN_NAME
-from f5test.utils.parsers.logs import GrepLogTester
+from f5test.utils.parsers.logs import LogCursor
 import csv
 import os
 
@@ -36,17 +36,17 @@ class DutLogCheck(ExtendedPlugin):
         """Set up log checker for main dut log"""
 
         # Watch log for warnings and severe messages
-        self.warnlog = GrepLogTester(LOGNAME,
-                                     self.default_ssh_ifc, 'WARNING').setup()
-        self.sevlog = GrepLogTester(LOGNAME,
-                                    self.default_ssh_ifc, 'SEVERE').setup()
+        self.cursor.read()
+        self.warnlog.mark()
+        self.sevlog.mark()
 
     def stopTest(self, test):
         """Check for warning/severe messages in main dut log"""
 
-        # Check for warnings and severe messages in log
-        warning = self.warnlog.teardown()
-        severe = self.sevlog.teardown()
+        # Check for warnings and severe messages in log, in one pass
+        self.cursor.read()
+        warning = self.warnlog.drain()
+        severe = self.sevlog.drain()
 
         # Create a test entry to add to the test collection for reporting
         testdata = {}
@@ -60,11 +60,17 @@ class DutLogCheck(ExtendedPlugin):
         """Open SSH connection for default dut
         """
         self.default_ssh_ifc = self.context.get_ssh()
+        self.cursor = LogCursor.get(self.default_ssh_ifc, LOGNAME,
+                                    'WARNING|SEVERE')
+        self.warnlog = self.cursor.subscribe('WARNING')
+        self.sevlog = self.cursor.subscribe('SEVERE')
 
     def finalize(self, result):
         """Close SSH connection for default dut, and write CSV file with
            aggregated results.
         """
+        self.cursor.unsubscribe(self.warnlog)
+        self.cursor.unsubscribe(self.sevlog)
         self.context.teardown()
         d = self.data
         path = d.session.path
@@ -1,6 +1,6 @@
 from __future__ import absolute_import
 import logging
-from f5test.interfaces.ssh import SSHInterface
+from f5test.interfaces.ssh import SSHInterface, gather
 from ...interfaces.config import expand_devices
 from . import ExtendedPlugin, PLUGIN_NAME
 import csv
@@ -57,10 +57,15 @@ class DutSystemStats(ExtendedPlugin):
                 if 'fields' in jvm_diag:
                     self.jvm_stats = jvm_diag['fields']
 
-    def retrieve_runtime(self, restifc):
+    def retrieve_runtime(self, restifc, runtime=None):
         return_dict = AttrDict()
+        # The in-band sample may be an error document (e.g. a 401), in which
+        # case ask the REST API instead.
+        if not isinstance(runtime, dict) or \
+           any(x not in runtime for x in self.jvm_stats):
+            runtime = None
         try:
-            restcall = restifc.api.get(DiagnosticsRuntime.URI)
+            restcall = runtime or restifc.api.get(DiagnosticsRuntime.URI)
             for field in self.jvm_stats:
                 return_dict[field] = restcall[field]
         except:
@@ -69,12 +74,18 @@ class DutSystemStats(ExtendedPlugin):
 
         return return_dict
 
+    def get_stats(self):
+        """Collect system stats from all duts at once"""
+        jvm = bool(self.jvm_stats)
+        outcomes = gather(lambda x: get_system_stats(ifc=x['ssh'], jvm=jvm),
+                          self.dutlist, raise_on_error=True)
+        return [(x.key, x.value) for x in outcomes]
+
     def startTest(self, test, blocking_context=None):
         """Collect system stats for each dut"""
 
         self.current_test = {}
-        for dut in self.dutlist:
-            util = get_system_stats(ifc=dut['ssh'])
+        for dut, util in self.get_stats():
             self.current_test[dut['name']] = {'time': datetime.datetime.now(),
                                               'mem': util['MEM'],
                                               'cpuavg': util['CPUFORMATTED'],
@@ -82,16 +93,15 @@ class DutSystemStats(ExtendedPlugin):
                                               'jvm': None
                                               }
             if self.jvm_stats:
-                self.current_test[dut['name']]['jvm'] = self.retrieve_runtime(dut['rest'])
+                self.current_test[dut['name']]['jvm'] = self.retrieve_runtime(dut['rest'],
+                                                                             util.JVM)
 
     def stopTest(self, test):
         """Collect system stats for each dut and add pre and post stats
            to a result list
         """
 
-        for dut in self.dutlist:
-            util = get_system_stats(ifc=dut['ssh'])
-
+        for dut, util in self.get_stats():
             pretest = self.current_test[dut['name']]
             posttest = {'time': datetime.datetime.now(),
                         'mem': util['MEM'],
@@ -100,7 +110,7 @@ class DutSystemStats(ExtendedPlugin):
                         'jvm': None
                         }
             if self.jvm_stats:
-                posttest['jvm'] = self.retrieve_runtime(dut['rest'])
+                posttest['jvm'] = self.retrieve_runtime(dut['rest'], util.JVM)
 
             dut['results'].append({'test': test,
                                    'pretest': pretest,
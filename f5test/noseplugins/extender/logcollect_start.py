@@ -36,6 +36,8 @@ TEST_HTML = 'test_log.html'
 SAFE_LEVEL = 1
 HREF_TMPL = r'<a href="https://indexing.f5net.com/source/xref/emtest/\2#\3">\1</a>'
 INC_TEST_ATTRIBUTES = ('author', 'rank')
+# Overall time budget for collecting logs from all devices after a failure.
+FORENSICS_TIMEOUT = 300
 CONTEXT_NAME = __name__
 
 
@@ -184,7 +186,9 @@ class LogCollect(ExtendedPlugin):
         self.loglevel = options.level or 'NOTSET'
         if options.filters:
             self.filters = options.filters
+        self.timeout = options.get('timeout', FORENSICS_TIMEOUT)
         self.blocked_contexts = {}
+        self.versions = {}
 
     def _get_session_dir(self):
         cfgifc = self.context.get_config()
@@ -335,7 +339,7 @@ class LogCollect(ExtendedPlugin):
     def _collect_forensics(self, test, err, context=None):
         """Collects screenshots and logs."""
         from ...interfaces.selenium import SeleniumInterface
-        from ...interfaces.ssh import SSHInterface
+        from ...interfaces.ssh import SSHInterface, gather
         from ...interfaces.subprocess import ShellInterface
         from ...interfaces.icontrol import IcontrolInterface
         from ...interfaces.icontrol.em import EMInterface
@@ -446,6 +450,7 @@ class LogCollect(ExtendedPlugin):
                 f.write(base64.b64decode(err[1].screen.encode('ascii')))
 
         visited = dict(ssh=set(), selenium=set())
+        pending = []
         # Collect interface logs
         for interface in interfaces:
             if not isinstance(interface, Interface):
@@ -504,26 +509,36 @@ class LogCollect(ExtendedPlugin):
                 LOG.debug('Skip collection from interface: %s', interface)
 
             for sshifc in sshifcs:
-                try:
-                    with sshifc:
-                        address = sshifc.address
-                        if address not in visited['ssh']:
-                            log_root, _ = self._get_or_create_dirs(address, test_root)
-                            LOG.debug('Collecting logs from %s', address)
-                            try:
-                                version = self.SSH.get_version(ifc=sshifc)
-                                self.SSH.collect_logs(log_root, ifc=sshifc,
-                                                      version=version)
-                            except Exception, e:
-                                LOG.error('Collecting logs failed: %s', e)
-                            visited['ssh'].add(address)
-                except:
-                    err = sys.exc_info()
-                    tb = ''.join(traceback.format_exception(*err))
-                    LOG.debug('Error collecting logs. (%s)', tb)
+                address = sshifc.address
+                if address not in visited['ssh']:
+                    log_root, _ = self._get_or_create_dirs(address, test_root)
+                    pending.append((sshifc, log_root))
+                    visited['ssh'].add(address)
+
+        # All devices at once, so that one slow device doesn't hold the run
+        # back for longer than the time budget.
+        for outcome in gather(self._collect_logs, pending, timeout=self.timeout):
+            if outcome.exc_info:
+                tb = ''.join(traceback.format_exception(*outcome.exc_info))
+                LOG.debug('Error collecting logs. (%s)', tb)
 
         del interfaces[:]
 
+    def _collect_logs(self, item):
+        sshifc, log_root = item
+        with sshifc:
+            address = sshifc.address
+            LOG.debug('Collecting logs from %s', address)
+            try:
+                # The version is looked up once per device and session.
+                version = self.versions.get(address)
+                if version is None:
+                    version = self.SSH.get_version(ifc=sshifc)
+                    self.versions[address] = version
+                self.SSH.collect_logs(log_root, ifc=sshifc, version=version)
+            except Exception, e:
+                LOG.error('Collecting logs failed: %s', e)
+
     def handleFailure(self, test, err):
         try:
             self._collect_forensics(test, err)
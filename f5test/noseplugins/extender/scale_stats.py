@@ -7,7 +7,7 @@ from . import ExtendedPlugin, PLUGIN_NAME
 from threading import Thread
 from f5test.interfaces.config.core import ConfigInterface
 from f5test.interfaces.ssh.core import SSHInterface
-from f5test.interfaces.ssh.driver import SSHTimeoutError
+from f5test.interfaces.ssh.driver import SSHTimeoutError, SSHBulkGetError
 from f5test.interfaces.testcase import ContextHelper
 from socket import inet_aton
 import f5test.commands.shell as SCMD
@@ -58,11 +58,10 @@ class ScaleStatsCollector(Thread):
                     os.makedirs(log_dir)
 
                 # Collect specific files
-                for log in LOGS:
-                    ret = sshifc.api.run('ls -1 %s | wc -l' % log)
-                    if not ret.status and int(ret.stdout):
-                        SCMD.ssh.scp_get(ifc=sshifc, source=log,
-                                         destination=log_dir)
+                try:
+                    SCMD.ssh.bulk_get(LOGS, log_dir, ifc=sshifc)
+                except SSHBulkGetError, e:
+                    LOG.warning('Some logs were not collected: %s', e)
 
                 context = ContextHelper(__name__)
                 r = context.get_icontrol_rest(device=self.device).api
@@ -70,9 +69,10 @@ class ScaleStatsCollector(Thread):
                 with open(os.path.join(stat_dir, 'diagnostics'), 'wt') as f:
                     json.dump(output, f, indent=4)
 
-                if SCMD.ssh.file_exists(ifc=sshifc, filename=FILE):
-                    SCMD.ssh.scp_get(ifc=sshifc, source=FILE,
-                                     destination=stat_dir)
+                try:
+                    SCMD.ssh.bulk_get(FILE, stat_dir, ifc=sshifc)
+                except SSHBulkGetError, e:
+                    LOG.warning('Some files were not collected: %s', e)
 
                 # Collect stats
                 for stat in STATS:
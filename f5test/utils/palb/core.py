@@ -57,6 +57,7 @@ class URLGetter(threading.Thread):
             
             if url is None:
                 #LOG.debug('3*** %s' % self._Thread__name)
+                self.idle()
                 continue
             
             if self.done:
@@ -75,6 +76,9 @@ class URLGetter(threading.Thread):
         #LOG.debug("xxx: %s", self.signup_list)
         LOG.debug('%s done' % self._Thread__name)
 
+    def idle(self):
+        pass
+
     def get_url(self, url):
         return NotImplementedError
 
@@ -104,9 +108,13 @@ class URLGetterPool(object):
             from .getter.urllib import url_getter #@UnusedImport @Reimport
         elif mode == 'dns':
             from .getter.dns import url_getter #@Reimport
+        elif mode == 'gevent':
+            from .getter.green import url_getter #@Reimport
         else:
-            raise NotImplementedError('Mode %s unknown. Only curl, urllib and dns allowed.' % mode)
+            raise NotImplementedError('Mode %s unknown. Only curl, urllib, dns and gevent allowed.' % mode)
         self.getter = url_getter
+        # Getters running on an event loop must not block it.
+        self.sleep = getattr(url_getter, 'sleep', time.sleep)
 
     def job_request(self):
         secs = 0
@@ -125,7 +133,7 @@ class URLGetterPool(object):
             # Balance requests equally for all workers.
             if self.balancing_enabled and \
                self.ratios.get(url, 0) >= self.size / self.urls_len:
-                time.sleep(secs)
+                self.sleep(secs)
                 secs += self.balance_delay
             else:
                 secs = 0
@@ -179,6 +187,10 @@ class URLGetterPool(object):
         while len(self.getters) > 0:
             LOG.debug('Wait for %d more workers to finish' % len(self.getters))
             time.sleep(1)
+        # Getters sharing a thread (e.g. an event loop) clean it up here.
+        shutdown = getattr(self.getter, 'shutdown', None)
+        if shutdown is not None:
+            shutdown()
         LOG.debug('Pool stop()')
 
 
@@ -326,6 +338,10 @@ class LoadManager(object):
 
         return self.stats
 
+    def get_snapshot(self):
+        """Throughput and latencies since the previous call."""
+        return self.get_stats_so_far().snapshot()
+
 
 class PALB(object):
 
@@ -366,10 +382,10 @@ class PALB(object):
         print >> out
         print >> out, 'Concurrency Level:    %d' % (self.c,)
         print >> out, 'Time taken for tests: %.3f seconds' % (stats.total_wall_time,)
-        print >> out, 'Complete requests:    %d' % (len(stats.results),)
+        print >> out, 'Complete requests:    %d' % (stats.count,)
         print >> out, 'Failed requests:      %d' % (stats.failed_requests,)
         print >> out, 'Total transferred:    %d bytes' % (stats.total_req_length,)
-        print >> out, 'Requests per second:  %.2f [#/sec] (mean)' % (len(stats.results) /
+        print >> out, 'Requests per second:  %.2f [#/sec] (mean)' % (stats.count /
                                                                     stats.total_wall_time,)
         print >> out, 'Time per request:     %.3f [ms] (mean)' % (stats.avg_req_time * 1000,)
         print >> out, 'Time per request:     %.3f [ms] (mean,'\
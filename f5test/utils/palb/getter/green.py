@@ -0,0 +1,228 @@
+'''
+Created on Oct 17, 2026
+
+@author: jono
+'''
+from __future__ import absolute_import
+import Queue
+import threading
+import time
+import logging
+import urlparse
+import gevent
+from geventhttpclient import HTTPClient
+from ssl import PROTOCOL_TLSv1, CERT_NONE
+from dns.resolver import Resolver
+import dns
+from ..core import URLGetter, Result
+
+LOG = logging.getLogger(__name__)
+BLOCK_SIZE = 64 * 1024
+IDLE_DELAY = 0.01
+# How long the event loop thread lingers after its last getter is gone.
+LOOP_LINGER = 1
+# How long stop() waits for the event loop thread to finish.
+STOP_TIMEOUT = 10
+
+
+class EventLoop(threading.Thread):
+    """One OS thread running a gevent hub with all the getters as greenlets.
+
+    Greenlets are handed over from other threads through a queue, which is
+    drained by the loop itself, since gevent is not thread-safe.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        threading.Thread.__init__(self, name='palb-eventloop')
+        self.daemon = True
+        self.incoming = Queue.Queue()
+        self.greenlets = set()
+        self.stopped = False
+        self.stopping = False
+
+    @classmethod
+    def spawn(cls, func, *args):
+        with cls._lock:
+            loop = cls._instance
+            if loop is None or loop.stopped:
+                loop = cls._instance = cls()
+                loop.start()
+            loop.incoming.put((func, args))
+
+    @classmethod
+    def stop(cls, timeout=STOP_TIMEOUT):
+        """Ends the event loop once its greenlets are done, and waits for its
+        thread, so that it doesn't outlive the caller into interpreter
+        shutdown."""
+        with cls._lock:
+            loop, cls._instance = cls._instance, None
+            if loop is None:
+                return
+            loop.stopping = True
+        loop.join(timeout)
+        if loop.is_alive():
+            LOG.warning('Event loop still busy with %d greenlets.',
+                        len(loop.greenlets))
+
+    def run(self):
+        idle_since = None
+        while True:
+            with EventLoop._lock:
+                while True:
+                    try:
+                        func, args = self.incoming.get_nowait()
+                    except Queue.Empty:
+                        break
+                    greenlet = gevent.spawn(func, *args)
+                    greenlet.link(self.greenlets.discard)
+                    self.greenlets.add(greenlet)
+
+                if self.greenlets:
+                    idle_since = None
+                elif idle_since is None:
+                    idle_since = time.time()
+                elif self.stopping or time.time() - idle_since > LOOP_LINGER:
+                    self.stopped = True
+                    break
+            gevent.sleep(IDLE_DELAY)
+
+        gevent.get_hub().destroy()
+        LOG.debug('Event loop done')
+
+
+class GeventURLGetter(URLGetter):
+    """A URL getter running as a greenlet instead of a thread.
+
+    All getters share one event loop, so one process can keep thousands of
+    concurrent keep-alive connections open. Each getter reuses its own
+    connection per host, just like a curl handle.
+    """
+    name = 'gevent'
+    sleep = staticmethod(gevent.sleep)
+
+    def __init__(self, signup_list, result_queue):
+        URLGetter.__init__(self, signup_list, result_queue)
+        self.clients = {}
+        self.headers = {}
+        self.keepalive = False
+        self.rate = 0
+        self.timeout = 300
+        self.dns = None
+        self.resolved = {}
+        self.resolver = Resolver(configure=False)
+
+    def start(self):
+        EventLoop.spawn(self.run)
+
+    @staticmethod
+    def shutdown():
+        EventLoop.stop()
+
+    def idle(self):
+        gevent.sleep(IDLE_DELAY)
+
+    def set_rate_limit(self, n):
+        self.rate = n
+
+    def set_headers(self, h):
+        self.headers = dict(x.split(': ', 1) for x in h)
+
+    def set_debug(self, f):
+        pass
+
+    def set_timeout(self, n):
+        self.timeout = n
+
+    def set_dns(self, dns):
+        self.dns = dns
+
+    def set_keepalive(self, f):
+        self.keepalive = f
+
+    def close(self):
+        for client in self.clients.values():
+            client.close()
+        self.clients.clear()
+
+    def resolve(self, url):
+        """Resolve the host using a custom DNS server. Results are cached,
+        since dnspython is blocking."""
+        u = urlparse.urlparse(url)
+        qname = u.hostname
+        ip = self.resolved.get(qname)
+        if ip is None:
+            self.resolver.nameservers = [self.dns]
+            answer = self.resolver.query(qname, rdtype=dns.rdatatype.A,
+                                         rdclass=dns.rdataclass.IN, tcp=False,
+                                         source=None, raise_on_no_answer=False)
+            if not answer.response.answer:
+                return url, None
+            ip = self.resolved[qname] = answer.response.answer[0].items[0].address
+
+        if u.port:
+            netloc = '%s:%d' % (ip, u.port)
+        else:
+            netloc = ip
+        return urlparse.urlunsplit((u[0], netloc, u[2], u[3], u[4])), qname
+
+    def get_client(self, url):
+        u = urlparse.urlparse(url)
+        key = (u.scheme, u.netloc)
+        client = self.clients.get(key)
+        if client is None:
+            kwargs = {}
+            if u.scheme == 'https':
+                kwargs.update(ssl=True, insecure=True,
+                              ssl_options=dict(ssl_version=PROTOCOL_TLSv1,
+                                               cert_reqs=CERT_NONE))
+            client = HTTPClient(u.hostname, u.port,
+                                connection_timeout=self.timeout,
+                                network_timeout=self.timeout, **kwargs)
+            self.clients[key] = client
+        return client
+
+    def get_url(self, url):
+        headers = dict(self.headers)
+        headers['Connection'] = 'Keep-Alive' if self.keepalive else 'Close'
+        if self.dns:
+            url, qname = self.resolve(url)
+            if qname:
+                headers['Host'] = qname
+
+        u = urlparse.urlparse(url)
+        request_uri = u.path or '/'
+        if u.query:
+            request_uri += '?' + u.query
+
+        start = time.time()
+        size = status = 0
+        client = self.get_client(url)
+        try:
+            response = client.get(request_uri, headers=headers)
+            status = response.status_code
+            while True:
+                block = response.read(BLOCK_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                if self.rate > 0:
+                    delay = size / float(self.rate) - (time.time() - start)
+                    if delay > 0:
+                        gevent.sleep(delay)
+            response.release()
+        except Exception, e:
+            # to avoid hogging the CPU in case of repeated errors
+            gevent.sleep(.1)
+            LOG.warn("gevent barfed on '%s': %s", url, e)
+            client.close()
+            self.clients.pop((u.scheme, u.netloc), None)
+
+        if not self.keepalive:
+            client.close()
+            self.clients.pop((u.scheme, u.netloc), None)
+
+        return Result(time.time() - start, size, status)
+
+url_getter = GeventURLGetter
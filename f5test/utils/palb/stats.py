@@ -1,77 +1,202 @@
 from __future__ import division
+import collections
 import math
 import time
 
+# Histogram resolution: 2^SUB_BUCKET_BITS sub-buckets per power of two, that is
+# a relative error of at most 2 / 2^SUB_BUCKET_BITS (<1%).
+SUB_BUCKET_BITS = 8
+# Latencies are recorded in microseconds.
+UNIT = 1e-6
+PERCENTILES = (50, 66, 75, 80, 90, 95, 98, 99)
+
+Snapshot = collections.namedtuple('Snapshot', 'start end count failed size '
+                                  'req_per_sec bytes_per_sec avg p50 p99')
+
+
+class Histogram(object):
+    """A log-bucketed (HDR style) histogram with constant memory, which also
+    keeps a running mean and variance (Welford's algorithm).
+
+    Values below 2^SUB_BUCKET_BITS units are exact, larger ones share a
+    bucket with values within 1% of them.
+
+    >>> h = Histogram()
+    >>> for x in (0.1, 0.2, 0.3): h.record(x)
+    >>> round(h.percentile(50), 2), round(h.mean, 2)
+    (0.2, 0.2)
+    """
+
+    def __init__(self, unit=UNIT):
+        self.unit = unit
+        self.scale = 1 / unit
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.mean = 0
+        self.min = None
+        self.max = None
+        self._m2 = 0
+
+    @staticmethod
+    def _value(index):
+        """The middle of the bucket."""
+        shift = index >> SUB_BUCKET_BITS
+        if not shift:
+            return index
+        shift -= 1
+        lower = (index & ((1 << SUB_BUCKET_BITS) - 1)) << (shift + 1)
+        return lower + (1 << shift)
+
+    def record(self, value):
+        if self.count:
+            if value < self.min:
+                self.min = value
+            elif value > self.max:
+                self.max = value
+        else:
+            self.min = self.max = value
+
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+        index = int(value * self.scale)
+        shift = index.bit_length() - SUB_BUCKET_BITS
+        if shift > 0:
+            index = (shift << SUB_BUCKET_BITS) + (index >> shift)
+        counts = self.counts
+        counts[index] = counts.get(index, 0) + 1
+
+    @property
+    def std_deviation(self):
+        if self.count < 2:
+            return 0
+        return math.sqrt(self._m2 / (self.count - 1))
+
+    def copy(self):
+        other = Histogram(self.unit)
+        other.__dict__.update(self.__dict__)
+        other.counts = dict(self.counts)
+        return other
+
+    def percentiles(self, percents, since=None):
+        """Returns the values at the given (sorted) percents.
+
+        @param since: Only count values recorded after this copy was taken.
+        @type since: Histogram
+        """
+        counts = self.counts
+        count = self.count
+        if since is not None:
+            old = since.counts
+            counts = dict((k, v - old.get(k, 0)) for k, v in counts.iteritems())
+            count -= since.count
+        if not count:
+            return [0] * len(percents)
+
+        ret = []
+        percents = list(percents)
+        seen = 0
+        for index in sorted(counts):
+            seen += counts[index]
+            while percents and seen > int(percents[0] / 100 * count - 0.001):
+                percents.pop(0)
+                value = self._value(index) * self.unit
+                ret.append(min(max(value, self.min), self.max))
+            if not percents:
+                break
+        ret += [self.max] * len(percents)
+        return ret
+
+    def percentile(self, percent):
+        return self.percentiles([percent])[0]
+
+
 class ResultStats(object):
-    def __init__(self):
-        self.results = []
+    """Aggregates Results in constant memory.
+
+    Individual results are only kept when keep_results is set.
+    """
+
+    def __init__(self, keep_results=False):
+        self.results = [] if keep_results else None
         self.start_time = time.time()
         self.total_wall_time = -1
+        self.failed_requests = 0
+        self.total_req_length = 0
+        self.times = Histogram()
+        # Connect, Processing, Waiting
+        self.details = (Histogram(), Histogram(), Histogram())
+        self._last = self._get_state()
+
+    def _get_state(self):
+        return (time.time(), self.times.copy(), self.failed_requests,
+                self.total_req_length)
 
     def stop(self):
         self.total_wall_time = time.time() - self.start_time
 
     def add(self, result):
-        if result is not None:
+        if result is None:
+            return
+        if self.results is not None:
             self.results.append(result)
 
+        if result.status != 200:
+            self.failed_requests += 1
+        self.total_req_length += result.size
+        self.times.record(result.time)
+        if result.detail_time is not None:
+            connect, process, wait = self.details
+            connect.record(result.detail_time[0])
+            process.record(result.detail_time[1])
+            wait.record(result.detail_time[2])
+
+    def snapshot(self):
+        """Stats of the results added since the previous snapshot, for live
+        reporting."""
+        start, times, failed, size = self._last
+        self._last = self._get_state()
+        end = self._last[0]
+        delta = (end - start) or 1e-9
+        count = self.times.count - times.count
+        size = self.total_req_length - size
+        avg = (self.times.total - times.total) / count if count else 0
+        p50, p99 = self.times.percentiles([50, 99], since=times)
+        return Snapshot(start, end, count, self.failed_requests - failed, size,
+                        count / delta, size / delta, avg, p50, p99)
+
     @property
-    def failed_requests(self):
-        return sum(1 for r in self.results if r.status != 200)
+    def count(self):
+        return self.times.count
 
     @property
     def total_req_time(self):
-        return sum(r.time for r in self.results)
+        return self.times.total
 
     @property
     def avg_req_time(self):
-        if len(self.results) > 0:
-            return self.total_req_time / len(self.results)
-        else:
-            return 0
-
-    @property
-    def total_req_length(self):
-        return sum(r.size for r in self.results)
+        return self.times.mean
 
     @property
     def avg_req_length(self):
-        return self.total_req_length / len(self.results)
+        return self.total_req_length / self.count
 
     def distribution(self):
-        results = sorted(r.time for r in self.results)
-        dist = []
-        n = len(results)
-        for p in (50, 66, 75, 80, 90, 95, 98, 99):
-            i = p/100 * n - 0.001 #return right time if matched
-            if i >= n:
-                i = n-1
-            else:
-                i = int(i)
-            dist.append((p, results[i]))
-        dist.append((100, results[-1]))
+        dist = zip(PERCENTILES, self.times.percentiles(PERCENTILES))
+        dist.append((100, self.times.max))
         return dist
 
     def connection_times(self):
-        if self.results[0].detail_time is None:
+        if not self.details[0].count:
             return None
-        connect = [r.detail_time[0] for r in self.results]
-        process = [r.detail_time[1] for r in self.results]
-        wait = [r.detail_time[2] for r in self.results]
-        total = [r.time for r in self.results]
 
         results = []
-        for data in (connect, process, wait, total):
-            results.append((min(data), mean(data), std_deviation(data),
-                            median(data), max(data)))
+        for histogram in self.details + (self.times,):
+            results.append((histogram.min, histogram.mean,
+                            histogram.std_deviation, histogram.percentile(50),
+                            histogram.max))
         return results
-
-square_sum = lambda l: sum(x*x for x in l)
-mean = lambda l: sum(l)/len(l)
-deviations = lambda l, mean: [x-mean for x in l]
-def std_deviation(l):
-    n = len(l)
-    if n == 1:
-        return 0
-    return math.sqrt(square_sum(deviations(l, mean(l)))/(n-1))
-median = lambda l: sorted(l)[int(len(l)//2)]
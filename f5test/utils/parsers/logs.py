@@ -4,13 +4,182 @@ Modified on: $DateTime: 2015/05/11 10:06:16 $
 
 @author: jono
 '''
+import os
+import pipes
 import re
+import threading
 import logging
 from f5test.utils.wait import wait
 from f5test.base import AttrDict
-from f5test.interfaces.ssh import SSHInterface
+from f5test.interfaces.ssh import SSHInterface, gather
 
 LOG = logging.getLogger(__name__)
+HEADER = '@@cursor'
+
+# Reads what was appended to a file since (inode, offset) in one go. If the
+# file was rotated, the rest of the old file (found by its inode in the same
+# directory) comes first. A truncated file is read from the start.
+READ_SCRIPT = """\
+f={filename}; ino={inode}; off={offset}
+set -- $(stat -L -c '%i %s' "$f" 2>/dev/null || echo 0 0)
+echo "{header} $1 $2"
+{{
+if [ "$ino" != 0 ] && [ "$1" != "$ino" ]; then
+    old=$(find {dirname} -maxdepth 1 -inum "$ino" 2>/dev/null | head -1)
+    [ -n "$old" ] && tail -c +$((off + 1)) "$old"
+    off=0
+elif [ "$2" -lt "$off" ]; then
+    off=0
+fi
+[ "$2" -gt "$off" ] && tail -c +$((off + 1)) "$f" | head -c $(($2 - off))
+}}{grep}
+true"""
+
+
+class Subscription(object):
+    """Lines matching one regex, as dispatched by a LogCursor.
+
+    Every read of the cursor, by anyone, hands the new lines to all its
+    subscriptions, so each one sees everything since its own mark().
+    """
+
+    def __init__(self, expr, cursor=None):
+        self.regex = re.compile(expr) if isinstance(expr, basestring) else expr
+        self.cursor = cursor
+        self.lines = []
+
+    def mark(self, read=False):
+        """Forgets the lines matched so far, after reading the cursor if
+        asked to."""
+        if read and self.cursor is not None:
+            self.cursor.read()
+        self.lines = []
+        return self
+
+    def drain(self, read=False):
+        """Returns the lines matched since the previous drain() or mark(),
+        after reading the cursor if asked to."""
+        if read and self.cursor is not None:
+            self.cursor.read()
+        lines, self.lines = self.lines, []
+        return lines
+
+
+class LogCursor(object):
+    """Follows one remote file across reads and log rotations.
+
+    Each read() returns only what was appended since the previous one, in one
+    SSH round-trip, and hands every line to all subscriptions in one pass.
+    The remote_filter (an extended regex for grep) is applied on the device,
+    so that only interesting lines are transferred.
+
+    Cursors are shared per (device, file, filter), see get(). Shared cursors
+    have a single offset, so their users must go through subscriptions,
+    which keep track of what each one has seen. The cursor is dropped once
+    its last subscription is gone.
+
+    >>> cursor = LogCursor.get(sshifc, '/var/log/restjavad.0.log', 'WARNING|SEVERE')
+    >>> warnings = cursor.subscribe('WARNING')
+    >>> cursor.mark()
+    >>> ...
+    >>> cursor.read()
+    >>> warnings.drain()
+    """
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __init__(self, ifc, filename, remote_filter=None):
+        self.ifc = ifc
+        self.filename = filename
+        self.remote_filter = remote_filter
+        self.inode = 0
+        self.offset = 0
+        self.subscriptions = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, ifc, filename, remote_filter=None):
+        key = (ifc.address, ifc.port, filename, remote_filter)
+        with cls._lock:
+            cursor = cls._instances.get(key)
+            if cursor is None:
+                cursor = cls._instances[key] = cls(ifc, filename, remote_filter)
+            else:
+                cursor.ifc = ifc
+            return cursor
+
+    def subscribe(self, expr):
+        subscription = Subscription(expr, self)
+        with self._lock:
+            self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self.subscriptions.remove(subscription)
+            if self.subscriptions:
+                return
+        with LogCursor._lock:
+            for key, cursor in LogCursor._instances.items():
+                if cursor is self:
+                    del LogCursor._instances[key]
+
+    @classmethod
+    def clear(cls):
+        """Drops all shared cursors (and their interfaces)."""
+        with cls._lock:
+            cls._instances.clear()
+
+    @property
+    def stats(self):
+        return AttrDict(st_ino=self.inode, st_size=self.offset)
+
+    def _fetch(self, skip=False):
+        grep = ''
+        if self.remote_filter:
+            grep = ' | grep -E -- %s' % pipes.quote(self.remote_filter)
+        script = READ_SCRIPT.format(filename=pipes.quote(self.filename),
+                                    dirname=pipes.quote(os.path.dirname(self.filename) or '.'),
+                                    inode=self.inode, offset=self.offset,
+                                    header=HEADER, grep=grep)
+        if skip:
+            # Only move the cursor to the end of the file.
+            script = script.split('\n{', 1)[0]
+        ret = self.ifc.api.run(script)
+        header, _, data = ret.stdout.partition('\n')
+        bits = header.split()
+        if len(bits) != 3 or bits[0] != HEADER:
+            raise ValueError("Can't read %s: %s" % (self.filename, ret))
+        if bits[1] == '0':
+            LOG.warning('%s not found.', self.filename)
+        elif self.inode and bits[1] != str(self.inode):
+            LOG.debug('%s was rotated.', self.filename)
+        self.inode, self.offset = int(bits[1]), int(bits[2])
+        return data
+
+    def mark(self):
+        """Moves the cursor to the end of the file. With subscriptions, what
+        was appended is still read and handed to them."""
+        with self._lock:
+            if self.subscriptions:
+                self._dispatch(self._fetch())
+            else:
+                self._fetch(skip=True)
+        return self
+
+    def _dispatch(self, data):
+        for line in data.splitlines():
+            for subscription in self.subscriptions:
+                if subscription.regex.search(line):
+                    subscription.lines.append(line)
+
+    def read(self):
+        """Returns what was appended since the previous read() or mark()."""
+        with self._lock:
+            data = self._fetch()
+            if self.subscriptions:
+                self._dispatch(data)
+            return data
 
 
 class LogTester(object):
@@ -34,23 +203,19 @@ class LogTester(object):
         self.teardown()
 
     def setup(self):
-        ssh = self.ifc.api
-        self._pre_stats = ssh.stat(self.filename)
+        self._cursor = LogCursor(self.ifc, self.filename).mark()
+        self._pre_stats = self._cursor.stats
         return self
 
     def teardown(self):
-        ssh = self.ifc.api
+        chunks = []
 
         def callback():
-            self._post_stats = ssh.stat(self.filename)
-
-            size_before = self._pre_stats.st_size
-            size_after = self._post_stats.st_size
-            delta = size_after - size_before
-            LOG.debug('delta: %d', delta)
-
-            ret = ssh.run('tail --bytes={0} {1}'.format(delta, self.filename))
-            return self.testcb(ret.stdout, self._post_stats)
+            # Only the new bytes are transferred on each try.
+            chunks.append(self._cursor.read())
+            self._post_stats = self._cursor.stats
+            LOG.debug('delta: %d', sum(len(x) for x in chunks))
+            return self.testcb(''.join(chunks), self._post_stats)
 
         if self.timeout:
             return wait(callback, timeout=self.timeout)
@@ -69,33 +234,31 @@ class LogsTester(LogTester):
         self.timeout = timeout
         self.devices = devices
 
-    def setup(self):
-        self._pre_stats = AttrDict()
-        for device in self.devices:
+    def _each(self, func):
+        def call(device):
             with SSHInterface(device=device) as ifc:
-                ssh = ifc.api
-                self._pre_stats[device] = ssh.stat(self.filename)
+                cursor = self._cursors[device]
+                cursor.ifc = ifc
+                return func(cursor)
+        outcomes = gather(call, self.devices, raise_on_error=True)
+        return dict((x.key, x.value) for x in outcomes)
+
+    def setup(self):
+        self._cursors = dict((x, LogCursor(None, self.filename))
+                             for x in self.devices)
+        self._each(LogCursor.mark)
+        self._pre_stats = AttrDict((x, y.stats) for x, y in self._cursors.items())
         return self
 
     def teardown(self):
-        def callback():
-            ret = AttrDict()
-            self._post_stats = AttrDict()
-
-            for device in self.devices:
-                with SSHInterface(device=device) as ifc:
-                    ssh = ifc.api
-                    self._post_stats[device] = ssh.stat(self.filename)
-
-                    size_before = self._pre_stats[device].st_size
-                    size_after = self._post_stats[device].st_size
-                    delta = size_after - size_before
-                    LOG.debug('delta: %d', delta)
-
-                    resp = ssh.run('tail --bytes={0} {1}'.format(delta,
-                                                                 self.filename))
-                    ret[device] = resp.stdout
+        chunks = dict((x, []) for x in self.devices)
 
+        def callback():
+            for device, data in self._each(LogCursor.read).items():
+                chunks[device].append(data)
+            ret = AttrDict((x, ''.join(y)) for x, y in chunks.items())
+            self._post_stats = AttrDict((x, y.stats)
+                                        for x, y in self._cursors.items())
             return self.testcb(ret, self._post_stats)
 
         if self.timeout:
@@ -111,11 +274,8 @@ class GrepLogTester(LogTester):
         self.filename = filename
         self.ifc = ifc
         self.timeout = None
+        regex = re.compile(expr)
 
         def testcb(stdout, stats):
-            lines = []
-            for line in stdout.splitlines():
-                if re.search(expr, line):
-                    lines.append(line)
-            return lines
+            return [x for x in stdout.splitlines() if regex.search(x)]
         self.testcb = testcb
@@ -0,0 +1,153 @@
+'''
+Created on Oct 17, 2026
+
+@author: jono
+'''
+import json
+from ...base import AttrDict
+
+SEPARATOR = '@@'
+JVM_URL = 'http://localhost:8100/mgmt/shared/diagnostics/runtime'
+
+
+def sample_command(partition='/', top=0, jvm=False):
+    """Builds one shell command that dumps everything parse_sample() needs.
+
+    The raw /proc counters are sent back as they are, so that two samples can
+    be subtracted locally.
+    """
+    sections = [('stat', 'grep ^cpu /proc/stat'),
+                ('meminfo', 'cat /proc/meminfo'),
+                ('loadavg', 'cat /proc/loadavg'),
+                ('uptime', 'cat /proc/uptime'),
+                ('df', "df -P -k '%s' | tail -1" % partition)]
+    if top:
+        sections.append(('ps', 'ps axo pcpu=,pmem=,pid=,args= --sort=-pcpu '
+                               '| head -n %d' % top))
+    if jvm:
+        sections.append(('jvm', 'curl -s -m 5 -u admin: %s' % JVM_URL))
+    return '; '.join("echo '%s%s'; %s" % (SEPARATOR, name, command)
+                     for name, command in sections)
+
+
+def parse_sample(text):
+    """Parses the output of sample_command().
+
+    CPU times are (total, idle) jiffies tuples, the first one being the
+    average of all cores. Memory and disk are in KB.
+    """
+    sections = {}
+    lines = None
+    for line in text.splitlines():
+        if line.startswith(SEPARATOR):
+            lines = sections[line[len(SEPARATOR):]] = []
+        elif lines is not None:
+            lines.append(line)
+
+    sample = AttrDict()
+    sample.cpu = []
+    for line in sections.get('stat', []):
+        bits = line.split()
+        times = [int(x) for x in bits[1:]]
+        # Guest times are already accounted for in user/nice.
+        sample.cpu.append((sum(times[:8]), times[3]))
+
+    meminfo = {}
+    for line in sections.get('meminfo', []):
+        name, value = line.split(':', 1)
+        meminfo[name] = int(value.split()[0])
+    sample.mem_total = meminfo.get('MemTotal', 0)
+    sample.mem_free = meminfo.get('MemFree', 0)
+    sample.mem_cached = meminfo.get('Buffers', 0) + meminfo.get('Cached', 0)
+
+    loadavg = sections.get('loadavg', ['0 0 0'])[0].split()
+    sample.load = tuple(float(x) for x in loadavg[:3])
+    sample.uptime = float(sections.get('uptime', ['0'])[0].split()[0])
+
+    df = sections.get('df', [''])[0].split()
+    sample.disk_used = int(df[2]) if len(df) > 3 else None
+    sample.disk_free = int(df[3]) if len(df) > 3 else None
+
+    sample.procs = None
+    if 'ps' in sections:
+        sample.procs = []
+        for line in sections['ps']:
+            bits = line.split(None, 3)
+            if len(bits) == 4:
+                sample.procs.append(AttrDict(cpu=float(bits[0]),
+                                             mem=float(bits[1]),
+                                             pid=int(bits[2]),
+                                             args=bits[3]))
+
+    sample.jvm = None
+    if 'jvm' in sections:
+        try:
+            sample.jvm = AttrDict(json.loads('\n'.join(sections['jvm'])))
+        except ValueError:
+            pass
+    return sample
+
+
+def cpu_idle(sample, since=None):
+    """Idle percents, average first then per core.
+
+    Without a previous sample these are averages since boot, like mpstat's.
+    """
+    ret = []
+    for i, (total, idle) in enumerate(sample.cpu):
+        if since is not None and i < len(since.cpu):
+            total -= since.cpu[i][0]
+            idle -= since.cpu[i][1]
+        ret.append(100.0 * idle / total if total > 0 else 100.0)
+    return ret
+
+
+def diff_samples(before, after):
+    """What changed between two samples of the same device."""
+    delta = AttrDict()
+    delta.seconds = after.uptime - before.uptime
+    delta.cpu_idle = cpu_idle(after, before)
+    delta.mem_used = ((after.mem_total - after.mem_free) -
+                      (before.mem_total - before.mem_free))
+    if after.disk_used is not None and before.disk_used is not None:
+        delta.disk_used = after.disk_used - before.disk_used
+    else:
+        delta.disk_used = None
+    delta.jvm = None
+    if after.jvm and before.jvm:
+        delta.jvm = AttrDict()
+        for key, value in after.jvm.iteritems():
+            if isinstance(value, (int, long, float)) and \
+               isinstance(before.jvm.get(key), (int, long, float)):
+                delta.jvm[key] = value - before.jvm[key]
+    return delta
+
+
+def summarize(sample, since=None):
+    """The GetSystemStats dict of a sample, CPU and MEM being percents and
+    DISK the available KB.
+
+    @param since: a previous sample or summary of the same device. The CPU
+        usage is then the one in between, and DELTA is set.
+    """
+    if since is not None and 'SAMPLE' in since:
+        since = since.SAMPLE
+
+    stats = AttrDict()
+    idle = cpu_idle(sample, since)
+    stats.CPU = '%.2f' % idle[0]
+    stats.CPUPERCORE = ['%.2f' % x for x in idle[1:]]
+    stats.CPUFORMATTED = '%.2f%%' % (100 - idle[0])
+    stats.CPUFORMATTEDPERCORE = ['%.2f%%' % (100 - x) for x in idle[1:]]
+    if sample.mem_total:
+        stats.MEM = '%g' % (100.0 * (sample.mem_total - sample.mem_free) /
+                            sample.mem_total)
+    else:
+        stats.MEM = None
+    stats.DISK = str(sample.disk_free) if sample.disk_free is not None else None
+    stats.LOAD = sample.load
+    stats.PROCS = sample.procs
+    stats.JVM = sample.jvm
+    stats.DELTA = diff_samples(since, sample) if since is not None else None
+    stats.SAMPLE = sample
+    return stats
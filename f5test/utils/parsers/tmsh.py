@@ -26,10 +26,6 @@ Caveats:
 
 @author: jono
 '''
-from pyparsing import (Literal, Word, Group, ZeroOrMore, printables, OneOrMore,
-    Forward, Optional, removeQuotes, Suppress, QuotedString, ParserElement,
-    White, LineEnd, quotedString, delimitedList, nestedExpr, originalTextFor,
-    pythonStyleComment, Combine, FollowedBy)
 import re
 import json
 import collections
@@ -79,8 +75,444 @@ class GlobDict(collections.OrderedDict):
         return [k.split(' ')[-1] for k  in self.keys() if fnmatch(k, match)]
 
 
-@synchronized_with(PYPARSING_LOCK)
+# Tokens used by TMSHDecoder. These mirror the pyparsing elements of the
+# legacy grammar (see parser_legacy()).
+IDENTIFIER_RE = re.compile(r'[!#-&(-z|~]+')
+COMMENTS_RE = re.compile(r'(?:[ \t\r\n]*#[^\n]*)*')
+WHITESPACE_RE = re.compile(r'[ \t\r\n]*')
+INLINE_WHITESPACE_RE = re.compile(r'[ \t]*')
+TOPLEVEL_WHITESPACE_RE = re.compile(r'[ \t\r]*')
+SPACES_RE = re.compile(r' +')
+SEPARATOR_RE = re.compile(r'[ \t\r\n]+')
+QUOTED_RE = {'"': re.compile(r'"(?:[^"\\]|(?:\\.))*"', re.MULTILINE | re.DOTALL),
+             "'": re.compile(r"'(?:[^'\\]|(?:\\.))*'", re.MULTILINE | re.DOTALL)}
+QUOTED_LINE_RE = {'"': re.compile(r'"(?:[^"\n\r\\]|(?:\\.))*"'),
+                  "'": re.compile(r"'(?:[^'\n\r\\]|(?:\\.))*'")}
+QUOTED_TCL_RE = {'"': re.compile(r'"(?:[^"\n\r\\]|(?:"")|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*'),
+                 "'": re.compile(r"'(?:[^'\n\r\\]|(?:'')|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*")}
+TCL_CONTENT_RE = re.compile(r'[^{} \t\r\n"\']+')
+ESCAPED_CHAR_RE = re.compile(r'\\(.)')
+FLOAT_RE = re.compile('(?i)^-?(\d+\.?e\d+|\d+\.\d*|\.\d+)$')
+BLOB_KEYWORDS = (('ltm', 'rule'), ('rule',))
+QUOTES = ('"', "'")
+
+
+def pythonize(s):
+    if s == 'true':
+        return True
+    elif s == 'false':
+        return False
+    elif s == 'none':
+        return None
+    elif s.isdigit():
+        return int(s)
+    elif FLOAT_RE.match(s):
+        return float(s)
+    return s
+
+
+def unescape(s):
+    if '\\' in s:
+        ws_map = {
+            r'\t': '\t',
+            r'\n': '\n',
+            r'\f': '\f',
+            r'\r': '\r',
+        }
+        for wslit, wschar in ws_map.items():
+            s = s.replace(wslit, wschar)
+    return ESCAPED_CHAR_RE.sub(r"\g<1>", s)
+
+
+class TMSHDecoder(object):
+    """Tokenizer and recursive-descent parser for tmsh/SCF text.
+
+    It produces exactly what the legacy pyparsing grammar does, including its
+    quirks, but it's an order of magnitude faster and it's thread-safe.
+
+    All methods take a position in the text and return a (position, value)
+    tuple, or None when there's no match. Just like in pyparsing, most
+    elements skip whitespace and #comments before matching.
+    """
+
+    def __init__(self, text):
+        self.text = text.expandtabs()
+        self.length = len(self.text)
+
+    def decode(self):
+        return GlobDict(pair for _, pair in self.iter_objects())
+
+    def iter_objects(self, loc=0, delimited=False):
+        """Generates (position, (key, value)) for each top-level object.
+
+        @param delimited: If set, expect a line break before the first object.
+        """
+        if not delimited:
+            ret = self._object(loc)
+            if ret is None:
+                return
+            loc = ret[0]
+            yield ret
+
+        while True:
+            end = self._line_end(loc, TOPLEVEL_WHITESPACE_RE)
+            if end is None:
+                break
+            ret = self._object(end)
+            if ret is None:
+                break
+            loc = ret[0]
+            yield ret
+
+    def is_consumed(self, loc):
+        return self._skip(loc) >= self.length
+
+    def _skip(self, loc, whitespace=WHITESPACE_RE):
+        loc = COMMENTS_RE.match(self.text, loc).end()
+        return whitespace.match(self.text, loc).end()
+
+    def _line_end(self, loc, whitespace):
+        if loc > self.length:
+            return None
+        loc = self._skip(loc, whitespace)
+        if loc == self.length:
+            return loc + 1
+        if self.text[loc] == '\n':
+            return loc + 1
+        return None
+
+    def _object(self, loc):
+        if loc > self.length:
+            return None
+        loc = self._skip(loc)
+        return self._blob(loc) or self._entry(loc)
+
+    def _blob(self, loc):
+        """ltm rule <name> { <tcl> } is kept as raw text."""
+        text = self.text
+        for keywords in BLOB_KEYWORDS:
+            end = loc
+            for i, keyword in enumerate(keywords):
+                if i:
+                    end = self._skip(end)
+                if not text.startswith(keyword, end):
+                    break
+                end += len(keyword)
+            else:
+                end = self._skip(end)
+                match = IDENTIFIER_RE.match(text, end)
+                if match:
+                    words = list(keywords) + [pythonize(match.group())]
+                    key = RawString(' '.join(map(str, words)))
+                    start = self._skip(match.end())
+                    end = self._tcl_block(start)
+                    if end is None:
+                        return None
+                    return end, (key, RawString(text[start:end]))
+        return None
+
+    def _tcl_block(self, loc):
+        text = self.text
+        if text[loc:loc + 1] != '{':
+            return None
+        loc += 1
+        while True:
+            # Note: #comments are not skipped inside the block.
+            loc = WHITESPACE_RE.match(text, loc).end()
+            char = text[loc:loc + 1]
+            if not char:
+                return None
+            if char == '}':
+                return loc + 1
+            if char == '{':
+                end = self._tcl_block(loc)
+                if end is None:
+                    return None
+                loc = end
+                continue
+            if char in QUOTES:
+                end = self._tcl_quoted(loc)
+                if end is not None:
+                    loc = end
+                    continue
+                loc += 1
+
+            # A run of characters, which is only broken by whitespace, braces
+            # or a valid quoted string.
+            while True:
+                match = TCL_CONTENT_RE.match(text, loc)
+                if match:
+                    loc = match.end()
+                char = text[loc:loc + 1]
+                if char not in QUOTES or not char or \
+                   self._tcl_quoted(loc) is not None:
+                    break
+                loc += 1
+
+    def _tcl_quoted(self, loc):
+        char = self.text[loc]
+        match = QUOTED_TCL_RE[char].match(self.text, loc)
+        if match and self.text[match.end():match.end() + 1] == char:
+            return match.end() + 1
+        return None
+
+    def _entry(self, loc):
+        """A top-level object: one or more words, optionally followed by a
+        dictionary."""
+        text = self.text
+        words = []
+        while True:
+            start = self._skip(loc)
+            match = IDENTIFIER_RE.match(text, start)
+            if match:
+                words.append(str(pythonize(match.group())))
+                loc = match.end()
+                continue
+            ret = self._quoted_identifier(start)
+            if ret:
+                loc, word = ret
+                words.append(word)
+                continue
+            break
+
+        if not words:
+            return None
+        key = RawString(' '.join(words))
+
+        loc = self._skip(loc)
+        ret = self._dict(loc)
+        if ret:
+            loc, value = ret
+            return loc, (key, value)
+        return loc, (key, RawEOL)
+
+    def _dict(self, loc):
+        text = self.text
+        loc = self._skip(loc)
+        if text[loc:loc + 1] != '{':
+            return None
+        loc += 1
+
+        pairs = []
+        while True:
+            ret = self._dict_entry(loc)
+            if ret is None:
+                break
+            loc, pair = ret
+            pairs.append(pair)
+
+        loc = self._skip(loc)
+        if text[loc:loc + 1] != '}':
+            return None
+        return loc + 1, GlobDict(pairs)
+
+    def _dict_entry(self, loc):
+        if loc > self.length:
+            return None
+        loc = self._skip(loc)
+        ret = self._dict_key(loc)
+        if ret is None:
+            return None
+        loc, key = ret
+
+        value = RawEOL
+        loc = COMMENTS_RE.match(self.text, loc).end()
+        match = SPACES_RE.match(self.text, loc)
+        if match:
+            ret = self._dict_value(match.end())
+            if ret:
+                loc, value = ret
+
+        loc = COMMENTS_RE.match(self.text, loc).end()
+        match = SPACES_RE.match(self.text, loc)
+        if match:
+            loc = match.end()
+
+        loc = self._line_end(loc, INLINE_WHITESPACE_RE)
+        if loc is None:
+            return None
+        return loc, (key, value)
+
+    def _dict_key(self, loc):
+        text = self.text
+        char = text[loc:loc + 1]
+        if char == '{':
+            ret = self._dict(loc)
+            if ret:
+                return ret[0], RawString(str(ret[1]))
+            return None
+
+        ret = self._quoted(loc)
+        if ret:
+            return ret[0], RawString(ret[1])
+
+        match = IDENTIFIER_RE.match(text, loc)
+        if match:
+            ret = self._quoted_identifier(match.end())
+            if ret:
+                return ret[0], RawString(match.group() + ret[1])
+            return match.end(), pythonize(match.group())
+        return None
+
+    def _dict_value(self, loc):
+        text = self.text
+        loc = self._skip(loc)
+        char = text[loc:loc + 1]
+        if char in QUOTES and char:
+            return self._quoted(loc)
+
+        if char == '{':
+            return self._dict(loc) or self._set(loc)
+
+        match = IDENTIFIER_RE.match(text, loc)
+        if match:
+            ret = self._quoted_identifier(match.end())
+            if ret:
+                return ret[0], RawString(match.group() + ret[1])
+
+        # Space separated words, possibly quoted.
+        start = loc
+        end = self._word(loc)
+        if end is None:
+            return None
+        while True:
+            match = SPACES_RE.match(text, end)
+            if not match:
+                break
+            loc = self._word(match.end())
+            if loc is None:
+                break
+            end = loc
+        return end, pythonize(text[start:end])
+
+    def _word(self, loc):
+        match = IDENTIFIER_RE.match(self.text, loc)
+        if match:
+            return match.end()
+        ret = self._quoted_identifier(loc)
+        if ret:
+            return ret[0]
+        return None
+
+    def _set(self, loc):
+        text = self.text
+        loc += 1
+        items = []
+        ret = self._set_item(loc)
+        if ret is None:
+            return None
+        loc, item = ret
+        items.append(item)
+
+        while True:
+            start = COMMENTS_RE.match(text, loc).end()
+            match = SEPARATOR_RE.match(text, start)
+            if not match:
+                break
+            ret = self._set_item(match.end())
+            if ret is None:
+                break
+            loc, item = ret
+            items.append(item)
+
+        loc = self._skip(loc)
+        if text[loc:loc + 1] != '}':
+            return None
+        return loc + 1, tuple(items)
+
+    def _set_item(self, loc):
+        text = self.text
+        loc = self._skip(loc)
+        match = IDENTIFIER_RE.match(text, loc)
+        if match:
+            return match.end(), pythonize(match.group())
+        char = text[loc:loc + 1]
+        if char in QUOTES and char:
+            end = self._tcl_quoted(loc)
+            if end is not None:
+                return end, text[loc + 1:end - 1]
+        return None
+
+    def _quoted(self, loc):
+        char = self.text[loc:loc + 1]
+        if char not in QUOTES or not char:
+            return None
+        match = QUOTED_RE[char].match(self.text, loc)
+        if match:
+            return match.end(), unescape(match.group()[1:-1])
+        return None
+
+    def _quoted_identifier(self, loc):
+        char = self.text[loc:loc + 1]
+        if char not in QUOTES or not char:
+            return None
+        match = QUOTED_LINE_RE[char].match(self.text, loc)
+        if match:
+            return match.end(), match.group()
+        return None
+
+
 def parser(text):
+    """Parses tmsh/SCF text into a GlobDict."""
+    return TMSHDecoder(text).decode()
+
+
+def iterparse(fileobj):
+    """Parses tmsh/SCF text from a file object incrementally.
+
+    Generates (key, value) tuples for each top-level object, so only a few
+    objects are held in memory at a time. Top-level objects are expected to
+    start in the first column, like they do in bigip.conf.
+
+    >>> with open('/config/bigip.conf') as f:
+    ...     for key, value in iterparse(f):
+    ...         print key
+    """
+    lines = []
+    size = threshold = 0
+    delimited = False
+
+    for line in fileobj:
+        if lines and size >= threshold and line[:1] not in ' \t\r\n{}#':
+            text = ''.join(lines)
+            decoder = TMSHDecoder(text)
+            objects = list(decoder.iter_objects(delimited=delimited))
+            # The last object may continue on the next lines.
+            if objects and (objects[-1][1][1] is RawEOL or
+                            not decoder.is_consumed(objects[-1][0])):
+                objects.pop()
+            if objects:
+                for _, pair in objects:
+                    yield pair
+                lines = [decoder.text[objects[-1][0]:]]
+                size = len(lines[0])
+                threshold = 0
+                delimited = True
+            else:
+                # Avoid quadratic behavior on objects spanning many lines.
+                threshold = size * 2
+        lines.append(line)
+        size += len(line)
+
+    decoder = TMSHDecoder(''.join(lines))
+    for _, pair in decoder.iter_objects(delimited=delimited):
+        yield pair
+
+
+def parse_file(filename):
+    """Parses a tmsh/SCF file into a GlobDict."""
+    with open(filename) as f:
+        return GlobDict(iterparse(f))
+
+
+@synchronized_with(PYPARSING_LOCK)
+def parser_legacy(text):
+    """The original pyparsing-based parser. Slow and not thread-safe."""
+    from pyparsing import (Literal, Word, Group, ZeroOrMore, printables, OneOrMore,
+        Forward, Optional, removeQuotes, Suppress, QuotedString, ParserElement,
+        White, LineEnd, quotedString, delimitedList, nestedExpr, originalTextFor,
+        pythonStyleComment, Combine, FollowedBy)
+
     cvtTuple = lambda toks: tuple(toks.asList())
     cvtRaw = lambda toks: RawString(' '.join(map(str, toks.asList())))
     #cvtDict = lambda toks: dict(toks.asList())
@@ -518,3 +950,34 @@ if __name__ == '__main__':
     print "Filter:"
     print dumps(result.glob('ltm rule *'))
     #print result.glob_keys('mgmt*')[0]
+
+    print "Benchmark:"
+    import time
+    from StringIO import StringIO
+    chunks = []
+    for i in range(2000):
+        chunks.append("ltm node /Common/node%d {\n"
+                      "    address 10.%d.%d.%d\n"
+                      "    description \"Node number %d\"\n"
+                      "    monitor /Common/icmp\n"
+                      "}\n" % (i, i / 65536, i / 256 % 256, i % 256, i))
+        chunks.append("ltm pool /Common/pool%d {\n"
+                      "    members {\n"
+                      "        /Common/node%d:80 {\n"
+                      "            address 10.%d.%d.%d\n"
+                      "        }\n"
+                      "    }\n"
+                      "    monitor /Common/http and /Common/tcp\n"
+                      "    slow-ramp-time 10\n"
+                      "}\n" % (i, i, i / 65536, i / 256 % 256, i % 256))
+    big = ''.join(chunks)
+    expected = None
+    for name, func in (('parser_legacy', parser_legacy),
+                       ('parser', parser),
+                       ('iterparse', lambda x: GlobDict(iterparse(StringIO(x))))):
+        now = time.time()
+        ret = func(big)
+        print "%s: %d objects in %.3f seconds" % (name, len(ret), time.time() - now)
+        if expected is None:
+            expected = ret
+        assert ret == expected
@@ -0,0 +1,176 @@
+'''
+Created on Oct 17, 2026
+
+@author: jono
+'''
+from __future__ import absolute_import
+import sys
+import threading
+import time
+import traceback
+import logging
+from .wait import WaitTimedOut, StopWait
+
+LOG = logging.getLogger(__name__)
+
+
+class PollFuture(object):
+    """The outcome of one key (usually a selfLink) polled by a BatchPoller."""
+    timeout_message = "Criteria not met after {0} seconds."
+
+    def __init__(self, key, condition=None, progress_cb=None, timeout=180,
+                 timeout_message=None):
+        self.key = key
+        self.condition = condition or bool
+        self.progress_cb = progress_cb
+        self.timeout = timeout
+        self.deadline = time.time() + timeout
+        self.last = None
+        self.probes = 0
+        self._result = None
+        self._exc_info = None
+        self._event = threading.Event()
+
+        if timeout_message:
+            self.timeout_message = timeout_message
+
+    def __repr__(self):
+        name = self.__class__.__name__
+        state = 'done' if self.done() else 'pending'
+        return "<{0}: {1} {2}>".format(name, self.key, state)
+
+    def done(self):
+        return self._event.is_set()
+
+    def set_result(self, result):
+        self._result = result
+        self._event.set()
+
+    def set_exception(self, exc_info):
+        self._exc_info = exc_info
+        self._event.set()
+
+    def exception(self):
+        return self._exc_info[1] if self._exc_info else None
+
+    def result(self, timeout=None):
+        if not self._event.wait(timeout):
+            raise WaitTimedOut("%s not resolved after %s seconds." % (self, timeout))
+        if self._exc_info:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._result
+
+
+class BatchPoller(object):
+    """Polls a set of pending keys on one shared schedule.
+
+    Each key is passed to func() once per round. The interval between rounds
+    starts at `interval` and grows by `backoff` up to `max_interval` for as
+    long as nothing gets resolved. It resets as soon as one key is resolved.
+
+    Like wait(), exceptions raised by func() count as "criteria not met",
+    except StopWait which fails that key immediately.
+
+    >>> poller = BatchPoller(api.get)
+    >>> futures = [poller.add(x.selfLink, condition=lambda x: x.status == 'FINISHED')
+    ...            for x in tasks]
+    >>> poller.run()
+    >>> [x.result() for x in futures]
+    """
+
+    def __init__(self, func, interval=1, max_interval=10, backoff=1.5):
+        self.func = func
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def add(self, key, *args, **kwargs):
+        """Schedule a key. Returns the PollFuture for it.
+
+        Adding a key that is still pending returns the existing future.
+        """
+        with self._lock:
+            for future in self._futures:
+                if future.key == key and not future.done():
+                    return future
+            future = PollFuture(key, *args, **kwargs)
+            self._futures.append(future)
+            return future
+
+    def pending(self):
+        with self._lock:
+            return [x for x in self._futures if not x.done()]
+
+    def poll(self):
+        """Run one round over all pending keys. Returns the count resolved."""
+        resolved = 0
+        for future in self.pending():
+            future.probes += 1
+            try:
+                future.last = self.func(future.key)
+                if future.condition(future.last):
+                    future.set_result(future.last)
+                    resolved += 1
+                    continue
+                if future.progress_cb:
+                    ret = future.progress_cb(future.last)
+                    if ret:
+                        LOG.info('%s: %s', future.key, ret)
+            except StopWait:
+                future.set_exception(sys.exc_info())
+                resolved += 1
+                continue
+            except:
+                LOG.debug("Exception occurred while polling %s:\n%s",
+                          future.key, traceback.format_exc())
+
+            if time.time() >= future.deadline:
+                msg = future.timeout_message.format(future.timeout, future.last,
+                                                   key=future.key)
+                try:
+                    raise WaitTimedOut(msg)
+                except WaitTimedOut:
+                    future.set_exception(sys.exc_info())
+                resolved += 1
+        return resolved
+
+    def run(self):
+        """Poll until all keys are resolved, either successfully or not."""
+        interval = self.interval
+        while True:
+            resolved = self.poll()
+            pending = self.pending()
+            if not pending:
+                break
+
+            if resolved:
+                interval = self.interval
+            else:
+                interval = min(interval * self.backoff, self.max_interval)
+
+            # Never oversleep the nearest deadline.
+            nearest = min(x.deadline for x in pending) - time.time()
+            time.sleep(max(0, min(interval, nearest)))
+
+        with self._lock:
+            futures = self._futures
+            self._futures = []
+        return futures
+
+
+def poll_all(func, keys, *args, **kwargs):
+    """Poll several keys at once, wait_args() style.
+
+    Returns the results in the same order as keys. Raises the first error, if
+    any, after all keys have been resolved.
+    """
+    poller_kwargs = {}
+    for name in ('interval', 'max_interval', 'backoff'):
+        if name in kwargs:
+            poller_kwargs[name] = kwargs.pop(name)
+    poller = BatchPoller(func, **poller_kwargs)
+    futures = [poller.add(x, *args, **kwargs) for x in keys]
+    poller.run()
+    return [x.result() for x in futures]
@@ -33,6 +33,10 @@ class StageError(Exception):
 class Stage(object):
     name = None
     parallelizable = True
+    # Whether the stage touches only its own device. Stages that work across
+    # devices (e.g. HA, discovery) wait for all previous stages to finish and
+    # all following stages wait for them.
+    isolated = True
 
 #     def run(self):
 #         raise NotImplementedError('oops!')
@@ -32,6 +32,7 @@ class EMDiscocveryStage(Stage, Macro):
     """
     name = 'emdiscovery'
     parallelizable = False
+    isolated = False
 
     def __init__(self, device, specs, *args, **kwargs):
         self._context = specs.get('_context')
@@ -129,6 +130,7 @@ class EMInstallSoftwareStage(Stage, EMInstallSoftware):
     The convention is to use the 'x-em' alias for the 3rd party EM.
     """
     name = 'eminstall'
+    isolated = False
 
     def __init__(self, device, specs, *args, **kwargs):
         configifc = ConfigInterface()
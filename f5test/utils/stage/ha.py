@@ -20,6 +20,7 @@ class HAStage(Stage, FailoverMacro):
     BIGIP 11.0+ devices or EM 3.0+.
     """
     name = 'ha'
+    isolated = False
 
     def __init__(self, device, specs=None, *args, **kwargs):
         configifc = ConfigInterface()
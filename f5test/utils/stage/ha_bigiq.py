@@ -19,6 +19,7 @@ class HABigiqStage(Stage, HABigiqMacro):
     Cofigure BIG-IQ Active-Active HA two or more BIGIQ 4.3.0+ devices.
     """
     name = 'ha_bigiq'
+    isolated = False
 
     def __init__(self, device, specs=None, *args, **kwargs):
         configifc = ConfigInterface()
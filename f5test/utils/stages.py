@@ -8,8 +8,10 @@ from f5test.interfaces.config import (expand_devices, ConfigInterface)
 from f5test.macros.base import Macro, MacroThread
 from f5test.utils.stage.base import Stage, StageError
 from nose.config import _bool
+import collections
 import inspect
 import os
+import time
 
 from f5test.base import Options
 from Queue import Queue
@@ -73,7 +75,165 @@ def carry_flag(d, flag=None):
             carry_flag(v, flag)
 
 
-def process_stages(stages, section, context, stop_on_error=True):
+class StageTask(object):
+    """One stage run against one device (or no device at all)."""
+
+    def __init__(self, description, stage_class, parameters, device=None,
+                 limit=MAX_THREADS):
+        self.description = description
+        self.stage_class = stage_class
+        self.parameters = parameters
+        self.device = device
+        self.limit = max(1, limit)
+        self.deps = set()
+        self.start = None
+        self.end = None
+        self.failed = False
+
+    def __repr__(self):
+        return "<StageTask: %s>" % self.name
+
+    @property
+    def name(self):
+        if self.device:
+            return '%s :: %s' % (self.description, self.device.alias)
+        return self.description
+
+    @property
+    def done(self):
+        return self.end is not None
+
+    @property
+    def duration(self):
+        if self.start is None:
+            return 0
+        return (self.end or time.time()) - self.start
+
+    def is_ready(self):
+        return all(x.done for x in self.deps)
+
+    def get_stage(self):
+        if self.device:
+            return self.stage_class(self.device, self.parameters)
+        return self.stage_class(self.parameters)
+
+
+class StageThread(MacroThread):
+
+    def __init__(self, task, done, *args, **kwargs):
+        self.task = task
+        self.done = done
+        super(StageThread, self).__init__(*args, **kwargs)
+
+    def run(self):
+        try:
+            return super(StageThread, self).run()
+        finally:
+            self.done.put(self)
+
+
+class StageScheduler(object):
+    """Runs StageTasks in a bounded pool of threads.
+
+    A task starts as soon as all its dependencies are done and a slot is free,
+    so a slow device doesn't hold back the others. Tasks without a device
+    run in the calling thread, while nothing else is running.
+    """
+
+    def __init__(self, config, threads=MAX_THREADS, stop_on_error=True):
+        self.config = config
+        self.threads = max(1, threads)
+        self.stop_on_error = stop_on_error
+        self.tasks = []
+        self.errors = []
+
+    def add(self, task):
+        self.tasks.append(task)
+        return task
+
+    def _start(self, task, errors, done):
+        if not any(x.start for x in self.tasks if x.description == task.description):
+            LOG.info("Processing stage: %s", task.description)
+        task.start = time.time()
+        stage = task.get_stage()
+        if not task.device:
+            try:
+                stage.run()
+            finally:
+                task.end = time.time()
+            return
+
+        thread = StageThread(task, done, stage, errors, name=task.name,
+                             config=self.config)
+        thread.start()
+        return thread
+
+    def run(self):
+        errors = Queue()
+        done = Queue()
+        pending = list(self.tasks)
+        running = []
+
+        while pending or running:
+            if self.stop_on_error and self.errors:
+                pending[:] = []
+
+            started = False
+            for task in list(pending):
+                if len(running) >= self.threads:
+                    break
+                if not task.is_ready():
+                    continue
+                if len([x for x in running
+                        if x.description == task.description]) >= task.limit:
+                    continue
+                if not task.device and running:
+                    continue
+                pending.remove(task)
+                started = True
+                if self._start(task, errors, done):
+                    running.append(task)
+
+            if not running:
+                if pending and not any(x.is_ready() for x in pending):
+                    raise StageError('Unsatisfiable stage dependencies: %s' % pending)
+                if pending and not started:
+                    raise StageError('Unable to start stages: %s' % pending)
+                continue
+
+            thread = done.get()
+            thread.task.end = time.time()
+            running.remove(thread.task)
+            while not errors.empty():
+                ret = errors.get(block=False)
+                thread, exc_info = ret.popitem()
+                thread.task.failed = True
+                self.errors.append((thread, exc_info))
+
+        LOG.debug('All stages done.')
+        return self.errors
+
+    def report(self):
+        """Per-stage timing report lines."""
+        stages = collections.OrderedDict()
+        for task in self.tasks:
+            if task.start is not None:
+                stages.setdefault(task.description, []).append(task)
+
+        lines = ['Stage timing:']
+        for description, tasks in stages.items():
+            durations = [x.duration for x in tasks]
+            wall = max(x.end or time.time() for x in tasks) - min(x.start for x in tasks)
+            lines.append("%-30s %3d run(s) %3d failed  min %7.1fs  avg %7.1fs  "
+                         "max %7.1fs  wall %7.1fs" %
+                         (description, len(tasks), len([x for x in tasks if x.failed]),
+                          min(durations), sum(durations) / len(durations),
+                          max(durations), wall))
+        return lines
+
+
+def process_stages(stages, section, context, stop_on_error=True,
+                   threads=MAX_THREADS):
     if not stages:
         LOG.debug('No stages found.')
         return
@@ -98,10 +258,13 @@ def process_stages(stages, section, context, stop_on_error=True):
                                                       x[0]))
 
     config = ConfigInterface().config
-    # Group stages of the same type. The we spin up one thread per stage in a
-    # group and wait for threads within a group to finish.
+    # Group stages of the same type. Each device moves on to the next group as
+    # soon as it's done with the current one, unless a stage in the group works
+    # across devices, in which case it acts as a barrier.
     sg_dict = {}
     sg_list = []
+    # Stages asking for more threads than the pool has widen the pool.
+    widest = threads
     for name, specs in stages:
         if not specs or name.startswith('_'):
             continue
@@ -109,6 +272,7 @@ def process_stages(stages, section, context, stop_on_error=True):
 
         specs = Options(specs)
         key = specs.get(GROUP_KEY, "{0}-{1}".format(name, specs[TYPE_KEY]))
+        widest = max(widest, int(specs.get('threads') or 0))
 
         group = sg_dict.get(key)
         if not group:
@@ -117,15 +281,23 @@ def process_stages(stages, section, context, stop_on_error=True):
         sg_dict[key].append((name, specs))
 
     LOG.debug("sg_list: %s", sg_list)
+    if widest > threads:
+        LOG.debug('Running up to %d stage threads instead of %d.', widest,
+                  threads)
+    scheduler = StageScheduler(config, threads=widest,
+                               stop_on_error=stop_on_error)
+    # Tasks of the last group each device was part of.
+    last = {}
+    # Non-isolated tasks of the last group that had any.
+    barrier = []
     for stages in sg_list:
-        q = Queue()
-        pool = []
+        group_last = {}
+        group_barrier = []
         for stage in stages:
             description, specs = stage
             if not specs or not _bool(specs.get(ENABLE_KEY)):
                 continue
 
-            LOG.info("Processing stage: %s", description)
             # items() reverts <Options> to a simple <dict>
             specs = Options(specs)
             if not stages_map.get(specs[TYPE_KEY]):
@@ -137,43 +309,53 @@ def process_stages(stages, section, context, stop_on_error=True):
             parameters._context = context
 
             devices = expand_devices(specs)
-            if devices is None:
-                stage_class(parameters).run()
-            elif devices == []:
+            if devices == []:
                 LOG.error("Stage %s requires devices but found none" % description)
-            else:
-                if not devices:
-                    LOG.warning('No devices found for stage %s', description)
-                for device in devices:
-                    stage = stage_class(device, parameters)
-                    name = '%s :: %s' % (description, device.alias) if device else description
-                    t = MacroThread(stage, q, name=name, config=config)
-                    t.start()
-                    pool.append(t)
-                    if not stage_class.parallelizable or not specs.get('parallelizable', True):
-                        t.join()
-
-                    # Cap the number parallel threads
-                    if len(pool) >= specs.get('threads', MAX_THREADS):
-                        map(lambda x: x.join(), pool)
-                        pool[:] = []
-
-        LOG.debug('Waiting for threads...')
-        for t in pool:
-            t.join()
-
-        if not q.empty():
-            stages = []
-            while not q.empty():
-                ret = q.get(block=False)
-                thread, exc_info = ret.popitem()
-                stages.append((thread, exc_info))
-                LOG.error('Exception while "%s"', thread.getName())
-                for line in traceback.format_exception(*exc_info):
-                    LOG.error(line.strip())
+                continue
 
-            if stop_on_error:
-                raise StageError(stages)
+            parallel = stage_class.parallelizable and specs.get('parallelizable', True)
+            isolated = devices is not None and \
+                stage_class.isolated and specs.get('isolated', True)
+            limit = max(1, int(specs.get('threads') or MAX_THREADS)) \
+                if parallel else 1
+            previous = None
+            for device in devices or [None]:
+                task = StageTask(description, stage_class, parameters, device,
+                                 limit=limit)
+                if isolated:
+                    task.deps.update(last.get(device.alias, []))
+                    task.deps.update(barrier)
+                    group_last.setdefault(device.alias, []).append(task)
+                else:
+                    task.deps.update(scheduler.tasks)
+                    group_barrier.append(task)
+                # Non-parallelizable stages handle one device at a time.
+                if previous and not parallel:
+                    task.deps.add(previous)
+                previous = task
+                scheduler.add(task)
+
+        if group_barrier:
+            # The barrier already waits for everything that came before it.
+            barrier = group_barrier
+            last = group_last
+        else:
+            last.update(group_last)
+
+    scheduler.run()
+    for line in scheduler.report():
+        LOG.info(line)
+
+    errors = scheduler.errors
+    if errors:
+        for thread, exc_info in errors:
+            LOG.error('Exception while "%s"', thread.getName())
+            for line in traceback.format_exception(*exc_info):
+                LOG.error(line.strip())
+
+        if stop_on_error:
+            raise StageError(errors)
+    return scheduler.tasks
 
 
 class SanityCheck(Macro):
@@ -4,7 +4,10 @@ Created on Aug 10, 2011
 @author: jono
 '''
 from __future__ import absolute_import
+import json
+import random
 import sys
+import threading
 import time
 import traceback
 import logging
@@ -20,16 +23,77 @@ class StopWait(StopIteration):
     pass
 
 
+class WaitStats(object):
+    """Thread-safe per-wait statistics (probe count, time to success).
+
+    Entries are aggregated by wait name, which defaults to the name of the
+    polled function.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._data = {}
+
+    def record(self, name, probes, elapsed, success):
+        with self._lock:
+            entry = self._data.setdefault(name, dict(count=0, probes=0,
+                                                     timeouts=0, elapsed=0.0,
+                                                     max_elapsed=0.0))
+            entry['count'] += 1
+            entry['probes'] += probes
+            entry['elapsed'] += elapsed
+            entry['max_elapsed'] = max(entry['max_elapsed'], elapsed)
+            if not success:
+                entry['timeouts'] += 1
+
+    def summary(self):
+        """Returns a dict of name: stats, including averages."""
+        with self._lock:
+            ret = {}
+            for name, entry in self._data.iteritems():
+                entry = dict(entry)
+                entry['avg_probes'] = float(entry['probes']) / entry['count']
+                entry['avg_elapsed'] = entry['elapsed'] / entry['count']
+                ret[name] = entry
+            return ret
+
+    def dump(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.summary(), f, indent=4, sort_keys=True)
+
+STATS = WaitStats()
+
+
 class Wait(object):
+    """Polls function() until the criteria is met or the timeout expires.
+
+    By default it sleeps a fixed `interval` between probes. When `backoff` is
+    set the sleep starts at `interval` and is multiplied by `backoff` after
+    every unsuccessful probe, up to `max_interval`. A `jitter` ratio (e.g. 0.1)
+    randomizes each sleep by +/- that much. Sleeps never go past the timeout.
+    """
     timeout_message = "Criteria not met after {0} seconds."
     progress_message = None
 
     def __init__(self, timeout=180, interval=5, stabilize=0, negated=False,
-                 timeout_message=None, progress_message=None):
+                 timeout_message=None, progress_message=None, backoff=None,
+                 max_interval=None, jitter=0, name=None):
         self.timeout = timeout
         self.interval = interval
         self.stabilize = stabilize
         self.negated = negated
+        self.backoff = backoff
+        self.max_interval = max_interval if max_interval is not None \
+            else max(interval, 5)
+        self.jitter = jitter
+        self.name = name
+        self.probes = 0
+        self.elapsed = None
+        self._success = False
         self._result = None
 
         if timeout_message:
@@ -41,15 +105,43 @@ class Wait(object):
     def function(self, *args, **kwargs):
         self._result = True
 
+    def get_name(self):
+        return self.name or self.__class__.__name__
+
+    def next_interval(self, interval):
+        """Returns how long to sleep before the next probe."""
+        if self.backoff:
+            interval = min(interval * self.backoff, self.max_interval)
+        return interval
+
+    def _sleep(self, interval, end):
+        if self.jitter:
+            interval *= 1 + random.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0, min(interval, end - time.time())))
+
     def run(self, *args, **kwargs):
+        start = time.time()
+        end = start + self.timeout
+        self.probes = 0
+        self._success = False
+
+        try:
+            return self._run(args, kwargs, end)
+        finally:
+            self.elapsed = time.time() - start
+            STATS.record(self.get_name(), self.probes, self.elapsed,
+                         self._success)
+
+    def _run(self, args, kwargs, end):
         last_success = None
         stable = 0
-        end = time.time() + self.timeout
         last_time = time.time()
+        interval = self.interval
 
         while time.time() < end:
             success = False
             last_exc = None
+            self.probes += 1
             try:
                 self.function(*args, **kwargs)
                 success = self.test_result()
@@ -84,6 +176,7 @@ class Wait(object):
                         stable = 0
 
                     if stable >= self.stabilize:
+                        self._success = True
                         break
 
                 if last_exc and last_exc is StopWait:
@@ -91,7 +184,8 @@ class Wait(object):
 
                 last_success = success
                 last_time = time.time()
-                time.sleep(self.interval)
+                self._sleep(interval, end)
+                interval = self.next_interval(interval)
         else:
             self.fail()
             raise WaitTimedOut(self.timeout_message.format(self.timeout, self._result))
@@ -137,6 +231,11 @@ class CallableWait(Wait):
         self._progress_cb = progress_cb
         super(CallableWait, self).__init__(*args, **kwargs)
 
+    def get_name(self):
+        if self.name or self._func is None:
+            return super(CallableWait, self).get_name()
+        return getattr(self._func, '__name__', repr(self._func))
+
     def function(self, *args, **kwargs):
         self._result = self._func(*args, **kwargs)
 
@@ -169,6 +268,18 @@ def wait(func, condition=None, progress_cb=None, *args, **kwargs):
     return CallableWait(func, condition, progress_cb, *args, **kwargs).run()
 
 
+def wait_adaptive(func, condition=None, progress_cb=None, interval=0.1,
+                  backoff=2, max_interval=5, jitter=0.1, **kwargs):
+    """Same as wait() but probes right away and backs off exponentially.
+
+    Useful for conditions that are usually met within milliseconds, but may
+    take a while sometimes.
+    """
+    return CallableWait(func, condition, progress_cb, interval=interval,
+                        backoff=backoff, max_interval=max_interval,
+                        jitter=jitter, **kwargs).run()
+
+
 if __name__ == '__main__':
     logging.basicConfig(level=0)
 
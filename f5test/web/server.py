@@ -176,10 +176,18 @@ def status_handler(task_id):
     # status = nosetests.delay() #@UndefinedVariable
     task = MyAsyncResult(task_id)  # @UndefinedVariable
     result = task.load_meta()
-    offset = bottle.request.query.get('s')
-    if offset and result and result.logs:
-        last = int(offset) - (result.tip or 0)  # it should be negative
-        result.logs[:] = result.logs[last:] if last else []
+    if result:
+        # Only the log segments past the client's offset are fetched.
+        result.tip = result.get('tip') or 0
+        try:
+            offset = int(bottle.request.query.get('s') or 0)
+        except ValueError:
+            offset = 0
+        if offset > result.tip:
+            # Stale offset from a previous task.
+            offset = 0
+        result.logs = task.load_logs(result, offset)
+        result.pop('log_segments', None)
     value = task.result if task.successful() else None
     bottle.response.add_header('Cache-Control', 'no-cache')
     return dict(status=task.status, value=value, result=result,
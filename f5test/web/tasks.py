@@ -19,8 +19,8 @@ from logging.handlers import BufferingHandler
 import nose
 import os
 import sys
+import threading
 import time
-import collections
 
 logging.raiseExceptions = 0
 
@@ -33,6 +33,10 @@ LOG_CONFIG = 'logging.conf'
 MEMCACHED_META_PREFIX = 'f5test-task-'
 # URL_REGEX = r'(\(?\bhttp://[-A-Za-z0-9+&@#/%?=~_()|!:,.;]*[-A-Za-z0-9+&@#/%=~_()|])'
 MAX_LOG_LINE = 1024
+# Log records are published in segments, at most every FLUSH_INTERVAL seconds
+# or FLUSH_RECORDS records, whichever comes first.
+FLUSH_INTERVAL = 0.5
+FLUSH_RECORDS = 200
 
 
 # Setup logging only once when celery is initialized.
@@ -51,14 +55,68 @@ def _clean_sys_modules(tests_path=TESTS_DIR):
             del sys.modules[name]
 
 
+class LogPublisher(object):
+    """Publishes log records to the task's meta in append-only segments.
+
+    Each flush stores the pending records under a new sequence number and
+    only updates the small segment index in the meta, so the cost of a flush
+    doesn't grow with the size of the log. Only the segments holding the last
+    MAX_LOG_LINE records are kept.
+    """
+
+    def __init__(self, task, interval=FLUSH_INTERVAL,
+                 max_records=FLUSH_RECORDS):
+        self.task = task
+        self.interval = interval
+        self.max_records = max_records
+        self.tip = 0
+        self.seq = 0
+        self.segments = []
+        self.pending = []
+        self.timer = None
+        self.lock = threading.RLock()
+
+    def append(self, item):
+        with self.lock:
+            self.pending.append(item)
+            if len(self.pending) >= self.max_records:
+                self.flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.pending:
+                return
+
+            self.task.save_segment(self.seq, self.pending)
+            # (sequence number, index of the first record, count)
+            self.segments.append((self.seq, self.tip, len(self.pending)))
+            self.tip += len(self.pending)
+            self.seq += 1
+            self.pending = []
+
+            while self.tip - self.segments[0][1] - self.segments[0][2] >= MAX_LOG_LINE:
+                self.task.delete_segment(self.segments.pop(0)[0])
+            self.task.save_meta(log_segments=self.segments, tip=self.tip)
+
+
 class MyMemoryHandler(BufferingHandler):
 
     def __init__(self, task, level, *args, **kwargs):
         super(MyMemoryHandler, self).__init__(*args, **kwargs)
         self.task = task
         self.level = level
-        self.tip = 0
-        self.buffer = collections.deque([], maxlen=MAX_LOG_LINE)
+        self.publisher = LogPublisher(task)
+
+    @property
+    def tip(self):
+        return self.publisher.tip
 
     def emit(self, record):
         item = AttrDict()
@@ -71,10 +129,10 @@ class MyMemoryHandler(BufferingHandler):
         # for x in item:
         #    if x not in ('levelname', 'asctime', 'message'):
         #        item.pop(x)
-        self.buffer.append(item)
-        self.tip += 1
-        self.task.save_meta(logs=list(self.buffer), tip=self.tip)
-        # self.task.update_state(state='PENDING', meta=self.task._result)
+        self.publisher.append(item)
+
+    def flush(self):
+        self.publisher.flush()
 
 
 class MyAsyncResult(AsyncResult):
@@ -82,10 +140,22 @@ class MyAsyncResult(AsyncResult):
     def load_meta(self):
         return self.backend.get(MEMCACHED_META_PREFIX + self.id)
 
+    def load_logs(self, meta, offset=0):
+        """Returns the log records starting at offset, of those still kept."""
+        logs = []
+        for seq, start, count in meta.get('log_segments') or []:
+            if start + count <= offset:
+                continue
+            segment = self.backend.get('%s%s-%d' % (MEMCACHED_META_PREFIX,
+                                                    self.id, seq)) or []
+            logs.extend(segment[max(0, offset - start):])
+        return logs
+
 
 class DebugTask(celery.Task):
     abstract = True
     _meta = AttrDict()
+    _lock = threading.RLock()
 
     def AsyncResult(self, task_id):
         """Get AsyncResult instance for this kind of task.
@@ -100,8 +170,20 @@ class DebugTask(celery.Task):
         self._meta.clear()
 
     def save_meta(self, **kwargs):
-        self._meta.update(**kwargs)
-        self.backend.set(MEMCACHED_META_PREFIX + self._id, self._meta)
+        # Log segments are also flushed from a timer thread.
+        with self._lock:
+            self._meta.update(**kwargs)
+            self.backend.set(MEMCACHED_META_PREFIX + self._id, self._meta)
+
+    def save_segment(self, seq, logs):
+        with self._lock:
+            self.backend.set('%s%s-%d' % (MEMCACHED_META_PREFIX, self._id, seq),
+                             logs)
+
+    def delete_segment(self, seq):
+        with self._lock:
+            self.backend.delete('%s%s-%d' % (MEMCACHED_META_PREFIX, self._id,
+                                             seq))
 
     def on_failure(self, exc, task_id, args, kwargs, einfo):
         if self.request.is_eager:
@@ -129,6 +211,7 @@ class DebugTask(celery.Task):
             return super(DebugTask, self).__call__(*args, **kwargs)
         finally:
             root_logger.removeHandler(handler)
+            handler.flush()
 
 
 @celery.task(base=DebugTask)